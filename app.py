@@ -1,7 +1,8 @@
 from datetime import datetime
 import streamlit as st
-from utils.db import load_corr_data, load_rs_data, load_price_data, get_last_update, engine_rs
-from utils.helpers import update_all_data
+from utils.db import load_page_data, get_last_update, engine_rs
+from utils.helpers import update_all_data, render_refresh_status, perf_panel_enabled, render_perf_panel
+from utils.timing import start_collection, span
 from pages import rankings, relative_strength, correlation, ai_agent
 # -------------------------
 # Configuração da página - Hide Side Bar
@@ -17,6 +18,9 @@ hide_streamlit_style = """
 """
 st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
+# Spans de tempo desta rerun (painel de diagnóstico e PERF_LOG)
+start_collection()
+
 st.title("📊 Painel de Análises Financeiras")
 
 # -------------------------
@@ -24,16 +28,13 @@ st.title("📊 Painel de Análises Financeiras")
 # -------------------------
 if st.button("🔁 Atualizar Todos os Dados"):
     update_all_data()
+render_refresh_status()
 
 # -------------------------
-# Carregando dados
+# Última atualização
 # -------------------------
-with st.spinner("📊 Carregando dados..."):
-    df_corr = load_corr_data()
-    df_rs = load_rs_data()
-    df_prices = load_price_data()
-    last_update_perf = get_last_update(engine_rs, "asset_prices")
-    last_update_dt = datetime.fromisoformat(str(last_update_perf).split('.')[0])
+last_update_perf = get_last_update(engine_rs, "asset_prices")
+last_update_dt = datetime.fromisoformat(str(last_update_perf).split('.')[0])
 
 st.header(f"Última atualização: {last_update_dt.strftime('%d/%m/%Y')}")
 
@@ -58,14 +59,33 @@ selected_period_days = period_options[st.selectbox("🕒 Intervalo de análise:"
 tab_options = ["📊 OHLC","💪 Força Relativa","📈 Correlação","🔮 Agente IA"]
 selected_tab = st.radio("Escolha uma aba:", tab_options, horizontal=True)
 
-if selected_tab == "📊 OHLC":
-    rankings.render_rankings(df_prices, selected_period_days)
-elif selected_tab == "💪 Força Relativa":
-    relative_strength.render_relative_strength(df_rs, df_prices)
-elif selected_tab == "📈 Correlação":
-    correlation.render_correlation(df_corr)
-elif selected_tab == "🔮 Agente IA":
-    ai_agent.render_ai_agent(df_prices, df_rs, df_corr, selected_period_days)
+# -------------------------
+# Carregando apenas os dados da aba selecionada
+# -------------------------
+tab_pages = {
+    "📊 OHLC": rankings,
+    "💪 Força Relativa": relative_strength,
+    "📈 Correlação": correlation,
+    "🔮 Agente IA": ai_agent,
+}
+with st.spinner("📊 Carregando dados..."):
+    data = load_page_data(tab_pages[selected_tab].DATA_REQUIREMENTS, selected_period_days)
+
+with span("app.render", tab=selected_tab):
+    if selected_tab == "📊 OHLC":
+        rankings.render_rankings(data["rankings_panel"])
+    elif selected_tab == "💪 Força Relativa":
+        relative_strength.render_relative_strength(data["rs_latest"], data["prices"])
+    elif selected_tab == "📈 Correlação":
+        correlation.render_correlation(data["corr_latest"], data["corr_cube"], data["corr_matrix"])
+    elif selected_tab == "🔮 Agente IA":
+        ai_agent.render_ai_agent(data["ai_tickers"], data["ai_pairs"], selected_period_days)
+
+# -------------------------
+# Diagnóstico de desempenho (opt-in)
+# -------------------------
+if perf_panel_enabled():
+    render_perf_panel(data)
 
 
     
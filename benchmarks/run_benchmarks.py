@@ -0,0 +1,295 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from contextlib import redirect_stdout
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+from benchmarks.synthetic import generate_market, MISSING_PATTERNS
+
+# =============================
+# Benchmarks dos caminhos críticos
+# =============================
+# Gera um mercado sintético por escala (sem rede), roda as etapas do pipeline, os
+# loaders de utils/db.py e a preparação de dados das páginas num diretório temporário
+# e grava os tempos em JSON. Com --compare, compara com um resultado anterior.
+#   python benchmarks/run_benchmarks.py --scales small,medium --output bench.json
+#   python benchmarks/run_benchmarks.py --compare bench.json --fail-on-regression
+SCALES = {
+    "small": (10, 365),
+    "medium": (25, 1095),
+    "large": (50, 2190),
+}
+DEFAULT_REPEAT = 3
+# Linhas gravadas na comparação bulk_write x to_sql(method="multi") (o to_sql é lento
+# demais para a tabela inteira nas escalas maiores)
+BULK_BENCH_ROWS = 50_000
+# Tempo atual / tempo de referência (melhor execução, menos sujeita a ruído) acima
+# disso conta como regressão
+REGRESSION_THRESHOLD = 1.2
+
+
+def _timeit(func, repeat, setup=None):
+    """
+    Executa func repeat vezes (setup antes de cada uma, fora da medição).
+    Retorna (tempos em segundos, resultado da última execução).
+    """
+    times, result = [], None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - start)
+    return times, result
+
+
+def _rows(result):
+    if hasattr(result, "__len__") and not isinstance(result, (str, dict)):
+        return len(result)
+    return result if isinstance(result, int) else None
+
+
+def _prepare_workdir(work_dir):
+    # Tudo que os módulos gravam fica no diretório temporário, mesmo com variáveis
+    # de ambiente apontando para os dados reais
+    os.chdir(work_dir)
+    os.environ["CORR_CUBE_DIR"] = os.path.join(work_dir, "correlation_cube")
+    os.environ["PARQUET_DIR"] = os.path.join(work_dir, "parquet_data")
+    os.environ["PRICE_CACHE_DIR"] = os.path.join(work_dir, "price_cache")
+    os.environ["AI_CACHE_DIR"] = os.path.join(work_dir, "ai_cache")
+
+
+def _silence_streamlit():
+    # Fora do servidor, cada função cacheada avisa "No runtime found" (antes de importar utils.db)
+    from streamlit.logger import set_log_level
+    set_log_level("error")
+
+
+def _seed_market_caps(tickers, cache_path):
+    # MarketCap vem do cache em disco (sem chamadas ao Yahoo Finance)
+    cache = {t: {"MarketCap": 1e9 * (i + 1), "fetched_at": time.time()} for i, t in enumerate(tickers)}
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+
+
+def run_scale(scale, n_tickers, n_days, missing, repeat, seed, work_dir):
+    """
+    Roda todos os benchmarks numa escala. Retorna a lista de resultados.
+    """
+    from update_data import correlation, rs
+    from utils import db, corr_engine
+    from utils.panel import PricePanel, PANEL_COLUMNS
+    from utils.portfolio import simulate_portfolios
+    from utils.ai_features import compute_ai_features, update_ai_features, build_ai_context
+    from utils.sqlite_store import bulk_write, create_sqlite_engine
+
+    # Bancos e cubo da escala anterior saem antes de gerar os novos (conexões fechadas antes)
+    db.invalidate_caches()
+    correlation.engine.dispose()
+    for name in os.listdir(work_dir):
+        path = os.path.join(work_dir, name)
+        shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+
+    frames = generate_market(n_tickers, n_days, missing=missing, seed=seed)
+    _seed_market_caps(frames, rs.MARKETCAP_CACHE_PATH)
+    with redirect_stdout(io.StringIO()):
+        close, volume = rs.prices_from_frames(frames)
+        high, low = rs.ranges_from_frames(frames, close.index)
+        corr_close = correlation.closes_from_frames(frames, sorted(frames))
+
+    results = []
+    info = {"scale": scale, "n_tickers": n_tickers, "n_days": n_days, "missing": missing,
+            "n_dates_aligned": len(close)}
+
+    def bench(name, func, setup=None):
+        times, result = _timeit(func, repeat, setup)
+        results.append({
+            "benchmark": name, **info, "rows": _rows(result),
+            "seconds": {"min": min(times), "median": statistics.median(times),
+                        "mean": statistics.fmean(times)},
+            "runs": times,
+        })
+        print(f"⏱️ [{scale}] {name}: {statistics.median(times) * 1000:.1f} ms (mediana de {repeat})")
+        return result
+
+    # ----------------- Pipeline -----------------
+    bench("correlation.compute_all_rolling_correlations",
+          lambda: correlation.compute_all_rolling_correlations(corr_close, correlation.ROLLING_WINDOWS))
+    bench("rs.compute_relative_strength", lambda: rs.compute_relative_strength(close, rs.WINDOWS))
+    bench("rs.compute_technical_indicators",
+          lambda: rs.compute_technical_indicators(close, volume, high, low))
+    bench("rs.save_prices_to_sqlite",
+          lambda: rs.save_prices_to_sqlite(close, volume, rs.DB_PATH, df_high=high, df_low=low))
+    bench("ai_features.compute_ai_features", lambda: compute_ai_features(close))
+
+    # ----------------- Gravação no SQLite: bulk_write x to_sql(method="multi") -----------------
+    df_bulk = rs.compute_relative_strength(close, rs.WINDOWS).head(BULK_BENCH_ROWS)
+    bulk_engine = create_sqlite_engine(f"sqlite:///{os.path.join(work_dir, 'bulk_write.db')}")
+
+    def write_bulk():
+        bulk_write(df_bulk, bulk_engine, "bench")
+        return len(df_bulk)
+
+    bench("sqlite_store.bulk_write", write_bulk)
+    # Cada INSERT multi-linha cabe no limite de parâmetros do SQLite (999 nas versões antigas)
+    bench("pandas.to_sql(method=multi)",
+          lambda: df_bulk.to_sql("bench", con=bulk_engine, if_exists="replace", index=False,
+                                 method="multi", chunksize=999 // len(df_bulk.columns)))
+    bulk_engine.dispose()
+
+    # Demais tabelas lidas pelos loaders (fora da medição)
+    with redirect_stdout(io.StringIO()):
+        rs.update_relative_strength(close)
+        correlation.update_correlations(corr_close)
+        update_ai_features(close, rs.DB_PATH)
+
+    # ----------------- Loaders (cache do Streamlit limpo antes de cada execução) -----------------
+    loaders = {
+        "db.load_price_data": lambda: db.load_price_data(),
+        "db.load_price_data(panel)": lambda: db.load_price_data(columns=tuple(PANEL_COLUMNS)),
+        "db.load_rs_data": lambda: db.load_rs_data(),
+        "db.load_corr_data": lambda: db.load_corr_data(),
+        "db.load_rs_latest": lambda: db.load_rs_latest(),
+        "db.load_corr_latest": lambda: db.load_corr_latest(),
+        "db.load_corr_cube": lambda: db.load_corr_cube(),
+        "db.load_corr_matrix": lambda: db.load_corr_matrix(),
+        "db.load_ai_tickers": lambda: db.load_ai_tickers(),
+        "db.load_ai_pairs": lambda: db.load_ai_pairs(),
+    }
+    for name, loader in loaders.items():
+        bench(name, loader, setup=db.invalidate_caches)
+
+    # ----------------- Preparação de dados das páginas -----------------
+    df_panel = db.load_price_data(columns=tuple(PANEL_COLUMNS))
+    bench("panel.PricePanel(90d)", lambda: PricePanel(df_panel, 90).performance)
+    panel = PricePanel(df_panel, 90)
+    assets = list(panel.tickers[:5])
+    bench("portfolio.simulate_portfolios(5 ativos)",
+          lambda: simulate_portfolios(panel.returns_for(assets))["portfolios"])
+
+    matrix = db.load_corr_matrix()
+    bench("corr_engine.rolling_correlation(45d)",
+          lambda: corr_engine.rolling_correlation(matrix, 45), setup=corr_engine.clear_cache)
+    # Gerador: list() consome todos os quadros, senão só a criação do gerador é medida
+    bench("corr_engine.correlation_matrix_sequence(30 quadros)",
+          lambda: list(corr_engine.correlation_matrix_sequence(matrix, matrix.dates[-30:], 30)))
+
+    df_tickers, df_pairs = db.load_ai_tickers(), db.load_ai_pairs()
+    bench("ai_features.build_ai_context(30d)", lambda: build_ai_context(df_tickers, df_pairs, 30))
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _metadata(args):
+    import numpy as np
+    import pandas as pd
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "missing": args.missing,
+        "scales": {name: SCALES[name] for name in args.scales},
+    }
+
+
+def compare_results(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compara o melhor tempo por (benchmark, escala, padrão de ausência). Retorna a lista
+    de regressões (razão atual/referência acima de threshold) e imprime a tabela.
+    """
+    def key(r):
+        return r["benchmark"], r["scale"], r["missing"]
+
+    reference = {key(r): r["seconds"]["min"] for r in baseline["results"]}
+    regressions = []
+    print(f"\n📊 Comparação com {baseline['meta'].get('git_commit')} ({baseline['meta'].get('created_at')})")
+    if not any(key(r) in reference for r in current["results"]):
+        print("⚠️ Nenhum benchmark em comum (confira escalas e padrão de ausências).")
+    for result in current["results"]:
+        old = reference.get(key(result))
+        if old is None:
+            continue
+        ratio = result["seconds"]["min"] / old if old > 0 else float("inf")
+        flag = "❌" if ratio > threshold else ("✅" if ratio < 1 / threshold else "  ")
+        print(f"{flag} [{result['scale']}] {result['benchmark']}: {old * 1000:.1f} -> "
+              f"{result['seconds']['min'] * 1000:.1f} ms ({ratio:.2f}x)")
+        if ratio > threshold:
+            regressions.append({"benchmark": result["benchmark"], "scale": result["scale"], "ratio": ratio})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline, loaders e páginas com dados sintéticos.")
+    parser.add_argument("--scales", default="small,medium",
+                        help=f"Escalas separadas por vírgula: {', '.join(SCALES)}.")
+    parser.add_argument("--missing", default="none", choices=MISSING_PATTERNS,
+                        help="Padrão de dados ausentes do mercado sintético.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json", help="Arquivo JSON com os resultados.")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparação.")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Sai com código 1 se algum benchmark ficar mais lento que o limite.")
+    parser.add_argument("--keep", action="store_true", help="Mantém o diretório temporário com os bancos.")
+    args = parser.parse_args()
+    args.scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in args.scales if s not in SCALES]
+    if unknown:
+        parser.error(f"Escalas desconhecidas: {unknown}")
+
+    output_path = os.path.abspath(args.output)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    original_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix="bench_")
+    _prepare_workdir(work_dir)
+    _silence_streamlit()
+
+    print(f"🏁 Benchmarks em {work_dir} (escalas: {', '.join(args.scales)}, ausências: {args.missing})")
+    report = {"meta": _metadata(args), "results": []}
+    try:
+        for scale in args.scales:
+            n_tickers, n_days = SCALES[scale]
+            report["results"] += run_scale(scale, n_tickers, n_days, args.missing, args.repeat, args.seed,
+                                           work_dir)
+    finally:
+        os.chdir(original_dir)
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Resultados salvos em {output_path}")
+
+    if baseline is not None:
+        regressions = compare_results(report, baseline, args.threshold)
+        if regressions and args.fail_on_regression:
+            print(f"❌ {len(regressions)} regressão(ões) acima de {args.threshold:.2f}x")
+            sys.exit(1)
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+# =============================
+# Gerador de mercado sintético (OHLCV diário, sem rede)
+# =============================
+# Mesmo formato de utils.price_cache.get_prices: {ticker: DataFrame Open/High/Low/Close/Volume
+# indexado por Date}. Os retornos têm um fator de mercado comum, para as correlações
+# não serem todas ~0, e a volatilidade varia por ativo.
+MISSING_PATTERNS = ["none", "gaps", "late_listing", "mixed"]
+
+
+def synthetic_tickers(n_tickers):
+    return [f"SYN{i:03d}-USD" for i in range(n_tickers)]
+
+
+def _missing_mask(n_days, n_tickers, pattern, missing_rate, rng):
+    """
+    Matriz datas x ativos com True onde o dado falta.
+    gaps: barras ausentes ao acaso (missing_rate); late_listing: metade dos ativos
+    começa depois (até 1/3 do histórico); mixed: os dois.
+    """
+    mask = np.zeros((n_days, n_tickers), dtype=bool)
+    if pattern in ("gaps", "mixed"):
+        mask |= rng.random((n_days, n_tickers)) < missing_rate
+    if pattern in ("late_listing", "mixed"):
+        late = rng.choice(n_tickers, size=n_tickers // 2, replace=False)
+        starts = rng.integers(1, max(2, n_days // 3), size=len(late))
+        for ticker, start in zip(late, starts):
+            mask[:start, ticker] = True
+    return mask
+
+
+def generate_market(n_tickers=10, n_days=365, missing="none", missing_rate=0.01, seed=0,
+                    end="2024-12-31"):
+    """
+    Gera n_tickers ativos com n_days barras diárias terminando em end.
+    missing: um de MISSING_PATTERNS. Retorna {ticker: DataFrame OHLCV}.
+    """
+    if missing not in MISSING_PATTERNS:
+        raise ValueError(f"Padrão de dados ausentes desconhecido: {missing} (use {MISSING_PATTERNS})")
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=pd.Timestamp(end), periods=n_days, freq="D", name="Date")
+
+    # Retornos log: beta * mercado + ruído idiossincrático
+    market = rng.normal(0.0003, 0.025, n_days)
+    beta = rng.uniform(0.5, 1.5, n_tickers)
+    vol = rng.uniform(0.01, 0.05, n_tickers)
+    log_ret = market[:, None] * beta + rng.normal(0, 1, (n_days, n_tickers)) * vol
+    close = rng.uniform(1, 1000, n_tickers) * np.exp(np.cumsum(log_ret, axis=0))
+
+    open_ = np.vstack([close[:1], close[:-1]]) * (1 + rng.normal(0, 0.002, (n_days, n_tickers)))
+    spread = np.abs(rng.normal(0, 0.01, (n_days, n_tickers)))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.lognormal(15, 1, (n_days, n_tickers))
+
+    mask = _missing_mask(n_days, n_tickers, missing, missing_rate, rng)
+    frames = {}
+    for i, ticker in enumerate(synthetic_tickers(n_tickers)):
+        df = pd.DataFrame({"Open": open_[:, i], "High": high[:, i], "Low": low[:, i],
+                           "Close": close[:, i], "Volume": volume[:, i]}, index=dates)
+        frames[ticker] = df[~mask[:, i]]
+    return frames
@@ -1,14 +1,65 @@
+import os
 import streamlit as st
-import pandas as pd
-from openai import OpenAI   # ✅ nova forma, não precisa mais do `import openai`
+from utils.ai_cache import cache_key, get_cached_response, save_response
+from utils.ai_client import stream_answer
+from utils.ai_features import build_ai_context
+from utils.db import get_data_version
+from utils.timing import timed
 
-def render_ai_agent(df_prices, df_rs, df_corr, selected_period_days):
+# Dados usados pela página (carregados por utils.db.load_page_data): só o resumo
+# pré-calculado pelo pipeline (utils/ai_features.py)
+DATA_REQUIREMENTS = {
+    "ai_tickers": None,
+    "ai_pairs": None,
+}
+
+# Modelo e endpoint (OPENAI_BASE_URL aponta para o stub de testes em tests/openai_stub.py)
+AI_MODEL = os.environ.get("AI_MODEL", "gpt-4o-mini")
+SYSTEM_PROMPT = """Você é um analista financeiro especializado em criptomoedas. 
+                                Analise os dados fornecidos e forneça insights claros e acionáveis. 
+                                Use métricas técnicas quando relevante e seja específico com números e percentuais.
+                                Responda com base nos dados do contexto: performance, volatilidade,
+                                correlações e força relativa entre os ativos no período."""
+
+
+def _secret(name, env_name):
+    # Segredo do .secrets.toml, com a variável de ambiente como alternativa. Sem
+    # secrets.toml o st.secrets gera StreamlitSecretNotFoundError (FileNotFoundError
+    # nas versões anteriores, e classe base dela nas atuais)
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except FileNotFoundError:
+        pass
+    return os.environ.get(env_name)
+
+
+@st.cache_data(max_entries=16)
+def _cached_context(_df_tickers, _df_pairs, period_days, data_version):
+    # Mesma versão dos dados e período => mesmo contexto (os DataFrames não entram no hash)
+    return build_ai_context(_df_tickers, _df_pairs, period_days)
+
+
+def build_messages(user_prompt, context):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": context},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+@timed("pages.ai_agent.render_ai_agent")
+def render_ai_agent(df_tickers, df_pairs, selected_period_days):
     """
-    Renderiza a interface do agente de IA para análise e previsões
+    Renderiza a interface do agente de IA para análise e previsões.
+    A OpenAI só é chamada ao enviar o formulário, com a resposta transmitida em streaming;
+    respostas já obtidas para a mesma pergunta, período, versão dos dados e modelo vêm
+    do cache (utils/ai_cache.py).
     """
-    
+    api_key = _secret("openai_api_key", "OPENAI_API_KEY")
+
     # Verificar se a chave da API está configurada
-    if "openai_api_key" not in st.secrets:
+    if not api_key:
         st.error("⚠️ Chave da API OpenAI não configurada!")
         st.info("💡 Configure sua chave da API no arquivo .secrets.toml")
         st.code("""
@@ -17,94 +68,67 @@ def render_ai_agent(df_prices, df_rs, df_corr, selected_period_days):
 openai_api_key = "sua_chave_da_openai_aqui"
         """)
         return
-    
-    user_prompt = st.text_area(
-        "Digite sua pergunta sobre os dados financeiros:", 
-        placeholder="Ex: Qual ativo teve maior volatilidade nos últimos 30 dias?",
-        height=100
-    )
-        
+
+    if df_tickers.empty:
+        st.warning("⚠️ Resumo dos dados para a IA ainda não foi gerado. Clique em 🔁 Atualizar Todos os Dados.")
+        return
+
+    # Formulário: digitar ou mudar outros widgets não dispara consultas
+    with st.form("ai_agent_form"):
+        user_prompt = st.text_area(
+            "Digite sua pergunta sobre os dados financeiros:", 
+            placeholder="Ex: Qual ativo teve maior volatilidade nos últimos 30 dias?",
+            height=100
+        )
+        submitted = st.form_submit_button("🔎 Consultar IA", type="primary")
+
     # Processar consulta
-    if st.button("🔎 Consultar IA", type="primary") or user_prompt:
+    streamed = False
+    if submitted:
         if not user_prompt.strip():
             st.warning("⚠️ Por favor, digite uma pergunta ou selecione uma consulta rápida.")
         else:
-            with st.spinner("🤖 Processando sua consulta com IA..."):
-                try:
-                    # Preparar contexto dos dados
-                    context = prepare_data_context(df_prices, df_rs, df_corr, selected_period_days)
-                    
-                    # ✅ Nova forma de usar o cliente OpenAI
-                    client = OpenAI(api_key=st.secrets["openai_api_key"])
-                    completion = client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[
-                            {
-                                "role": "system", 
-                                "content": """Você é um analista financeiro especializado em criptomoedas. 
-                                Analise os dados fornecidos e forneça insights claros e acionáveis. 
-                                Use métricas técnicas quando relevante e seja específico com números e percentuais."""
-                            },
-                            {"role": "system", "content": context},
-                            {"role": "user", "content": user_prompt}
-                        ],
-                        temperature=0.3,
-                        max_tokens=800
-                    )
-                    response = completion.choices[0].message.content
-                    
-                    # Exibir resultado
-                    st.success("✅ Análise concluída!")
-                    st.markdown("### 📋 Resposta da IA")
-                    st.markdown(response)
-                    
-                except Exception as e:
-                    st.error(f"❌ Erro ao acessar OpenAI: {str(e)}")
-                    st.info("💡 Verifique se sua chave da API está correta e se você tem créditos disponíveis.")
-
-
-def prepare_data_context(df_prices, df_rs, df_corr, selected_period_days):
-    """
-    Prepara o contexto dos dados para a IA
-    """
-    # Filtrar dados pelo período selecionado
-    cutoff_date = df_prices['Date'].max() - pd.Timedelta(days=selected_period_days)
-    recent_prices = df_prices[df_prices['Date'] >= cutoff_date]
-    recent_rs = df_rs[df_rs['Date'] >= cutoff_date]
-    recent_corr = df_corr[df_corr['Date'] >= cutoff_date]
-    
-    # Calcular métricas básicas
-    price_stats = recent_prices.groupby('Ticker')['Price'].agg(['last', 'min', 'max', 'std']).round(2)
-    price_changes = recent_prices.groupby('Ticker')['Price'].apply(
-        lambda x: ((x.iloc[-1] - x.iloc[0]) / x.iloc[0] * 100) if len(x) > 1 else 0
-    ).round(2)
-    
-    # Preparar contexto
-    context = f"""
-DADOS FINANCEIROS DISPONÍVEIS (Período: {selected_period_days} dias):
-
-PREÇOS E PERFORMANCE:
-- Período analisado: {selected_period_days} dias
-- Última data: {df_prices['Date'].max().strftime('%d/%m/%Y')}
-- Total de ativos: {len(df_prices['Ticker'].unique())}
-
-ESTATÍSTICAS DE PREÇOS (últimos {selected_period_days} dias):
-{price_stats.to_string()}
-
-VARIAÇÕES PERCENTUAIS:
-{price_changes.to_string()}
-
-FORÇA RELATIVA (últimos dados):
-{df_rs[['Pair', 'RS', 'RS_Smooth']].tail(10).to_string()}
-
-CORRELAÇÕES (últimos dados):
-{df_corr[['Pair', 'RollingCorrelation']].tail(10).to_string()}
+            data_version = get_data_version()
+            key = cache_key(user_prompt, selected_period_days, data_version, AI_MODEL)
+            response = get_cached_response(key)
+            cached = response is not None
+            if response is None:
+                # Preparar contexto dos dados (resumo pré-calculado)
+                context = _cached_context(df_tickers, df_pairs, selected_period_days, data_version)
+                if context is None:
+                    st.warning(f"⚠️ Sem resumo dos dados para o período de {selected_period_days} dias.")
+                else:
+                    try:
+                        # Resposta exibida à medida que chega; a mesma pergunta em andamento em
+                        # outra sessão reaproveita a requisição (utils/ai_client.py)
+                        st.markdown("### 📋 Resposta da IA")
+                        response = st.write_stream(stream_answer(
+                            key, build_messages(user_prompt, context), api_key,
+                            base_url=_secret("openai_base_url", "OPENAI_BASE_URL"), model=AI_MODEL,
+                            on_complete=lambda text: save_response(
+                                key, text, prompt=user_prompt, period_days=selected_period_days,
+                                data_version=data_version, model=AI_MODEL),
+                            temperature=0.3, max_tokens=800,
+                        ))
+                        st.success("✅ Análise concluída!")
+                        streamed = True
+                    except Exception as e:
+                        response = None
+                        st.error(f"❌ Erro ao acessar OpenAI: {str(e)}")
+                        st.info("💡 Verifique se sua chave da API está correta e se você tem créditos disponíveis.")
+            if response is not None:
+                st.session_state["ai_last_answer"] = {"prompt": user_prompt, "response": response,
+                                                      "period_days": selected_period_days, "cached": cached}
 
-INSTRUÇÕES:
-- Use estes dados para responder perguntas sobre performance, volatilidade, correlações e tendências
-- Forneça números específicos e percentuais quando relevante
-- Identifique padrões e oportunidades de investimento
-- Seja claro e objetivo nas recomendações
-"""
-    
-    return context
+    # Última resposta continua visível nas próximas interações com a página
+    # (na rodada em que foi transmitida ela já está na tela)
+    last = st.session_state.get("ai_last_answer")
+    if last is not None and not streamed:
+        st.success("✅ Análise concluída!")
+        st.markdown("### 📋 Resposta da IA")
+        if last["cached"]:
+            st.caption("♻️ Resposta reaproveitada do cache (mesma pergunta, período e dados).")
+        if last["period_days"] != selected_period_days:
+            st.caption(f"Resposta calculada para o período de {last['period_days']} dias. "
+                       "Envie a pergunta novamente para o período atual.")
+        st.markdown(last["response"])
@@ -1,8 +1,22 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-
-def render_correlation(df_corr):
+import plotly.express as px
+import numpy as np
+from utils.corr_engine import (
+    rolling_correlation, latest_correlations, correlation_matrix_at, correlation_matrix_sequence
+)
+from utils.timing import timed
+
+# Dados usados pela página (carregados por utils.db.load_page_data)
+DATA_REQUIREMENTS = {
+    "corr_latest": None,
+    "corr_cube": None,
+    "corr_matrix": None,
+}
+
+@timed("pages.correlation.render_correlation")
+def render_correlation(df_corr_latest, corr_cube, corr_matrix):
     st.header("📈 Análise de Correlação entre Ativos")
 
     # ------------------- Seletor numérico da janela -------------------
@@ -11,13 +25,14 @@ def render_correlation(df_corr):
         min_value=1, max_value=180, value=30, step=1
     )
 
-    # Filtra a tabela apenas pela janela escolhida
-    if "Window" not in df_corr.columns:
-        df_corr["Window"] = window_days
-    df_table = df_corr[df_corr["Window"] == window_days]
-
-    last_date_corr = df_table["Date"].max()
-    df_latest_corr = df_table[df_table["Date"] == last_date_corr].dropna(subset=["RollingCorrelation"])
+    # Última correlação de cada par na janela escolhida: tabela pré-calculada no pipeline
+    # ou, para janelas fora dela, cálculo sob demanda a partir dos fechamentos
+    precomputed = window_days in set(df_corr_latest["Window"].unique())
+    if precomputed:
+        df_latest_corr = df_corr_latest[df_corr_latest["Window"] == window_days]
+    else:
+        df_latest_corr = latest_correlations(corr_matrix, window_days)
+    ranking_columns = ["Pair", "RollingCorrelation", "Change_1D", "Change_7D"]
 
     # ------------------- Tabela de Top Correlações -------------------
     col1, col2 = st.columns(2)
@@ -25,20 +40,26 @@ def render_correlation(df_corr):
         st.markdown("#### 🔝 Top Correlações Positivas")
         st.dataframe(
             df_latest_corr.sort_values("RollingCorrelation", ascending=False)
-            .head(10)[["Pair", "RollingCorrelation"]]
+            .head(10)[ranking_columns]
         )
     with col2:
         st.markdown("#### 🔻 Top Correlações Negativas")
         st.dataframe(
             df_latest_corr.sort_values("RollingCorrelation", ascending=True)
-            .head(10)[["Pair", "RollingCorrelation"]]
+            .head(10)[ranking_columns]
         )
 
+    # ------------------- Mapa de calor (matriz N x N) -------------------
+    render_correlation_heatmap(corr_matrix, window_days)
+
     # ------------------- Gráfico de Correlação Móvel -------------------
     st.markdown("### 📊 Gráfico de Correlação Móvel")
 
+    all_pairs = corr_cube.pairs if corr_cube is not None else corr_matrix.pairs
+    dates = corr_cube.dates if corr_cube is not None else corr_matrix.dates
+
     # Filtro de ativos (apenas para o gráfico)
-    assets = sorted(set(a for pair in df_corr["Pair"].unique() for a in pair.split("/")))
+    assets = sorted(set(a for pair in all_pairs for a in pair.split("/")))
     default_assets = [a for a in ["BTC-USD", "ETH-USD"] if a in assets]
     selected_assets = st.multiselect(
         "🔍 Selecionar ativos para o gráfico:",
@@ -46,33 +67,29 @@ def render_correlation(df_corr):
         default=default_assets
     )
 
-    df_filtered = df_corr.copy()
+    available_pairs = all_pairs
     if selected_assets:
-        df_filtered = df_filtered[
-            df_filtered["Pair"].apply(lambda x: all(a in x for a in selected_assets))
-        ]
+        available_pairs = [p for p in available_pairs if all(a in p for a in selected_assets)]
 
-    min_date = df_filtered["Date"].min()
-    max_date = df_filtered["Date"].max()
+    min_date = dates.min()
+    max_date = dates.max()
     date_range = st.date_input("📅 Intervalo de datas:", [min_date, max_date])
 
-    df_filtered = df_filtered[
-        (df_filtered["Date"] >= pd.to_datetime(date_range[0])) &
-        (df_filtered["Date"] <= pd.to_datetime(date_range[1]))
-    ]
-
     # Seleção de um par específico para o gráfico
-    available_pairs = df_filtered["Pair"].unique()
     if len(available_pairs) == 0:
         st.info("Não há pares disponíveis nesse filtro.")
         return
 
     selected_pair = st.selectbox("Escolha um par para o gráfico:", available_pairs)
-    df_pair = df_filtered[df_filtered["Pair"] == selected_pair].dropna(subset=["RollingCorrelation"])
+    if corr_cube is not None and corr_cube.has_window(window_days):
+        # Histórico do par lido direto do cubo (só as páginas do par/janela saem do disco)
+        history = corr_cube.pair_history(selected_pair, window_days)
+    else:
+        history = rolling_correlation(corr_matrix, window_days, [selected_pair])[selected_pair]
+    history = history[pd.to_datetime(date_range[0]):pd.to_datetime(date_range[1])].dropna()
 
-    if not df_pair.empty:
-        # Ordenar e resetar índice para evitar problemas visuais
-        df_pair = df_pair.sort_values("Date").reset_index(drop=True)
+    if not history.empty:
+        df_pair = history.rename("RollingCorrelation").rename_axis("Date").reset_index()
 
         # Criar gráfico limpo, apenas linha, sem área
         fig = go.Figure()
@@ -97,3 +114,42 @@ def render_correlation(df_corr):
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("Não há dados suficientes para o par selecionado nesse intervalo de datas.")
+
+
+@timed("pages.correlation.render_correlation_heatmap")
+def render_correlation_heatmap(corr_matrix, window_days, n_frames=30):
+    st.markdown("### 🌡️ Matriz de Correlação dos Retornos Diários")
+
+    heat_date = st.date_input(
+        "📅 Data da matriz:", corr_matrix.dates.max(),
+        min_value=corr_matrix.dates.min(), max_value=corr_matrix.dates.max()
+    )
+    animate = st.checkbox(f"▶️ Animar as últimas {n_frames} datas até a data escolhida")
+
+    labels = dict(x="", y="", color="Correlação (retornos)")
+    if animate:
+        end_row = corr_matrix.dates.searchsorted(pd.Timestamp(heat_date), side="right")
+        dates = corr_matrix.dates[max(0, end_row - n_frames):end_row]
+        frames = list(correlation_matrix_sequence(corr_matrix, dates, window_days))
+        if not frames:
+            st.info("Não há dados suficientes para essa janela.")
+            return
+        tickers = frames[0][1].columns
+        fig = px.imshow(
+            np.stack([m.values for _, m in frames]), x=tickers, y=tickers,
+            animation_frame=0, zmin=-1, zmax=1, color_continuous_scale="RdBu_r", labels=labels
+        )
+        # Datas como rótulos do controle deslizante
+        for step, (date, _) in zip(fig.layout.sliders[0].steps, frames):
+            step.label = date.strftime("%Y-%m-%d")
+    else:
+        matrix = correlation_matrix_at(corr_matrix, heat_date, window_days)
+        if matrix is None:
+            st.info("Não há dados suficientes para essa janela.")
+            return
+        fig = px.imshow(
+            matrix, text_auto=".2f", zmin=-1, zmax=1, color_continuous_scale="RdBu_r", labels=labels
+        )
+
+    fig.update_layout(title=f"Correlação dos retornos {window_days}D em {pd.Timestamp(heat_date).date()}")
+    st.plotly_chart(fig, use_container_width=True)
@@ -3,57 +3,28 @@ import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 import numpy as np
-
-def render_rankings(df_prices, selected_period_days):
-    # -----------------------------
-    # Garantir que Date é datetime
-    # -----------------------------
-    df_prices["Date"] = pd.to_datetime(df_prices["Date"])
-
-    # -----------------------------
-    # Última data válida (preço e MarketCap)
-    # -----------------------------
-    last_date_rs = df_prices.dropna(subset=["Price", "MarketCap"])["Date"].max()
-    start_date_rs = last_date_rs - pd.Timedelta(days=selected_period_days)
-
-    # Filtrar período selecionado
-    df_period = df_prices[(df_prices["Date"] >= start_date_rs) & (df_prices["Date"] <= last_date_rs)]
-    if df_period.empty or df_period["Date"].nunique() < 2:
+from utils.db import load_portfolio_simulation
+from utils.portfolio import REBALANCE_OPTIONS
+from utils.timing import timed
+
+# Dados usados pela página (carregados por utils.db.load_page_data): o painel
+# (utils/panel.py) com as colunas de utils.panel.PANEL_COLUMNS, já recortado pelo
+# período selecionado
+DATA_REQUIREMENTS = {
+    "rankings_panel": None,
+}
+
+def _ticker_traces(matrix, tickers, trace, **kwargs):
+    # Uma série por ativo, lida direto da matriz larga (datas x ativos)
+    return [trace(x=matrix.index, y=matrix[ticker], name=ticker, **kwargs) for ticker in tickers]
+
+@timed("pages.rankings.render_rankings")
+def render_rankings(panel):
+    if not panel.is_valid:
         st.warning("📆 Intervalo insuficiente para análise.")
         return
 
-    # -----------------------------
-    # Performance
-    # -----------------------------
-    start_prices = df_period[df_period["Date"] == df_period["Date"].min()].set_index("Ticker")["Price"]
-    end_prices = df_period[df_period["Date"] == df_period["Date"].max()].set_index("Ticker")["Price"]
-    performance = ((end_prices / start_prices) - 1).sort_values(ascending=False)
-
-    # -----------------------------
-    # Outros indicadores
-    # -----------------------------
-    volume_total = df_period.groupby("Ticker")["Volume"].sum().rename("Volume Total")
-    indicators_avg = df_period.groupby("Ticker")[["RSI", "SMA_20","SMA_50"]].mean()
-    current_prices = df_period[df_period["Date"] == last_date_rs].set_index("Ticker")["Price"].rename("Preço Atual")
-    current_marketcap = df_period[df_period["Date"] == last_date_rs].set_index("Ticker")["MarketCap"].rename("MarketCap")
-
-    # -----------------------------
-    # Montar DataFrame final
-    # -----------------------------
-    performance_df = (
-        performance.to_frame("Retorno")
-        .merge(volume_total, left_index=True, right_index=True)
-        .merge(indicators_avg, left_index=True, right_index=True)
-        .merge(current_prices, left_index=True, right_index=True)
-        .merge(current_marketcap, left_index=True, right_index=True)
-        .reset_index()
-    )
-
-    # <<< Aqui: reordenar colunas para trazer 'Preço Atual' para mais perto do início
-    cols = performance_df.columns.tolist()
-    if "Preço Atual" in cols:
-        cols.insert(1, cols.pop(cols.index("Preço Atual")))  # move para a posição 1
-    performance_df = performance_df[cols]
+    performance_df = panel.performance
 
     # -----------------------------
     # Slider de Top N
@@ -102,10 +73,8 @@ def render_rankings(df_prices, selected_period_days):
         st.plotly_chart(fig_mc_ganhadores, use_container_width=True, key=f"mc_ganhadores_{top_n}")
 
          # Gráfico RSI
-        fig_rsi_ganhadores = go.Figure()
-        for ticker in top_pos["Ticker"].tolist()[:3]:
-            df_t = df_period[df_period["Ticker"] == ticker]
-            fig_rsi_ganhadores.add_trace(go.Scatter(x=df_t["Date"], y=df_t["RSI"], mode="lines+markers", name=ticker))
+        fig_rsi_ganhadores = go.Figure(_ticker_traces(panel.rsi, top_pos["Ticker"].tolist()[:3],
+                                                      go.Scatter, mode="lines+markers"))
         fig_rsi_ganhadores.update_layout(title="📈 RSI - Top 3 Ganhadores", yaxis_title="RSI")
         st.plotly_chart(fig_rsi_ganhadores, use_container_width=True, key=f"rsi_ganhadores_{top_n}")
 
@@ -145,10 +114,8 @@ def render_rankings(df_prices, selected_period_days):
         st.plotly_chart(fig_mc_perdedores, use_container_width=True, key=f"mc_perdedores_{top_n}")
 
         # Gráfico RSI
-        fig_rsi_perdedores = go.Figure()
-        for ticker in top_neg["Ticker"].tolist()[:3]:
-            df_t = df_period[df_period["Ticker"] == ticker]
-            fig_rsi_perdedores.add_trace(go.Scatter(x=df_t["Date"], y=df_t["RSI"], mode="lines+markers", name=ticker))
+        fig_rsi_perdedores = go.Figure(_ticker_traces(panel.rsi, top_neg["Ticker"].tolist()[:3],
+                                                      go.Scatter, mode="lines+markers"))
         fig_rsi_perdedores.update_layout(title="📉 RSI - Top 3 Perdedores", yaxis_title="RSI")
         st.plotly_chart(fig_rsi_perdedores, use_container_width=True, key=f"rsi_perdedores_{top_n}")
 
@@ -160,7 +127,7 @@ def render_rankings(df_prices, selected_period_days):
     st.header("🔎 Análise Comparativa Aprofundada")
 
     # Seleção de ativos com base nos que apareceram no período filtrado
-    tickers_disponiveis = sorted(df_period["Ticker"].unique())
+    tickers_disponiveis = panel.tickers
     ativos_selecionados = st.multiselect(
         "Selecione os ativos para comparar:",
         options=tickers_disponiveis,
@@ -168,76 +135,35 @@ def render_rankings(df_prices, selected_period_days):
     )
 
     if ativos_selecionados:
-        df_sel = df_period[df_period["Ticker"].isin(ativos_selecionados)]
-
         # -----------------------------
         # Gráfico de Retorno acumulado
         # -----------------------------
-        fig_ret = go.Figure()
-        for ticker in ativos_selecionados:
-            df_t = df_sel[df_sel["Ticker"] == ticker].sort_values("Date")
-            ret_acumulado = (df_t["Price"] / df_t["Price"].iloc[0] - 1) * 100
-            fig_ret.add_trace(go.Scatter(
-                x=df_t["Date"], y=ret_acumulado, mode="lines+markers", name=ticker
-            ))
+        precos = panel.price[ativos_selecionados]
+        # Base = primeiro preço disponível de cada ativo no período
+        ret_acumulado = (precos / precos.bfill().iloc[0] - 1) * 100
+        fig_ret = go.Figure(_ticker_traces(ret_acumulado, ativos_selecionados, go.Scatter, mode="lines+markers"))
         fig_ret.update_layout(title="📈 Retorno Acumulado (%)", yaxis_title="Retorno (%)")
         st.plotly_chart(fig_ret, use_container_width=True, key="retorno_selecao")
 
         # -----------------------------
         # Gráfico de Volume
         # -----------------------------
-        fig_vol = go.Figure()
-        for ticker in ativos_selecionados:
-            df_t = df_sel[df_sel["Ticker"] == ticker].sort_values("Date")
-            fig_vol.add_trace(go.Bar(x=df_t["Date"], y=df_t["Volume"], name=ticker))
+        fig_vol = go.Figure(_ticker_traces(panel.volume, ativos_selecionados, go.Bar))
         fig_vol.update_layout(barmode="group", title="📊 Volume negociado")
         st.plotly_chart(fig_vol, use_container_width=True, key="volume_selecao")
 
         # -----------------------------
         # Gráfico de RSI
         # -----------------------------
-        fig_rsi = go.Figure()
-        for ticker in ativos_selecionados:
-            df_t = df_sel[df_sel["Ticker"] == ticker].sort_values("Date")
-            fig_rsi.add_trace(go.Scatter(
-                x=df_t["Date"], y=df_t["RSI"], mode="lines+markers", name=ticker
-            ))
+        fig_rsi = go.Figure(_ticker_traces(panel.rsi, ativos_selecionados, go.Scatter, mode="lines+markers"))
         fig_rsi.update_layout(title="📉 RSI dos Ativos Selecionados", yaxis_title="RSI")
         st.plotly_chart(fig_rsi, use_container_width=True, key="rsi_selecao")
 
-
-        # Garantir que retornos estão calculados
-        df_ret = (
-            df_sel.groupby("Ticker")[["Date", "Price"]]
-            .apply(lambda x: x.set_index("Date")["Price"].pct_change())
-            .unstack(level=0)
-        ).dropna()
-
-        # Se apenas 1 ativo for selecionado → garantir DataFrame
-        if isinstance(df_ret, pd.Series):
-            df_ret = df_ret.to_frame()
-
-        # Tratar MultiIndex e garantir consistência de nomes
-        if isinstance(df_ret.columns, pd.MultiIndex):
-            df_ret.columns = df_ret.columns.droplevel(0)
-
-        # Converter nomes das colunas para string
-        df_ret.columns = [str(c) for c in df_ret.columns]
-
         # -----------------------------
 
-    # Calcular retornos de forma robusta
-    df_ret = (
-        df_sel.pivot(index="Date", columns="Ticker", values="Price")
-        .pct_change()
-        .dropna()
-    )
-
-    # Garantir que as colunas sejam strings
-    df_ret.columns = df_ret.columns.astype(str)
-
-    # Filtrar apenas os ativos selecionados que realmente existem no df_ret
-    colunas_validas = [a for a in ativos_selecionados if a in df_ret.columns]
+    # Retornos diários dos ativos selecionados (matriz do painel, sem recalcular)
+    df_ret = panel.returns_for(ativos_selecionados)
+    colunas_validas = list(df_ret.columns)
 
     if not colunas_validas:
         st.warning("⚠️ Nenhum dos ativos selecionados possui dados suficientes para o gráfico de risco x retorno.")
@@ -275,19 +201,7 @@ def render_rankings(df_prices, selected_period_days):
     # -----------------------------
     st.subheader("💼 Simulação de Carteira")
 
-    # Calcular retornos de forma robusta
-    df_ret = (
-        df_sel.pivot(index="Date", columns="Ticker", values="Price")
-        .pct_change()
-        .dropna()
-    )
-
-    # Garantir que as colunas sejam strings
-    df_ret.columns = df_ret.columns.astype(str)
-
-    # Filtrar apenas os ativos selecionados que realmente existem no df_ret
-    colunas_validas = [a for a in ativos_selecionados if a in df_ret.columns]
-
+    # Mesmos retornos da seção anterior
     if not colunas_validas:
         st.warning("⚠️ Nenhum dos ativos selecionados possui dados suficientes para a simulação.")
     else:
@@ -329,3 +243,63 @@ def render_rankings(df_prices, selected_period_days):
             st.write(f"**Retorno acumulado:** {(evol_carteira.iloc[-1]-1)*100:.2f}%")
         else:
             st.warning("⚠️ Ajuste os pesos para que somem mais que zero.")
+
+        render_portfolio_optimization(panel, colunas_validas)
+
+
+def _weights_table(portfolio, assets):
+    return portfolio[assets].astype(float).rename("Peso").to_frame().style.format({"Peso": "{:.1%}"})
+
+@timed("pages.rankings.render_portfolio_optimization")
+def render_portfolio_optimization(panel, assets):
+    # -----------------------------
+    # c) Otimização por Monte Carlo
+    # -----------------------------
+    st.subheader("🎲 Otimização de Carteira (Monte Carlo)")
+    if len(assets) < 2:
+        st.info("Selecione pelo menos 2 ativos para a otimização.")
+        return
+
+    rebalance_label = st.selectbox("Rebalanceamento:", list(REBALANCE_OPTIONS.keys()))
+    result = load_portfolio_simulation(assets, panel.period_days, REBALANCE_OPTIONS[rebalance_label])
+    portfolios, frontier = result["portfolios"], result["frontier"]
+    max_sharpe, min_vol = result["max_sharpe"], result["min_vol"]
+    if portfolios.empty:
+        st.warning("⚠️ Os ativos selecionados não têm retornos suficientes em comum para a otimização.")
+        return
+    # (legenda, título, carteira, cor); sem Máx. Sharpe quando nenhuma carteira varia
+    highlights = [h for h in [("Máx. Sharpe", "⭐ Máximo Sharpe", max_sharpe, "red"),
+                              ("Mín. Volatilidade", "🛡️ Mínima Volatilidade", min_vol, "blue")]
+                  if h[2] is not None]
+
+    fig_mc = go.Figure()
+    fig_mc.add_trace(go.Scattergl(
+        x=portfolios["Volatilidade"] * 100, y=portfolios["Retorno"] * 100, mode="markers",
+        marker=dict(size=3, color=portfolios["Sharpe"], colorscale="Viridis", showscale=True,
+                    colorbar=dict(title="Sharpe")),
+        name="Carteiras simuladas"
+    ))
+    fig_mc.add_trace(go.Scatter(
+        x=frontier["Volatilidade"] * 100, y=frontier["Retorno"] * 100,
+        mode="lines", line=dict(color="black", width=2), name="Fronteira eficiente"
+    ))
+    for label, _, portfolio, color in highlights:
+        fig_mc.add_trace(go.Scatter(
+            x=[portfolio["Volatilidade"] * 100], y=[portfolio["Retorno"] * 100], mode="markers",
+            marker=dict(size=14, color=color, symbol="star"), name=label
+        ))
+    fig_mc.update_layout(
+        title=f"⚖️ {len(portfolios):,} carteiras simuladas",
+        xaxis_title="Volatilidade diária (%)",
+        yaxis_title="Retorno médio diário (%)"
+    )
+    st.plotly_chart(fig_mc, use_container_width=True, key="monte_carlo")
+
+    for col, (_, label, portfolio, _) in zip(st.columns(2), highlights):
+        with col:
+            st.markdown(f"#### {label}")
+            st.write(f"**Sharpe (anualizado):** {portfolio['Sharpe']:.2f}")
+            st.write(f"**Retorno médio diário:** {portfolio['Retorno']*100:.2f}%")
+            st.write(f"**Volatilidade diária:** {portfolio['Volatilidade']*100:.2f}%")
+            st.write(f"**Retorno acumulado:** {portfolio['Retorno Acumulado']*100:.2f}%")
+            st.dataframe(_weights_table(portfolio, assets), use_container_width=True)
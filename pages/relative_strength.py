@@ -3,37 +3,48 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
+from utils.db import load_rs_history
+from utils.timing import timed
 
-def render_relative_strength(df_rs, df_prices):
+# Dados usados pela página (carregados por utils.db.load_page_data). O histórico de
+# força relativa é lido só para o par e a janela selecionados (load_rs_history)
+DATA_REQUIREMENTS = {
+    "rs_latest": None,
+    "prices": ["Date", "Ticker", "Price"],
+}
+
+@timed("pages.relative_strength.render_relative_strength")
+def render_relative_strength(df_rs_latest, df_prices):
     # ----------------- Ranking de Força Relativa -----------------
     st.header("🏆 Ranking de Força Relativa Atual")
     
     # Seleção da janela
-    available_windows_rs = sorted(df_rs["Window"].unique())
+    available_windows_rs = sorted(df_rs_latest["Window"].unique())
     selected_window_rs = st.selectbox("Janela da média móvel:", available_windows_rs, index=0)
     
     # Última data disponível
-    latest_date = df_rs["Date"].max()
+    latest_date = df_rs_latest["Date"].max()
     
-    # Filtra dataframe para a última data e janela selecionada
-    df_latest = df_rs[(df_rs["Date"] == latest_date) & (df_rs["Window"] == selected_window_rs)]
+    # Última posição de cada par na janela selecionada (tabela pré-calculada no pipeline)
+    df_latest = df_rs_latest[df_rs_latest["Window"] == selected_window_rs]
     
     # Ordena por RS decrescente
     df_latest_sorted = df_latest.sort_values("RS", ascending=False)
     
     # Mostra tabela com par e força relativa
-    st.dataframe(df_latest_sorted[["Pair", "RS"]].reset_index(drop=True))
+    st.dataframe(df_latest_sorted[["Pair", "RS", "Change_1D", "Change_7D"]].reset_index(drop=True))
     
     # ----------------- Gráfico de RS do par selecionado -----------------
     st.header("💪 Força Relativa entre Criptomoedas")
     
     # Seleção de par
-    available_pairs_rs = sorted(df_rs["Pair"].unique())
+    available_pairs_rs = sorted(df_rs_latest["Pair"].astype(str).unique())
     default_index = available_pairs_rs.index("BTC-USD/ETH-USD") if "BTC-USD/ETH-USD" in available_pairs_rs else 0
     selected_pair_rs = st.selectbox("Par para análise:", available_pairs_rs, index=default_index)
     
-    # Filtra dataframe do par selecionado
-    df_selected_rs = df_rs[(df_rs["Pair"] == selected_pair_rs) & (df_rs["Window"] == selected_window_rs)]
+    # Histórico apenas do par e da janela selecionados
+    df_selected_rs = load_rs_history(selected_pair_rs, selected_window_rs,
+                                     columns=["Date", "RS", "RS_Smooth"]).sort_values("Date")
 
     # Gráfico de RS
     fig_rs = px.line(
@@ -0,0 +1,66 @@
+import io
+import json
+import time
+from contextlib import redirect_stdout
+import pytest
+
+# Fora do servidor, cada função cacheada avisa "No runtime found" (antes de importar utils.db)
+from streamlit.logger import set_log_level
+set_log_level("error")
+
+from benchmarks.synthetic import generate_market, synthetic_tickers
+from update_data import correlation, rs
+from utils import storage, corr_cube, ai_cache, price_cache, refresh, db
+from utils.sqlite_store import create_sqlite_engine
+
+# =============================
+# Fixtures compartilhadas
+# =============================
+# Cada teste roda num diretório temporário: bancos, cubo, Parquet, staging e caches
+# são caminhos relativos ou globais dos módulos, redirecionados aqui.
+N_TICKERS = 5
+N_DAYS = 260
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(storage, "PARQUET_DIR", str(tmp_path / "parquet_data"))
+    monkeypatch.setattr(corr_cube, "CUBE_DIR", str(tmp_path / "correlation_cube"))
+    monkeypatch.setattr(ai_cache, "AI_CACHE_DIR", str(tmp_path / "ai_cache"))
+    monkeypatch.setattr(price_cache, "PRICE_CACHE_DIR", str(tmp_path / "price_cache"))
+    monkeypatch.setattr(refresh, "STAGING_DIR", str(tmp_path / "staging"))
+    # Engines criadas na importação guardariam conexões para o diretório do teste anterior
+    monkeypatch.setattr(correlation, "engine", create_sqlite_engine(correlation.DB_PATH))
+    db.invalidate_caches()
+    yield tmp_path
+    correlation.engine.dispose()
+    db.invalidate_caches()
+
+
+@pytest.fixture(params=["sqlite", "parquet"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", request.param)
+    return request.param
+
+
+@pytest.fixture
+def market(workdir, monkeypatch):
+    """
+    Mercado sintético com os tickers configurados nos scripts e MarketCap já em cache
+    (sem rede). Retorna os frames no formato de get_prices.
+    """
+    frames = generate_market(N_TICKERS, N_DAYS, seed=1)
+    tickers = synthetic_tickers(N_TICKERS)
+    monkeypatch.setattr(correlation, "TICKERS", tickers)
+    monkeypatch.setattr(rs, "TICKERS", tickers)
+    cache = {t: {"MarketCap": 1e9 * (i + 1), "fetched_at": time.time()} for i, t in enumerate(tickers)}
+    with open(rs.MARKETCAP_CACHE_PATH, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    return frames
+
+
+def quiet(func, *args, **kwargs):
+    # Os scripts imprimem o progresso; nos testes só o resultado interessa
+    with redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
@@ -0,0 +1,132 @@
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =============================
+# Servidor local que imita a API de chat da OpenAI
+# =============================
+# Para testar a página do agente sem custo nem rede:
+#   python -m tests.openai_stub --port 8765
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub streamlit run app.py
+# A resposta é determinística (depende só das mensagens) e /stats informa quantas
+# chamadas chegaram, o que permite conferir se o cache evitou requisições.
+# Com "stream": true a resposta sai palavra a palavra (eventos SSE, como a API real);
+# --delay espaça os pedaços e --fail-first faz as primeiras N chamadas devolverem 503,
+# para exercitar timeouts e novas tentativas.
+STUB_MODEL = "stub-model"
+
+_stats = {"requests": 0}
+_stats_lock = threading.Lock()
+_config = {"delay": 0.0, "fail_first": 0}
+
+
+def stub_answer(messages):
+    question = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return f"Resposta simulada ({digest}) para: {question}"
+
+
+def _chunk(content, model, finish_reason=None):
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model or STUB_MODEL,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def completion_body(messages, model):
+    answer = stub_answer(messages)
+    return {
+        "id": f"chatcmpl-stub-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model or STUB_MODEL,
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": answer}}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(answer.split()), "total_tokens": 0},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            with _stats_lock:
+                self._send_json(200, dict(_stats))
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        with _stats_lock:
+            _stats["requests"] += 1
+            failing = _stats["requests"] <= _config["fail_first"]
+        if failing:
+            self._send_json(503, {"error": {"message": "stub: falha simulada"}})
+            return
+        messages, model = payload.get("messages", []), payload.get("model")
+        if payload.get("stream"):
+            self._send_stream(messages, model)
+        else:
+            time.sleep(_config["delay"])
+            self._send_json(200, completion_body(messages, model))
+
+    def _send_stream(self, messages, model):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        words = stub_answer(messages).split(" ")
+        for i, word in enumerate(words):
+            time.sleep(_config["delay"])
+            self._send_event(_chunk(word if i == 0 else f" {word}", model))
+        self._send_event(_chunk(None, model, finish_reason="stop"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_event(self, body):
+        self.wfile.write(f"data: {json.dumps(body)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        print(f"🤖 stub: {format % args}")
+
+
+def start_stub_server(host="127.0.0.1", port=0, delay=0.0, fail_first=0):
+    """
+    Sobe o servidor numa thread daemon e devolve (server, base_url). port=0 escolhe uma porta livre.
+    """
+    _config.update(delay=delay, fail_first=fail_first)
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API de chat da OpenAI.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="Segundos entre os pedaços da resposta.")
+    parser.add_argument("--fail-first", type=int, default=0, help="Responde 503 às primeiras N chamadas.")
+    args = parser.parse_args()
+    _config.update(delay=args.delay, fail_first=args.fail_first)
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"🚀 Stub da OpenAI em http://{args.host}:{args.port}/v1")
+    server.serve_forever()
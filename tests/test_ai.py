@@ -0,0 +1,61 @@
+import json
+import threading
+import urllib.request
+import pytest
+from utils import ai_cache, ai_client
+from tests.openai_stub import start_stub_server
+
+# =============================
+# Cache de respostas e deduplicação de perguntas em andamento
+# =============================
+MESSAGES = [{"role": "user", "content": "Qual ativo subiu mais?"}]
+
+
+def test_cache_key_normalizes_prompt():
+    key = ai_cache.cache_key("Qual o melhor ativo?", 30, "v1", "m")
+    assert key == ai_cache.cache_key("  qual o   MELHOR ativo ", 30, "v1", "m")
+    assert key != ai_cache.cache_key("Qual o melhor ativo?", 90, "v1", "m")
+    assert key != ai_cache.cache_key("Qual o melhor ativo?", 30, "v2", "m")
+
+
+def test_cache_round_trip_and_ttl(workdir, monkeypatch):
+    key = ai_cache.cache_key("pergunta", 30, "v1", "m")
+    assert ai_cache.get_cached_response(key) is None
+    ai_cache.save_response(key, "resposta", prompt="pergunta")
+    assert ai_cache.get_cached_response(key) == "resposta"
+    monkeypatch.setattr(ai_cache, "AI_CACHE_TTL_SECONDS", -1)
+    assert ai_cache.get_cached_response(key) is None
+
+
+@pytest.fixture
+def stub():
+    server, base_url = start_stub_server(delay=0.05)
+    yield base_url
+    server.shutdown()
+
+
+def _stub_requests(base_url):
+    with urllib.request.urlopen(base_url.replace("/v1", "/stats")) as response:
+        return json.load(response)["requests"]
+
+
+def test_inflight_requests_are_shared(stub):
+    completed = []
+    results = [None, None]
+
+    def ask(i):
+        chunks = ai_client.stream_answer("dedup-key", MESSAGES, "stub", base_url=stub, model="stub-model",
+                                         on_complete=completed.append, timeout=5, max_retries=0)
+        results[i] = "".join(chunks)
+
+    before = _stub_requests(stub)
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert _stub_requests(stub) - before == 1
+    assert results[0] == results[1] == completed[0]
+    assert len(completed) == 1
+    assert ai_client.inflight_stats()["in_flight"] == 0
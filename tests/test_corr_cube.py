@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pandas as pd
+from utils import corr_cube
+from utils.corr_cube import open_cube, write_cube
+
+# =============================
+# Cubo de correlações (utils/corr_cube.py)
+# =============================
+PAIRS = ["A/B", "A/C", "B/C"]
+WINDOWS = [7, 30]
+
+
+def _long_frame(n_dates, pairs=PAIRS, seed=0):
+    dates = pd.date_range("2024-01-01", periods=n_dates)
+    index = pd.MultiIndex.from_product([dates, pairs, WINDOWS], names=["Date", "Pair", "Window"])
+    values = np.random.default_rng(seed).uniform(-1, 1, len(index))
+    return pd.DataFrame({"RollingCorrelation": values}, index=index).reset_index()
+
+
+def _data_inode():
+    return os.stat(os.path.join(corr_cube.CUBE_DIR, corr_cube.DATA_FILE)).st_ino
+
+
+def _assert_same_cube(left, right):
+    assert left.dates.equals(right.dates)
+    assert left.pairs == right.pairs and left.windows == right.windows
+    np.testing.assert_array_equal(np.asarray(left.values), np.asarray(right.values))
+
+
+def test_incremental_grows_in_place(workdir):
+    full = _long_frame(120)
+    write_cube(full, cube_dir="full_cube")
+
+    write_cube(full[full["Date"] < full["Date"].unique()[100]])
+    inode = _data_inode()
+    reader = open_cube()
+    since = full["Date"].unique()[90]
+    write_cube(full[full["Date"] >= since], incremental_from=since)
+
+    assert _data_inode() == inode
+    _assert_same_cube(open_cube(), open_cube("full_cube"))
+    # Quem abriu antes continua com o cubo anterior, do mesmo tamanho
+    assert len(reader.dates) == len(reader.values) == 100
+
+
+def test_new_pair_falls_back_to_rewrite(workdir):
+    write_cube(_long_frame(100))
+    inode = _data_inode()
+    grown = _long_frame(120, pairs=PAIRS + ["A/D"])
+    since = grown["Date"].unique()[90]
+    write_cube(grown[grown["Date"] >= since], incremental_from=since)
+
+    assert _data_inode() != inode
+    cube = open_cube()
+    assert len(cube.dates) == 120 and cube.pairs == PAIRS
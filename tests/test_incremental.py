@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+from update_data import correlation, rs
+from utils.corr_cube import open_cube
+from utils.snapshots import CORR_LATEST_TABLE, RS_LATEST_TABLE
+from utils.storage import read_table
+from utils.sqlite_store import create_sqlite_engine
+from tests.conftest import quiet
+
+# =============================
+# Atualização incremental == recálculo completo
+# =============================
+# Carga completa até END - NEW_DAYS, incremental até o fim; o resultado deve ser o mesmo
+# de uma carga completa com todo o histórico, nos dois backends.
+NEW_DAYS = 20
+TABLE_KEYS = {
+    "rolling_correlation_long": ["Pair", "Window", "Date"],
+    CORR_LATEST_TABLE: ["Pair", "Window"],
+    rs.TABLE_NAME: ["Pair", "Window", "Date"],
+    RS_LATEST_TABLE: ["Pair", "Window"],
+    rs.PRICES_TABLE: ["Ticker", "Date"],
+}
+
+
+def _inputs(frames, end=None):
+    frames = {t: df.loc[:end] for t, df in frames.items()}
+    corr_close = quiet(correlation.closes_from_frames, frames, correlation.TICKERS)
+    close, volume = rs.prices_from_frames(frames)
+    high, low = rs.ranges_from_frames(frames, close.index)
+    return corr_close, close, volume, high, low
+
+
+def run_update(frames, end=None, incremental=False):
+    corr_close, close, volume, high, low = _inputs(frames, end)
+    rs_engine = create_sqlite_engine(rs.DB_PATH)
+    if incremental:
+        last_corr = correlation.get_incremental_start(correlation.engine)
+        last_rs = rs.get_rs_incremental_start(rs_engine)
+        last_prices = rs.get_prices_incremental_start(rs_engine)
+        assert None not in (last_corr, last_rs, last_prices)
+    else:
+        last_corr = last_rs = last_prices = None
+    quiet(correlation.update_correlations, corr_close, last_corr, verify=False)
+    quiet(rs.update_relative_strength, close, last_rs)
+    quiet(rs.update_asset_prices, close, volume, last_prices, high, low, verify=False)
+
+
+def read_tables():
+    engines = {"rolling_correlation_long": correlation.engine, CORR_LATEST_TABLE: correlation.engine}
+    tables = {}
+    for table, keys in TABLE_KEYS.items():
+        engine = engines.get(table, create_sqlite_engine(rs.DB_PATH))
+        df = read_table(engine, table, {})
+        # Categorias (Parquet/compact_frame) e texto (SQLite) comparados como texto
+        for column in df.columns:
+            if isinstance(df[column].dtype, pd.CategoricalDtype) or df[column].dtype == object:
+                df[column] = df[column].astype(str)
+        tables[table] = df[sorted(df.columns)].sort_values(keys).reset_index(drop=True)
+    return tables
+
+
+def _cube_values():
+    cube = open_cube()
+    return cube.dates, list(cube.pairs), list(cube.windows), np.array(cube.values)
+
+
+def test_incremental_matches_full(market, backend):
+    split = market[correlation.TICKERS[0]].index[-NEW_DAYS]
+    run_update(market, end=split)
+    run_update(market, incremental=True)
+    incremental, incremental_cube = read_tables(), _cube_values()
+
+    run_update(market)
+    full, full_cube = read_tables(), _cube_values()
+
+    for table in TABLE_KEYS:
+        pdt.assert_frame_equal(incremental[table], full[table], check_dtype=False,
+                               check_exact=False, rtol=1e-6, atol=1e-9, obj=table)
+    pdt.assert_index_equal(incremental_cube[0], full_cube[0])
+    assert incremental_cube[1:3] == full_cube[1:3]
+    np.testing.assert_allclose(incremental_cube[3], full_cube[3], rtol=1e-5, atol=1e-6)
+
+
+def test_parquet_matches_sqlite(market, monkeypatch):
+    from utils import storage
+    results = {}
+    for name in ["sqlite", "parquet"]:
+        monkeypatch.setattr(storage, "STORAGE_BACKEND", name)
+        run_update(market)
+        results[name] = read_tables()
+    for table in TABLE_KEYS:
+        pdt.assert_frame_equal(results["parquet"][table], results["sqlite"][table], check_dtype=False,
+                               check_exact=False, rtol=1e-12, obj=table)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import generate_market
+from update_data import rs
+from utils.indicators import compute_indicators, indicator_columns
+from utils.indicator_state import STREAMS, build_states, advance_states, states_to_frame, states_from_frame
+
+# =============================
+# Estado incremental dos indicadores == cálculo vetorizado
+# =============================
+NAMES = list(STREAMS)
+
+
+def _fields(n_days=120):
+    frames = generate_market(4, n_days, seed=2)
+    close, volume = rs.prices_from_frames(frames)
+    high, low = rs.ranges_from_frames(frames, close.index)
+    return {"Close": close, "Volume": volume, "High": high, "Low": low}
+
+
+def _rows(fields, rows):
+    return {name: df.iloc[rows] for name, df in fields.items()}
+
+
+# Cortes antes, em cima e depois da semente de Wilder (14 barras), e longe dela
+@pytest.mark.parametrize("split", [5, 14, 15, 16, 60])
+def test_streamed_indicators_match_full(split):
+    fields = _fields()
+    tickers = list(fields["Close"].columns)
+    full = compute_indicators(fields, NAMES)
+
+    states = build_states(_rows(fields, slice(None, split)), NAMES)
+    # Ida e volta pela tabela indicator_state
+    date = fields["Close"].index[split - 1]
+    saved_date, states = states_from_frame(states_to_frame(states, tickers, date), tickers, NAMES)
+    assert saved_date == date
+    streamed = advance_states(states, _rows(fields, slice(split, None)), NAMES)
+
+    expected = full[full["Date"] > date].reset_index(drop=True)
+    merged = streamed.merge(expected, on=["Date", "Ticker"], suffixes=("", "_full"))
+    assert len(merged) == len(expected) == len(streamed)
+    for column in indicator_columns(NAMES):
+        a, b = merged[column].to_numpy(), merged[f"{column}_full"].to_numpy()
+        assert np.array_equal(np.isnan(a), np.isnan(b)), column
+        np.testing.assert_allclose(a, b, rtol=rs.VERIFY_RTOL, equal_nan=True, err_msg=column)
+
+
+def test_wilder_rsi_constant_prices():
+    # Sem perdas o RSI de Wilder vai a 100 (avg_loss = 0), nos dois cálculos
+    dates = pd.date_range("2024-01-01", periods=40, freq="D", name="Date")
+    close = pd.DataFrame({"A-USD": np.linspace(1.0, 2.0, 40)}, index=dates)
+    fields = {"Close": close}
+    full = compute_indicators(fields, ["RSI"])
+    states = build_states({"Close": close.iloc[:20]}, ["RSI"])
+    streamed = advance_states(states, {"Close": close.iloc[20:]}, ["RSI"])
+    np.testing.assert_allclose(streamed["RSI"], full["RSI"].iloc[20:], rtol=rs.VERIFY_RTOL)
+    assert (streamed["RSI"] == 100).all()
@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+import subprocess
+import threading
+from update_data import rs
+from tests.conftest import quiet
+
+# =============================
+# MarketCap em paralelo com prazo (update_data/rs.py)
+# =============================
+HANG = threading.Event()
+
+
+def _provider(ticker):
+    if ticker == "HANG-USD":
+        HANG.wait()
+    if ticker == "FAIL-USD":
+        raise RuntimeError("sem dados")
+    return 1e9
+
+
+def test_hung_provider_does_not_block(workdir):
+    started = time.perf_counter()
+    df = quiet(rs.fetch_market_caps, ["A-USD", "HANG-USD", "FAIL-USD", "B-USD"], provider=_provider,
+               cache_path=None, max_workers=2, timeout=0.5)
+    assert time.perf_counter() - started < 2
+    caps = df.set_index("Ticker")["MarketCap"]
+    assert caps[["A-USD", "B-USD"]].tolist() == [1e9, 1e9]
+    assert caps[["HANG-USD", "FAIL-USD"]].isna().all()
+
+
+def test_hung_provider_does_not_block_exit():
+    # Threads travadas não podem segurar o fim do processo (o atexit do
+    # concurrent.futures aguardaria cada uma)
+    code = ("import threading\n"
+            "from update_data import rs\n"
+            "rs.fetch_market_caps(['HANG-USD'], provider=lambda t: threading.Event().wait(),\n"
+            "                     cache_path=None, timeout=0.5)\n")
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], env=env, check=True, timeout=30, capture_output=True)
+    assert time.perf_counter() - started < 15
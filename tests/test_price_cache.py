@@ -0,0 +1,60 @@
+import pandas as pd
+from benchmarks.synthetic import generate_market
+from utils.price_cache import get_prices
+from tests.conftest import quiet
+
+# =============================
+# Cache local de preços (utils/price_cache.py)
+# =============================
+
+
+class FakeDownloader:
+    """
+    Imita o yf.download sobre um mercado sintético. Com failing=True devolve um
+    DataFrame vazio, como o yfinance faz em muitas falhas de rede.
+    """
+    def __init__(self, frames):
+        self.frames = frames
+        self.failing = False
+        self.calls = []
+
+    def __call__(self, tickers, start, end, interval, **kwargs):
+        self.calls.append((tuple(tickers), start, end))
+        if self.failing:
+            return pd.DataFrame()
+        window = {t: df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+                  for t, df in self.frames.items() if t in tickers}
+        return pd.concat(window, axis=1)
+
+
+def _get(downloader, start, end="2025-01-01"):
+    return quiet(get_prices, sorted(downloader.frames), start, end, downloader=downloader)
+
+
+def test_failed_backfill_is_retried(workdir):
+    downloader = FakeDownloader(generate_market(3, 200, seed=4))
+    first = downloader.frames["SYN000-USD"].index[0]
+    _get(downloader, (first + pd.Timedelta(days=100)).strftime("%Y-%m-%d"))
+
+    # Pedido mais antigo com o provedor falhando: o intervalo não pode ficar marcado como coberto
+    downloader.failing = True
+    start = first.strftime("%Y-%m-%d")
+    assert len(_get(downloader, start)["SYN000-USD"]) == 100
+
+    downloader.failing = False
+    frames = _get(downloader, start)
+    assert len(frames["SYN000-USD"]) == 200
+    pd.testing.assert_frame_equal(frames["SYN000-USD"], downloader.frames["SYN000-USD"], check_freq=False)
+
+
+def test_late_listing_is_not_refetched(workdir):
+    frames = generate_market(3, 200, seed=4)
+    frames["SYN001-USD"] = frames["SYN001-USD"].iloc[120:]
+    downloader = FakeDownloader(frames)
+    start = frames["SYN000-USD"].index[0].strftime("%Y-%m-%d")
+    _get(downloader, start)
+    downloader.calls.clear()
+
+    # Só a última barra (possivelmente parcial) é baixada de novo
+    _get(downloader, start)
+    assert all(call_start != start for _, call_start, _ in downloader.calls)
@@ -0,0 +1,55 @@
+import os
+from update_data import correlation, rs
+from utils import storage, corr_cube, refresh, db
+from utils.sqlite_store import create_sqlite_engine
+from tests.test_incremental import NEW_DAYS, TABLE_KEYS, run_update, read_tables
+
+# =============================
+# Troca dos dados do staging (utils/refresh.py)
+# =============================
+
+
+def _point_to(monkeypatch, data_paths):
+    # Mesmo redirecionamento que utils.pipeline._configure_worker faz nos processos do pool
+    monkeypatch.setattr(correlation, "DB_PATH", data_paths["correlation_db"])
+    monkeypatch.setattr(correlation, "engine", create_sqlite_engine(data_paths["correlation_db"]))
+    monkeypatch.setattr(rs, "DB_PATH", data_paths["performance_db"])
+    monkeypatch.setattr(corr_cube, "CUBE_DIR", data_paths["corr_cube_dir"])
+    if "parquet_dir" in data_paths:
+        monkeypatch.setattr(storage, "PARQUET_DIR", data_paths["parquet_dir"])
+
+
+def test_swap_in_replaces_live_data(market, backend, monkeypatch):
+    split = market[correlation.TICKERS[0]].index[-NEW_DAYS]
+    run_update(market, end=split)
+    live = {"correlation_db": correlation.DB_PATH, "performance_db": rs.DB_PATH,
+            "corr_cube_dir": corr_cube.CUBE_DIR, "parquet_dir": storage.PARQUET_DIR}
+
+    data_paths = refresh.prepare_staging()
+    _point_to(monkeypatch, data_paths)
+    run_update(market, incremental=True)
+    correlation.engine.dispose()
+    staged = read_tables()
+
+    _point_to(monkeypatch, live)
+    version = db.get_data_version()
+    refresh.swap_in(data_paths)
+    assert db.get_data_version() != version
+    swapped = read_tables()
+    for table in TABLE_KEYS:
+        assert swapped[table].equals(staged[table]), table
+    assert swapped[rs.PRICES_TABLE]["Date"].max() == market[correlation.TICKERS[0]].index[-1]
+    # Nada do staging sobra depois da troca
+    for key in refresh.LIVE_DATABASES:
+        assert not os.path.exists(data_paths[key].replace("sqlite:///", ""))
+    assert not os.path.exists(data_paths["corr_cube_dir"])
+    assert not os.path.exists(data_paths.get("parquet_dir", data_paths["corr_cube_dir"]))
+
+
+def test_data_version_counts_swaps(workdir, backend):
+    # Sem dados novos (nem mudança de mtime) cada troca ainda gera outra versão
+    versions = {db.get_data_version()}
+    for _ in range(3):
+        refresh.swap_in(refresh.prepare_staging())
+        versions.add(db.get_data_version())
+    assert len(versions) == 4
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from update_data import correlation
+from utils import corr_engine
+from tests.conftest import quiet
+
+# =============================
+# Precisão da correlação móvel (utils/rolling_corr.py)
+# =============================
+WINDOWS = [7, 30, 90]
+
+
+def trending_closes(n_days=3000, seed=3):
+    """
+    Preços que percorrem ~7 ordens de grandeza (tendência forte e volatilidade
+    pequena), o caso em que somas acumuladas sobre todo o histórico cancelam mal.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2015-01-01", periods=n_days, freq="D", name="Date")
+    trend = np.linspace(0, np.log(1e7), n_days)
+    noise = rng.normal(0, 0.002, (n_days, 3)).cumsum(axis=0)
+    closes = np.exp(trend[:, None] * [1.0, 0.9, 1.1] + noise) * [1.0, 50.0, 0.01]
+    return pd.DataFrame(closes, index=dates, columns=["A-USD", "B-USD", "C-USD"])
+
+
+def _pandas_corr(closes, pair, window):
+    a, b = pair.split("/")
+    return closes[a].rolling(window).corr(closes[b])
+
+
+def test_pipeline_matches_pandas_on_wide_price_range():
+    closes = trending_closes()
+    long_df = quiet(correlation.compute_all_rolling_correlations, closes, WINDOWS)
+    for (pair, window), group in long_df.groupby(["Pair", "Window"]):
+        expected = _pandas_corr(closes, pair, window).to_numpy()
+        result = group.sort_values("Date")["RollingCorrelation"].to_numpy()
+        assert np.array_equal(np.isnan(result), np.isnan(expected)), (pair, window)
+        np.testing.assert_allclose(result, expected, atol=1e-6, equal_nan=True, err_msg=f"{pair} {window}")
+
+
+def test_engine_matches_pandas_on_wide_price_range():
+    closes = trending_closes()
+    matrix = corr_engine.CorrelationMatrix(closes, version="test")
+    for window in [7, 45, 365]:
+        result = corr_engine.rolling_correlation(matrix, window)
+        for pair in result.columns:
+            expected = _pandas_corr(closes, pair, window).to_numpy()
+            # O resultado do painel é float32
+            np.testing.assert_allclose(result[pair].to_numpy(), expected, atol=1e-6, equal_nan=True,
+                                       err_msg=f"{pair} {window}")
+    corr_engine.clear_cache()
+
+
+def test_constant_window_is_nan():
+    closes = trending_closes()
+    closes.iloc[1000:1040, 0] = closes.iloc[1000, 0]
+    long_df = quiet(correlation.compute_all_rolling_correlations, closes, [30])
+    series = long_df[long_df["Pair"] == "A-USD/B-USD"].set_index("Date")["RollingCorrelation"]
+    # Janelas inteiramente dentro do trecho constante não têm correlação definida
+    assert series.iloc[1029:1040].isna().all()
+    assert series.iloc[29:1029].notna().all() and series.iloc[1040:].notna().all()
+    assert long_df["RollingCorrelation"].abs().max() <= 1.0
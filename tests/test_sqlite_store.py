@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import SingletonThreadPool
+from utils.sqlite_store import bulk_write, read_filtered, BULK_PRAGMAS
+from tests.conftest import quiet
+
+# =============================
+# Gravação em massa (utils/sqlite_store.py)
+# =============================
+
+
+@pytest.fixture
+def engine(workdir):
+    # Uma única conexão reaproveitada: os pragmas de uma carga ficariam para a próxima
+    engine = create_engine("sqlite:///store.db", poolclass=SingletonThreadPool)
+    yield engine
+    engine.dispose()
+
+
+def _frame(n, value=1.0):
+    return pd.DataFrame({"Date": pd.date_range("2024-01-01", periods=n, name="Date"),
+                         "Pair": ["A/B"] * n, "Value": [value] * n})
+
+
+def _pragmas(engine):
+    raw = engine.raw_connection()
+    try:
+        return {pragma: raw.execute(f"PRAGMA {pragma}").fetchone()[0] for pragma in BULK_PRAGMAS}
+    finally:
+        raw.close()
+
+
+def test_failed_replace_keeps_previous_table(engine):
+    quiet(bulk_write, _frame(5), engine, "t")
+    # O segundo lote falha depois de o primeiro ter sido inserido
+    bad = _frame(3).assign(Value=[2.0, {"não": "suportado"}, 2.0])
+    with pytest.raises(Exception):
+        quiet(bulk_write, bad, engine, "t", batch_size=1)
+    df = read_filtered(engine, "t", {})
+    assert len(df) == 5 and (df["Value"] == 1.0).all()
+
+
+def test_bulk_pragmas_are_restored(engine):
+    before = _pragmas(engine)
+    quiet(bulk_write, _frame(5), engine, "t")
+    assert _pragmas(engine) == before
+    with pytest.raises(Exception):
+        quiet(bulk_write, _frame(3).assign(Value=[{}, {}, {}]), engine, "t")
+    assert _pragmas(engine) == before
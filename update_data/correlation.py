@@ -1,8 +1,22 @@
-import yfinance as yf
+import os
+import sys
+import argparse
 import pandas as pd
-from sqlalchemy import create_engine
+import numpy as np
 from itertools import combinations
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import text
+from utils.sqlite_store import create_sqlite_engine, warmup_start
+from utils.storage import save_table, last_stored_date, stored_values, rows_written
+from utils.corr_cube import open_cube, write_cube
+from utils.price_cache import get_prices
+from utils.rolling_corr import rolling_corr_pairs
+from utils.snapshots import (
+    build_latest_snapshot, verify_snapshot, CORR_LATEST_TABLE, SNAPSHOT_INDEXES, SNAPSHOT_LOOKBACK
+)
+from utils.timing import timed
+
 # Configurações
 TICKERS = [
     "BTC-USD", "ETH-USD", "SOL-USD", "BNB-USD", "DOT-USD", "AVAX-USD", "XRP-USD", 
@@ -12,19 +26,31 @@ START_DATE = "2010-01-01"
 END_DATE = "2030-01-01"
 ROLLING_WINDOWS = [7, 15, 30, 60, 90]
 DB_PATH = "sqlite:///correlation.db"
+# Número de pares processados por lote (limita a memória com muitos ativos)
+PAIR_CHUNK_SIZE = 2000
+# Índices usados pelos loaders de utils/db.py
+LONG_TABLE_INDEXES = [["Date"], ["Window", "Date"], ["Pair", "Window", "Date"]]
+# Confere o snapshot incremental contra o recálculo completo (--verify-snapshot)
+VERIFY_SNAPSHOT = os.environ.get("VERIFY_SNAPSHOT", "0") == "1"
+# Tabela pivotada antiga, substituída pelo cubo em utils/corr_cube.py
+LEGACY_WIDE_TABLE = "rolling_correlation_wide"
 
-engine = create_engine(DB_PATH)
+engine = create_sqlite_engine(DB_PATH)
 
+@timed("correlation.fetch_and_store_data")
 def fetch_and_store_data(tickers, start, end):
-    print("Baixando dados do Yahoo Finance...")
-    raw_df = yf.download(tickers, start=start, end=end, group_by='ticker', auto_adjust=True)
-    
+    print("Carregando preços (cache local + Yahoo Finance)...")
+    frames = get_prices(tickers, start, end)
+    return closes_from_frames(frames, tickers)
+
+def closes_from_frames(frames, tickers):
+    # Fechamentos (datas x ativos) sem lacunas, a partir do resultado de get_prices
     valid_closes = []
     failed_tickers = []
 
     for ticker in tickers:
         try:
-            close_series = raw_df[ticker]['Close'].dropna().rename(ticker)
+            close_series = frames[ticker]['Close'].dropna().rename(ticker)
             if not close_series.empty:
                 valid_closes.append(close_series)
                 print(f"[OK] {ticker} - Última data: {close_series.index[-1].date()}")
@@ -42,21 +68,58 @@ def fetch_and_store_data(tickers, start, end):
     df = df.dropna()
     return df
 
+def _pair_indices(n):
+    # Índices (i, j) de todos os pares i < j, na mesma ordem de itertools.combinations
+    i_idx, j_idx = np.triu_indices(n, k=1)
+    return i_idx, j_idx
+
+def iter_rolling_correlation_blocks(df, windows, chunk_size=PAIR_CHUNK_SIZE):
+    """
+    Calcula a correlação móvel de todos os pares em lotes de pares, com somas
+    acumuladas por bloco de datas compartilhadas por todas as janelas
+    (utils/rolling_corr.py). Gera (window, pares, matriz datas x pares) para cada
+    lote de pares e janela.
+    """
+    columns = list(df.columns)
+    values = df.to_numpy(dtype=np.float64)
+
+    i_idx, j_idx = _pair_indices(len(columns))
+    pair_names = np.array([f"{columns[i]}/{columns[j]}" for i, j in zip(i_idx, j_idx)], dtype=object)
+
+    for start in range(0, len(pair_names), chunk_size):
+        i = i_idx[start:start + chunk_size]
+        j = j_idx[start:start + chunk_size]
+        corrs = rolling_corr_pairs(values, i, j, windows)
+        for window in windows:
+            yield window, pair_names[start:start + chunk_size], corrs[window]
+
+@timed("correlation.compute_all_rolling_correlations")
 def compute_all_rolling_correlations(df, windows):
     print("Calculando correlações móveis para todos os pares e janelas...")
-    results = []
+    n_dates = len(df.index)
+    blocks = {window: [] for window in windows}
+    for window, block_pairs, corr in iter_rolling_correlation_blocks(df, windows):
+        blocks[window].append((block_pairs, corr))
+
+    dates, pairs, corrs, window_col = [], [], [], []
     for window in windows:
         print(f"Janela: {window} dias")
-        for t1, t2 in combinations(df.columns, 2):
-            corr = df[t1].rolling(window).corr(df[t2])
-            df_corr = pd.DataFrame({
-                'Date': corr.index,
-                'Pair': f"{t1}/{t2}",
-                'RollingCorrelation': corr.values,
-                'Window': window
-            })
-            results.append(df_corr)
-    all_corrs = pd.concat(results, ignore_index=True)
+        for block_pairs, corr in blocks[window]:
+            # Transposta: cada par ocupa um bloco contínuo de datas (mesmo layout de antes)
+            corrs.append(corr.T.ravel())
+            pairs.append(np.repeat(block_pairs, n_dates))
+            dates.append(np.tile(df.index.values, len(block_pairs)))
+            window_col.append(np.full(n_dates * len(block_pairs), window))
+
+    if not corrs:
+        return pd.DataFrame(columns=["Date", "Pair", "RollingCorrelation", "Window"])
+
+    all_corrs = pd.DataFrame({
+        'Date': np.concatenate(dates),
+        'Pair': np.concatenate(pairs),
+        'RollingCorrelation': np.concatenate(corrs),
+        'Window': np.concatenate(window_col)
+    })
     return all_corrs
 
 def export_to_excel(long_df, wide_df, file_name="correlacoes_moveis.xlsx"):
@@ -66,16 +129,91 @@ def export_to_excel(long_df, wide_df, file_name="correlacoes_moveis.xlsx"):
         wide_df.to_excel(writer, sheet_name="Wide_Format", index=False)
     print("Exportação concluída.")
 
-if __name__ == "__main__":
-    price_df = fetch_and_store_data(TICKERS, START_DATE, END_DATE)
+def build_wide_table(all_corr_df):
+    all_corr_wide = all_corr_df.pivot_table(index='Date', columns=['Pair', 'Window'], values='RollingCorrelation')
+    all_corr_wide.reset_index(inplace=True)
+    return all_corr_wide
+
+def get_incremental_start(engine):
+    """
+    Última data gravada, ou None se for preciso uma carga completa
+    (tabela vazia ou universo de pares diferente do atual).
+    """
+    last_date = last_stored_date(engine, "rolling_correlation_long")
+    if last_date is None:
+        print("Nenhum dado anterior encontrado. Executando carga completa...")
+        return None
+    expected_pairs = {f"{t1}/{t2}" for t1, t2 in combinations(TICKERS, 2)}
+    if stored_values(engine, "rolling_correlation_long", "Pair", last_date) != expected_pairs:
+        print("Conjunto de pares mudou. Executando carga completa...")
+        return None
+    if open_cube() is None:
+        print("Cubo de correlações ausente. Executando carga completa...")
+        return None
+    return last_date
+
+def save_latest_snapshot(all_corr_df):
+    # Última correlação por (Pair, Window) para os rankings da página de correlação
+    snapshot = build_latest_snapshot(all_corr_df, "RollingCorrelation")
+    save_table(snapshot, engine, CORR_LATEST_TABLE, indexes=SNAPSHOT_INDEXES)
+    return snapshot
+
+@timed("correlation.verify_latest_snapshot")
+def verify_latest_snapshot(snapshot):
+    """
+    Compara o snapshot incremental com o construído sobre todo o histórico (cache local
+    de preços). Gera RuntimeError se divergirem.
+    """
+    full_df = compute_all_rolling_correlations(fetch_and_store_data(TICKERS, START_DATE, END_DATE),
+                                               ROLLING_WINDOWS)
+    verify_snapshot(snapshot, build_latest_snapshot(full_df, "RollingCorrelation"), "RollingCorrelation")
+
+@timed("correlation.update_correlations")
+def update_correlations(price_df, last_date=None, verify=VERIFY_SNAPSHOT):
+    """
+    Calcula e grava as correlações. Com last_date, price_df deve cobrir o aquecimento
+    da maior janela e das variações do snapshot, e somente as linhas a partir de
+    last_date são regravadas. verify confere o snapshot com o recálculo completo.
+    """
+    if last_date is None:
+        all_corr_df = compute_all_rolling_correlations(price_df, ROLLING_WINDOWS)
+        save_table(all_corr_df, engine, "rolling_correlation_long", indexes=LONG_TABLE_INDEXES)
+        write_cube(all_corr_df)
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE IF EXISTS "{LEGACY_WIDE_TABLE}"'))
+        save_latest_snapshot(all_corr_df)
+        return rows_written(all_corr_df)
+
+    print(f"Atualização incremental a partir de {last_date.date()}...")
+    # Apenas as linhas necessárias para aquecer a maior janela antes da última data gravada,
+    # mais SNAPSHOT_LOOKBACK para o Change_7D dessa janela no snapshot
+    n_warmup = max(ROLLING_WINDOWS) - 1 + SNAPSHOT_LOOKBACK
+    first_new = price_df.index.searchsorted(last_date)
+    price_df = price_df.iloc[max(0, first_new - n_warmup):]
 
     all_corr_df = compute_all_rolling_correlations(price_df, ROLLING_WINDOWS)
+    save_table(all_corr_df, engine, "rolling_correlation_long", incremental_from=last_date,
+               indexes=LONG_TABLE_INDEXES)
+    write_cube(all_corr_df, incremental_from=last_date)
+    snapshot = save_latest_snapshot(all_corr_df)
+    if verify:
+        verify_latest_snapshot(snapshot)
+    n_rows = rows_written(all_corr_df, last_date)
+    print(f"{n_rows} linhas atualizadas em rolling_correlation_long.")
+    return n_rows
 
-    all_corr_df.to_sql("rolling_correlation_long", con=engine, if_exists="replace", index=False)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Atualiza as correlações móveis entre ativos.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Baixa e recalcula apenas as barras novas desde a última data gravada.")
+    parser.add_argument("--verify-snapshot", action="store_true",
+                        help="Confere o snapshot incremental com o recálculo completo.")
+    args = parser.parse_args()
 
-    all_corr_wide = all_corr_df.pivot_table(index='Date', columns=['Pair', 'Window'], values='RollingCorrelation')
-    all_corr_wide.reset_index(inplace=True)
-    all_corr_wide.to_sql("rolling_correlation_wide", con=engine, if_exists="replace", index=False)
+    last_date = get_incremental_start(engine) if args.incremental else None
+    start = warmup_start(last_date, max(ROLLING_WINDOWS) + SNAPSHOT_LOOKBACK) if last_date is not None \
+        else START_DATE
+    price_df = fetch_and_store_data(TICKERS, start, END_DATE)
+    update_correlations(price_df, last_date, verify=args.verify_snapshot or VERIFY_SNAPSHOT)
 
     print("Dados salvos com sucesso no banco SQLite.")
-
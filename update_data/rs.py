@@ -1,9 +1,27 @@
+import os
+import sys
+import json
+import time
+import copy
+import queue
+import argparse
+import threading
 import yfinance as yf
 import pandas as pd
 import numpy as np
 from itertools import combinations
-from sqlalchemy import create_engine
-from tqdm import tqdm
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.sqlite_store import create_sqlite_engine, warmup_start
+from utils.storage import save_table, read_table, last_stored_date, stored_values, stored_columns, rows_written
+from utils.price_cache import get_prices, wide_field
+from utils.snapshots import build_latest_snapshot, RS_LATEST_TABLE, SNAPSHOT_INDEXES
+from utils.indicators import compute_indicators, indicator_columns
+from utils.timing import timed
+from utils.ai_features import update_ai_features, AI_PERIODS
+from utils.indicator_state import (
+    STATE_TABLE, build_states, advance_states, states_to_frame, states_from_frame
+)
 
 # =============================
 # Configuração
@@ -16,101 +34,227 @@ WINDOWS = [3, 7, 14, 20, 30]
 
 DB_PATH = "sqlite:///performance.db"
 TABLE_NAME = "relative_strength_long"
+PRICES_TABLE = "asset_prices"
+# Indicadores gravados em asset_prices (nomes do registro em utils/indicators.py),
+# ex.: PERSISTED_INDICATORS="RSI,SMA_20,SMA_50,MACD,ATR"
+PERSISTED_INDICATORS = os.environ.get("PERSISTED_INDICATORS", "RSI,SMA_20,SMA_50").split(",")
+# Barras baixadas antes da última data gravada. Os indicadores avançam a partir do estado
+# salvo em indicator_state (utils/indicator_state.py), então bastam poucas barras
+INDICATOR_WARMUP = 7
+# Confere a atualização incremental contra o recálculo completo (--verify-indicators)
+VERIFY_INDICATORS = os.environ.get("VERIFY_INDICATORS", "0") == "1"
+VERIFY_RTOL = 1e-6
+# Cache em disco do MarketCap (valores mudam pouco ao longo do dia)
+MARKETCAP_CACHE_PATH = "marketcap_cache.json"
+MARKETCAP_TTL_SECONDS = 6 * 60 * 60
+MARKETCAP_MAX_WORKERS = 8
+MARKETCAP_TIMEOUT_SECONDS = 15
+# Índices usados pelos loaders de utils/db.py
+RS_INDEXES = [["Date"], ["Window", "Date"], ["Pair", "Window", "Date"]]
+PRICES_INDEXES = [["Date"], ["Ticker", "Date"]]
 
 # =============================
 # Função para baixar preços e volumes
 # =============================
+@timed("rs.fetch_prices")
 def fetch_prices(tickers, start, end):
-    data = yf.download(tickers, start=start, end=end, auto_adjust=True)
-    close = data["Close"].dropna()
-    volume = data["Volume"].dropna()
+    # Fechamento, volume, máxima e mínima (datas x ativos)
+    frames = get_prices(tickers, start, end)
+    close, volume = prices_from_frames(frames)
+    high, low = ranges_from_frames(frames, close.index)
+    return close, volume, high, low
+
+def prices_from_frames(frames):
+    # Colunas em ordem alfabética, como no yf.download (define os nomes dos pares)
+    columns = sorted(frames)
+    close = wide_field(frames, "Close")[columns].dropna()
+    volume = wide_field(frames, "Volume")[columns].dropna()
     return close, volume
 
+def ranges_from_frames(frames, index):
+    # Máximas e mínimas nas mesmas datas dos fechamentos (usadas por ATR)
+    columns = sorted(frames)
+    return tuple(wide_field(frames, field)[columns].reindex(index) for field in ("High", "Low"))
+
 # =============================
 # Função para calcular MarketCap atual dos ativos
 # =============================
-def fetch_market_caps(tickers):
+def yahoo_market_cap(ticker):
+    return yf.Ticker(ticker).info.get("marketCap", None)
+
+def _load_market_cap_cache(cache_path):
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_market_cap_cache(cache, cache_path):
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, cache_path)
+
+def _fetch_parallel(provider, tickers, max_workers, timeout):
+    """
+    Chama provider(ticker) em até max_workers threads daemon e espera no máximo
+    timeout segundos por rodada de chamadas. Chamadas travadas ficam para
+    trás sem segurar o fim do processo (threads do concurrent.futures são aguardadas
+    na saída do interpretador). Retorna (valores, erros) por ativo.
+    """
+    pending = queue.Queue()
+    for ticker in tickers:
+        pending.put(ticker)
+    results, errors = {}, {}
+    finished = threading.Condition()
+
+    def worker():
+        while True:
+            try:
+                ticker = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                value, error = provider(ticker), None
+            except Exception as e:
+                value, error = None, e
+            with finished:
+                if error is None:
+                    results[ticker] = value
+                else:
+                    errors[ticker] = error
+                finished.notify_all()
+
+    n_threads = min(max_workers, len(tickers))
+    for _ in range(n_threads):
+        threading.Thread(target=worker, daemon=True).start()
+    rounds = -(-len(tickers) // n_threads)
+    with finished:
+        finished.wait_for(lambda: len(results) + len(errors) == len(tickers), timeout=timeout * rounds)
+        return dict(results), dict(errors)
+
+@timed("rs.fetch_market_caps")
+def fetch_market_caps(tickers, provider=yahoo_market_cap, cache_path=MARKETCAP_CACHE_PATH,
+                      ttl_seconds=MARKETCAP_TTL_SECONDS, max_workers=MARKETCAP_MAX_WORKERS,
+                      timeout=MARKETCAP_TIMEOUT_SECONDS):
+    """
+    Busca o MarketCap atual de cada ativo em paralelo (pool limitado de threads),
+    reaproveitando valores do cache em disco mais novos que ttl_seconds.
+    provider(ticker) -> MarketCap permite trocar o Yahoo Finance por um stub nos testes.
+    Se a busca falhar, usa o último valor em cache (mesmo expirado), se houver.
+    """
+    tickers = list(tickers)
+    now = time.time()
+    cache = _load_market_cap_cache(cache_path) if cache_path else {}
+    fresh = {t: cache[t]["MarketCap"] for t in tickers
+             if t in cache and now - cache[t]["fetched_at"] < ttl_seconds}
+    missing = [t for t in tickers if t not in fresh]
+
+    fetched = {}
+    if missing:
+        fetched, errors = _fetch_parallel(provider, missing, max_workers, timeout)
+        for ticker in missing:
+            if ticker in errors:
+                print(f"⚠️ Não consegui pegar MarketCap de {ticker}: {errors[ticker]!r}")
+            elif ticker not in fetched:
+                print(f"⚠️ MarketCap de {ticker} sem resposta dentro do prazo")
+
+        for ticker, mc in fetched.items():
+            cache[ticker] = {"MarketCap": mc, "fetched_at": now}
+        if cache_path and fetched:
+            _save_market_cap_cache(cache, cache_path)
+
     marketcaps = []
     for ticker in tickers:
-        try:
-            info = yf.Ticker(ticker).info
-            mc = info.get("marketCap", None)
-            marketcaps.append({"Ticker": ticker, "MarketCap": mc})
-        except Exception as e:
-            print(f"⚠️ Não consegui pegar MarketCap de {ticker}: {e}")
-            marketcaps.append({"Ticker": ticker, "MarketCap": None})
+        if ticker in fresh:
+            mc = fresh[ticker]
+        elif ticker in fetched:
+            mc = fetched[ticker]
+        else:
+            mc = cache.get(ticker, {}).get("MarketCap")
+        marketcaps.append({"Ticker": ticker, "MarketCap": mc})
     return pd.DataFrame(marketcaps)
 
 # =============================
 # Calcular força relativa entre pares
 # =============================
-def compute_relative_strength(df, windows):
-    all_pairs = list(combinations(df.columns, 2))
-    results = []
-
-    for base, quote in tqdm(all_pairs, desc="Calculando RS para todos os pares"):
-        rs_series = df[base] / df[quote]
-        for window in windows:
-            rs_smooth = rs_series.rolling(window=window).mean()
-
-            temp_df = pd.DataFrame({
-                "Date": rs_series.index,
-                "Pair": f"{base}/{quote}",
-                "Base": base,
-                "Quote": quote,
-                "Window": window,
-                "RS": rs_series.values,
-                "RS_Smooth": rs_smooth.values
-            })
-
-            results.append(temp_df)
-
-    final_df = pd.concat(results, ignore_index=True)
-    return final_df.dropna(subset=["RS"])
+def _rolling_mean(values, window):
+    # Média móvel ao longo do eixo 0 via soma acumulada; janelas com NaN resultam em NaN,
+    # como em Series.rolling(window).mean()
+    valid = np.isfinite(values)
+    zero_row = np.zeros((1,) + values.shape[1:])
+    cumsum = np.concatenate([zero_row, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    count = np.concatenate([zero_row, np.cumsum(valid, axis=0)])
+    out = np.full(values.shape, np.nan)
+    if window <= values.shape[0]:
+        full = (count[window:] - count[:-window]) == window
+        out[window - 1:] = np.where(full, (cumsum[window:] - cumsum[:-window]) / window, np.nan)
+    return out
 
-# =============================
-# Calcular indicadores técnicos (RSI, MACD, SMAs, EMAs)
-# =============================
-def compute_technical_indicators(df_prices):
-    all_dfs = []
-    for ticker in df_prices.columns:
-        df = pd.DataFrame({
-            "Date": df_prices.index,
-            "Ticker": ticker,
-            "Price": pd.to_numeric(df_prices[ticker], errors="coerce")
-        }).dropna()
+@timed("rs.compute_relative_strength")
+def compute_relative_strength(df, windows):
+    columns = list(df.columns)
+    n_dates, n_windows = len(df.index), len(windows)
+    base_idx, quote_idx = np.triu_indices(len(columns), k=1)
+    n_pairs = len(base_idx)
 
-        # RSI (14)
-        delta = df["Price"].diff()
-        gain = delta.clip(lower=0)
-        loss = -delta.clip(upper=0)
-        avg_gain = gain.rolling(14).mean()
-        avg_loss = loss.rolling(14).mean()
-        rs = avg_gain / avg_loss
-        df["RSI"] = 100 - (100 / (1 + rs))
+    # Tensor de razões (datas x pares) numa única divisão
+    values = df.to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = values[:, base_idx] / values[:, quote_idx]
+    ratios[~np.isfinite(ratios)] = np.nan
 
-        # Médias móveis simples
-        df["SMA_20"] = df["Price"].rolling(window=20).mean()
-        df["SMA_50"] = df["Price"].rolling(window=50).mean()
+    # Layout final: par -> janela -> data (mesma ordem do loop anterior)
+    rs = np.broadcast_to(ratios.T[:, None, :], (n_pairs, n_windows, n_dates))
+    rs_smooth = np.empty((n_pairs, n_windows, n_dates))
+    for w, window in enumerate(windows):
+        rs_smooth[:, w, :] = _rolling_mean(ratios, window).T
 
+    pair_names = [f"{columns[b]}/{columns[q]}" for b, q in zip(base_idx, quote_idx)]
+    pair_codes = np.repeat(np.arange(n_pairs), n_windows * n_dates)
 
-        all_dfs.append(df)
+    final_df = pd.DataFrame({
+        "Date": np.tile(df.index.values, n_pairs * n_windows),
+        "Pair": pd.Categorical.from_codes(pair_codes, categories=pair_names),
+        "Base": pd.Categorical.from_codes(base_idx[pair_codes], categories=columns),
+        "Quote": pd.Categorical.from_codes(quote_idx[pair_codes], categories=columns),
+        "Window": np.tile(np.repeat(np.asarray(windows), n_dates), n_pairs),
+        "RS": rs.ravel(),
+        "RS_Smooth": rs_smooth.ravel()
+    })
+    return final_df.dropna(subset=["RS"])
 
-    full_df = pd.concat(all_dfs, ignore_index=True)
-    return full_df
+# =============================
+# Calcular indicadores técnicos (RSI, MACD, SMAs, EMAs)
+# =============================
+@timed("rs.compute_technical_indicators")
+def compute_technical_indicators(df_prices, df_volumes=None, df_high=None, df_low=None,
+                                 indicators=PERSISTED_INDICATORS):
+    # Indicadores do registro, calculados sobre a matriz inteira (um passo por indicador)
+    fields = {"Close": df_prices.apply(pd.to_numeric, errors="coerce"), "Volume": df_volumes,
+              "High": df_high, "Low": df_low}
+    return compute_indicators(fields, indicators)
 
 # =============================
 # Salvar dados de força relativa
 # =============================
-def save_to_sqlite(df, db_path, table_name):
-    engine = create_engine(db_path)
-    df.to_sql(table_name, con=engine, if_exists="replace", index=False)
+def save_to_sqlite(df, db_path, table_name, incremental_from=None, indexes=RS_INDEXES):
+    engine = create_sqlite_engine(db_path)
+    save_table(df, engine, table_name, incremental_from=incremental_from, indexes=indexes)
     print(f"✅ Dados salvos com sucesso em '{table_name}' no banco '{db_path}'")
 
 # =============================
 # Salvar preços, volumes, indicadores e MarketCap
 # =============================
-def save_prices_to_sqlite(df_prices, df_volumes, db_path, table_name="asset_prices"):
+@timed("rs.save_prices_to_sqlite")
+def save_prices_to_sqlite(df_prices, df_volumes, db_path, table_name=PRICES_TABLE, incremental_from=None,
+                          df_high=None, df_low=None, df_indicators=None):
+    if df_indicators is None:
+        print(f"📈 Calculando indicadores técnicos ({', '.join(PERSISTED_INDICATORS)})...")
+        df_indicators = compute_technical_indicators(df_prices, df_volumes, df_high, df_low)
+
     df_prices = df_prices.copy()
     df_volumes = df_volumes.copy()
 
@@ -122,33 +266,191 @@ def save_prices_to_sqlite(df_prices, df_volumes, db_path, table_name="asset_pric
 
     df_merged = pd.merge(df_prices_melted, df_volumes_melted, on=["Date", "Ticker"])
 
-    print("📈 Calculando indicadores técnicos...")
-    df_indicators = compute_technical_indicators(df_prices)
-
     # Merge para juntar preços, volumes e indicadores
-    final_df = pd.merge(df_merged, df_indicators, on=["Date", "Ticker", "Price"], how="left")
+    final_df = pd.merge(df_merged, df_indicators, on=["Date", "Ticker"], how="left")
 
     # Adicionar MarketCap (último valor disponível por ativo)
     print("💰 Buscando MarketCap atual dos ativos...")
     marketcap_df = fetch_market_caps(df_prices.columns)
     final_df = pd.merge(final_df, marketcap_df, on="Ticker", how="left")
 
-    engine = create_engine(db_path)
-    final_df.to_sql(table_name, con=engine, if_exists="replace", index=False)
+    engine = create_sqlite_engine(db_path)
+    save_table(final_df, engine, table_name, incremental_from=incremental_from, indexes=PRICES_INDEXES)
     print(f"✅ Preços, volumes, indicadores e MarketCap salvos na tabela '{table_name}'")
+    return rows_written(final_df, incremental_from)
+
+# =============================
+# Atualização incremental
+# =============================
+def trim_warmup(df, last_date, n_warmup):
+    # Mantém apenas as linhas de aquecimento anteriores à última data gravada
+    first_new = df.index.searchsorted(last_date)
+    return df.iloc[max(0, first_new - n_warmup):]
+
+def get_rs_incremental_start(engine):
+    # Última data de força relativa, ou None se o universo de pares mudou
+    last_rs = last_stored_date(engine, TABLE_NAME)
+    if last_rs is None:
+        return None
+    expected_pairs = {f"{b}/{q}" for b, q in combinations(sorted(TICKERS), 2)}
+    if stored_values(engine, TABLE_NAME, "Pair", last_rs) != expected_pairs:
+        return None
+    return last_rs
+
+def get_prices_incremental_start(engine):
+    # Última data de preços/indicadores, ou None se o universo de ativos mudou
+    last_prices = last_stored_date(engine, PRICES_TABLE)
+    if last_prices is None:
+        return None
+    if stored_values(engine, PRICES_TABLE, "Ticker", last_prices) != set(TICKERS):
+        return None
+    # Indicador novo na configuração: carga completa
+    if not set(indicator_columns(PERSISTED_INDICATORS)) <= stored_columns(engine, PRICES_TABLE):
+        return None
+    # Sem estado dos indicadores anterior à última data (dentro do download): carga completa
+    saved = load_indicator_state(engine)
+    if saved is None or not pd.Timestamp(warmup_start(last_prices, INDICATOR_WARMUP)) <= saved[0] < last_prices:
+        return None
+    return last_prices
+
+def get_incremental_start(engine):
+    """
+    Última data comum às duas tabelas, ou None se for preciso uma carga completa.
+    """
+    last_rs = get_rs_incremental_start(engine)
+    last_prices = get_prices_incremental_start(engine)
+    if last_rs is None or last_prices is None:
+        return None
+    return min(last_rs, last_prices)
+
+@timed("rs.update_relative_strength")
+def update_relative_strength(price_data, last_date=None):
+    """
+    Calcula e grava a força relativa. Com last_date, regrava apenas as linhas a partir dela.
+    """
+    if last_date is not None:
+        price_data = trim_warmup(price_data, last_date, max(WINDOWS) - 1)
+    rs_df = compute_relative_strength(price_data, WINDOWS)
+    save_to_sqlite(rs_df, DB_PATH, TABLE_NAME, incremental_from=last_date)
+    # Última força relativa por (Pair, Window) para o ranking da página
+    snapshot = build_latest_snapshot(rs_df, "RS", extra_columns=["RS_Smooth"])
+    save_to_sqlite(snapshot, DB_PATH, RS_LATEST_TABLE, indexes=SNAPSHOT_INDEXES)
+    return rows_written(rs_df, last_date)
+
+def load_indicator_state(engine, tickers=None):
+    # (data, estados) gravados para os ativos (na ordem de tickers) e indicadores atuais, ou None
+    if last_stored_date(engine, STATE_TABLE) is None:
+        return None
+    tickers = list(tickers) if tickers is not None else sorted(TICKERS)
+    return states_from_frame(read_table(engine, STATE_TABLE, {}), tickers, PERSISTED_INDICATORS)
+
+def _fields(price_data, volume_data, high_data, low_data):
+    return {"Close": price_data, "Volume": volume_data, "High": high_data, "Low": low_data}
+
+def _slice_fields(fields, rows):
+    return {name: (df.loc[rows] if df is not None else None) for name, df in fields.items()}
+
+@timed("rs.stream_indicators")
+def stream_indicators(fields, state_date, states):
+    """
+    Avança o estado salvo pelas barras posteriores a state_date (O(1) por barra e ativo).
+    Retorna (indicadores das barras novas, estado após a penúltima barra e sua data):
+    a última barra pode ser parcial, então o próximo incremental a recalcula.
+    """
+    new_dates = fields["Close"].index[fields["Close"].index > state_date]
+    head = _slice_fields(fields, new_dates[:-1])
+    df_head = advance_states(states, head, PERSISTED_INDICATORS)
+    saved_states, saved_date = copy.deepcopy(states), (new_dates[-2] if len(new_dates) > 1 else state_date)
+    df_last = advance_states(states, _slice_fields(fields, new_dates[-1:]), PERSISTED_INDICATORS)
+    return pd.concat([df_head, df_last], ignore_index=True), saved_states, saved_date
+
+@timed("rs.verify_indicators")
+def verify_indicators(df_indicators, from_date):
+    """
+    Compara os indicadores incrementais com o recálculo sobre todo o histórico (cache
+    local de preços). Gera RuntimeError se alguma coluna divergir.
+    """
+    close, volume, high, low = fetch_prices(TICKERS, START_DATE, END_DATE)
+    full = compute_technical_indicators(close, volume, high, low)
+    keys = ["Date", "Ticker"]
+    merged = df_indicators[df_indicators["Date"] >= from_date].merge(full, on=keys, suffixes=("", "_full"))
+    failed = []
+    for column in indicator_columns(PERSISTED_INDICATORS):
+        a, b = merged[column].to_numpy(), merged[f"{column}_full"].to_numpy()
+        ok = np.array_equal(np.isnan(a), np.isnan(b)) and np.allclose(a, b, rtol=VERIFY_RTOL, equal_nan=True)
+        diff = np.nanmax(np.abs(a - b)) if len(a) and not np.isnan(a - b).all() else 0.0
+        print(f"🔎 {column}: diferença máxima {diff:.3g} {'✅' if ok else '❌'}")
+        if not ok:
+            failed.append(column)
+    if failed:
+        raise RuntimeError(f"Indicadores incrementais divergem do recálculo completo: {failed}")
+
+@timed("rs.update_asset_prices")
+def update_asset_prices(price_data, volume_data, last_date=None, high_data=None, low_data=None,
+                        verify=VERIFY_INDICATORS):
+    """
+    Calcula indicadores, busca MarketCap e grava asset_prices e o estado dos indicadores.
+    Com last_date, avança o estado salvo só pelas barras novas e regrava as linhas a
+    partir dela. verify confere o resultado com o recálculo completo.
+    """
+    engine = create_sqlite_engine(DB_PATH)
+    fields = _fields(price_data, volume_data, high_data, low_data)
+    saved = load_indicator_state(engine, price_data.columns) if last_date is not None else None
+    if last_date is not None and (saved is None or not saved[0] < last_date or saved[0] not in price_data.index):
+        print("⚠️ Estado dos indicadores não cobre a atualização. Recalculando o histórico completo...")
+        price_data, volume_data, high_data, low_data = fetch_prices(TICKERS, START_DATE, END_DATE)
+        fields = _fields(price_data, volume_data, high_data, low_data)
+        last_date = None
+
+    if last_date is None:
+        df_indicators = compute_technical_indicators(price_data, volume_data, high_data, low_data)
+        # Estado após a penúltima barra (a última pode ser parcial)
+        state_date = price_data.index[-2] if len(price_data) > 1 else None
+        states = build_states(_slice_fields(fields, price_data.index[:-1]), PERSISTED_INDICATORS) \
+            if state_date is not None else None
+    else:
+        print(f"⚡ Avançando indicadores a partir do estado de {saved[0].date()}...")
+        df_indicators, states, state_date = stream_indicators(fields, *saved)
+        if verify:
+            verify_indicators(df_indicators, last_date)
+
+    n_rows = save_prices_to_sqlite(price_data, volume_data, DB_PATH, incremental_from=last_date,
+                                   df_indicators=df_indicators)
+    if states is not None:
+        save_table(states_to_frame(states, list(price_data.columns), state_date), engine, STATE_TABLE)
+    return n_rows
 
 # =============================
 # Execução principal
 # =============================
 if __name__ == "__main__":
-    print("🔄 Baixando dados...")
-    price_data, volume_data = fetch_prices(TICKERS, START_DATE, END_DATE)
+    parser = argparse.ArgumentParser(description="Atualiza preços, indicadores e força relativa.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Baixa e recalcula apenas as barras novas desde a última data gravada.")
+    parser.add_argument("--verify-indicators", action="store_true",
+                        help="Confere os indicadores incrementais com o recálculo completo.")
+    args = parser.parse_args()
 
-    print("📊 Calculando força relativa...")
-    rs_df = compute_relative_strength(price_data, WINDOWS)
+    last_date = get_incremental_start(create_sqlite_engine(DB_PATH)) if args.incremental else None
 
-    print("💾 Salvando dados de força relativa...")
-    save_to_sqlite(rs_df, DB_PATH, TABLE_NAME)
+    print("🔄 Baixando dados...")
+    if last_date is not None:
+        print(f"⏩ Atualização incremental a partir de {last_date.date()}")
+        # Um único download cobre o aquecimento das janelas, dos indicadores e o maior
+        # período do resumo da IA; cada etapa usa só o trecho de que precisa
+        start = warmup_start(last_date, max(max(WINDOWS), INDICATOR_WARMUP, max(AI_PERIODS)))
+    else:
+        if args.incremental:
+            print("⚠️ Sem histórico compatível gravado. Executando carga completa...")
+        start = START_DATE
+    price_data, volume_data, high_data, low_data = fetch_prices(TICKERS, start, END_DATE)
+
+    print("📊 Calculando e salvando força relativa...")
+    update_relative_strength(price_data, last_date)
 
     print("💾 Salvando preços, volumes, indicadores e MarketCap no banco de dados...")
-    save_prices_to_sqlite(price_data, volume_data, DB_PATH)
+    update_asset_prices(price_data, volume_data, last_date, high_data, low_data,
+                        verify=args.verify_indicators or VERIFY_INDICATORS)
+
+    print("🧠 Atualizando resumo para o agente de IA...")
+    update_ai_features(price_data, DB_PATH)
@@ -0,0 +1,55 @@
+import os
+import re
+import json
+import time
+import hashlib
+
+# =============================
+# Cache persistente de respostas do agente de IA
+# =============================
+# Uma resposta por (pergunta normalizada, período, versão dos dados, modelo), gravada
+# como JSON em AI_CACHE_DIR. Repetir a mesma pergunta sobre os mesmos dados não gera
+# nova chamada (nem custo) à OpenAI; uma atualização dos dados muda a versão e a chave.
+AI_CACHE_DIR = os.environ.get("AI_CACHE_DIR", "ai_cache")
+AI_CACHE_TTL_SECONDS = int(os.environ.get("AI_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+
+
+def normalize_prompt(prompt):
+    # Ignora caixa, espaços repetidos e pontuação final ("Qual o melhor ativo?" == "qual o melhor ativo")
+    return re.sub(r"\s+", " ", prompt.strip().lower()).rstrip(" ?!.")
+
+
+def cache_key(prompt, period_days, data_version, model):
+    payload = json.dumps([normalize_prompt(prompt), int(period_days), str(data_version), model])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(AI_CACHE_DIR, f"{key}.json")
+
+
+def get_cached_response(key):
+    """
+    Resposta gravada para a chave, ou None se não existir ou tiver expirado.
+    """
+    path = _entry_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get("created_at", 0) > AI_CACHE_TTL_SECONDS:
+        return None
+    return entry["response"]
+
+
+def save_response(key, response, **metadata):
+    os.makedirs(AI_CACHE_DIR, exist_ok=True)
+    entry = {"response": response, "created_at": time.time(), **metadata}
+    path = _entry_path(key)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+from openai import OpenAI
+
+# =============================
+# Cliente de chat em streaming com deduplicação de requisições em andamento
+# =============================
+# Cada pergunta é atendida por uma thread que consome o stream da OpenAI e acumula os
+# pedaços da resposta. Sessões que fazem a mesma pergunta (mesma chave do cache em
+# utils/ai_cache.py) enquanto ela está em andamento leem a mesma resposta, em vez de
+# abrir outra requisição.
+AI_TIMEOUT_SECONDS = float(os.environ.get("AI_TIMEOUT_SECONDS", "30"))
+AI_MAX_RETRIES = int(os.environ.get("AI_MAX_RETRIES", "2"))
+AI_BACKOFF_SECONDS = float(os.environ.get("AI_BACKOFF_SECONDS", "1"))
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+_stats = {"upstream": 0, "shared": 0}
+
+
+class InFlightRequest:
+    """
+    Resposta em construção: a thread de upstream acrescenta pedaços e os leitores
+    (uma ou mais sessões) os consomem à medida que chegam.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self._cond = threading.Condition()
+
+    def append(self, text):
+        with self._cond:
+            self.chunks.append(text)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done, self.error = True, error
+            self._cond.notify_all()
+
+    def iter_chunks(self, timeout=AI_TIMEOUT_SECONDS):
+        # Gera os pedaços desde o início; timeout vale para a espera de cada novo pedaço
+        position = 0
+        while True:
+            with self._cond:
+                if position == len(self.chunks) and not self.done:
+                    if not self._cond.wait_for(lambda: position < len(self.chunks) or self.done, timeout):
+                        raise TimeoutError(f"Sem resposta da IA em {timeout:.0f}s")
+                new_chunks = self.chunks[position:]
+                done, error = self.done, self.error
+            for text in new_chunks:
+                yield text
+            position += len(new_chunks)
+            if done and position == len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+    @property
+    def text(self):
+        return "".join(self.chunks)
+
+
+def _stream_completion(request, messages, api_key, base_url, model, timeout, max_retries, backoff,
+                       **params):
+    """
+    Consome o stream da OpenAI para request. Falhas antes do primeiro pedaço são
+    repetidas com espera exponencial; depois dele, repetir duplicaria o texto.
+    """
+    client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+    for attempt in range(max_retries + 1):
+        try:
+            stream = client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    request.append(chunk.choices[0].delta.content)
+            return
+        except Exception:
+            if request.chunks or attempt == max_retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def _run(key, request, on_complete, args, kwargs):
+    error = None
+    try:
+        _stream_completion(request, *args, **kwargs)
+        if on_complete is not None:
+            on_complete(request.text)
+    except Exception as e:
+        error = e
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        request.finish(error)
+
+
+def stream_answer(key, messages, api_key, base_url=None, model="gpt-4o-mini", on_complete=None,
+                  timeout=AI_TIMEOUT_SECONDS, max_retries=AI_MAX_RETRIES, backoff=AI_BACKOFF_SECONDS,
+                  **params):
+    """
+    Gera os pedaços da resposta para messages. Chamadas com a mesma key enquanto a
+    primeira está em andamento compartilham a mesma requisição. on_complete(texto) é
+    chamado uma única vez, pela thread de upstream, quando a resposta termina sem erro.
+    """
+    with _inflight_lock:
+        request = _inflight.get(key)
+        if request is None:
+            request = InFlightRequest()
+            _inflight[key] = request
+            _stats["upstream"] += 1
+            threading.Thread(
+                target=_run, daemon=True,
+                args=(key, request, on_complete,
+                      (messages, api_key, base_url, model, timeout, max_retries, backoff), params),
+            ).start()
+        else:
+            _stats["shared"] += 1
+    # Espera máxima por pedaço cobre todas as tentativas do upstream e as pausas entre elas
+    wait = timeout * (max_retries + 1) + backoff * (2 ** max_retries - 1)
+    return request.iter_chunks(timeout=wait)
+
+
+def inflight_stats():
+    with _inflight_lock:
+        return {**_stats, "in_flight": len(_inflight)}
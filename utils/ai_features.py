@@ -0,0 +1,162 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.sqlite_store import create_sqlite_engine
+from utils.storage import save_table
+from utils.timing import timed
+
+# =============================
+# Resumo compacto dos dados para o agente de IA
+# =============================
+# Materializado pelo pipeline para cada período do seletor do painel: uma linha por
+# (Period, Ticker) com preço, retorno, volatilidade e faixa, e uma por (Period, Pair)
+# com a correlação dos retornos e a variação da força relativa no período. O agente
+# monta o contexto a partir dessas tabelas, dentro de um orçamento de tokens.
+AI_TICKER_TABLE = "ai_ticker_features"
+AI_PAIR_TABLE = "ai_pair_features"
+# Mesmos períodos do seletor "Intervalo de análise" (app.py)
+AI_PERIODS = [3, 7, 21, 30, 60, 90, 180, 360]
+AI_FEATURE_INDEXES = [["Period"]]
+
+# Orçamento do contexto (estimativa: ~4 caracteres por token, sem tokenizer)
+AI_CONTEXT_TOKEN_BUDGET = int(os.environ.get("AI_CONTEXT_TOKEN_BUDGET", "1200"))
+CHARS_PER_TOKEN = 4
+# Máximo de pares listados em cada extremo (correlação e força relativa)
+AI_CONTEXT_MAX_PAIRS = 5
+
+
+# -------------------------
+# Cálculo (pipeline)
+# -------------------------
+def _period_prices(close, period_days):
+    # Mesmo corte do painel: datas a partir de (última data - período)
+    cutoff = close.index.max() - pd.Timedelta(days=period_days)
+    return close[close.index >= cutoff]
+
+
+@timed("ai_features.compute_ai_features")
+def compute_ai_features(close, periods=AI_PERIODS):
+    """
+    Resumo por período a partir dos fechamentos (datas x ativos, colunas em ordem
+    alfabética, como em update_data/rs.py). Retorna (por ativo, por par).
+    """
+    tickers = list(close.columns)
+    base_idx, quote_idx = np.triu_indices(len(tickers), k=1)
+    pair_names = [f"{tickers[b]}/{tickers[q]}" for b, q in zip(base_idx, quote_idx)]
+    last_date = close.index.max()
+
+    ticker_frames, pair_frames = [], []
+    for period in periods:
+        prices = _period_prices(close, period)
+        returns = prices.pct_change(fill_method=None).iloc[1:]
+        first = prices.bfill().iloc[0]
+        last = prices.ffill().iloc[-1]
+        period_return = last / first - 1
+
+        ticker_frames.append(pd.DataFrame({
+            "Period": period,
+            "Date": last_date,
+            "Ticker": tickers,
+            "Price": last.to_numpy(),
+            "Return": period_return.to_numpy(),
+            "Volatility": returns.std().to_numpy(),
+            "Low": prices.min().to_numpy(),
+            "High": prices.max().to_numpy(),
+            "Drawdown": (last / prices.max() - 1).to_numpy(),
+        }))
+
+        # Correlação dos retornos diários no período e variação de Base/Quote (força relativa)
+        corr = returns.corr(min_periods=3).to_numpy()
+        growth = (1 + period_return).to_numpy()
+        pair_frames.append(pd.DataFrame({
+            "Period": period,
+            "Date": last_date,
+            "Pair": pair_names,
+            "Correlation": corr[base_idx, quote_idx],
+            "RS_Change": growth[base_idx] / growth[quote_idx] - 1,
+        }))
+
+    return pd.concat(ticker_frames, ignore_index=True), pd.concat(pair_frames, ignore_index=True)
+
+
+@timed("ai_features.update_ai_features")
+def update_ai_features(close, db_path):
+    """
+    Recalcula e grava as tabelas do resumo (sempre por completo: são poucas linhas).
+    """
+    df_tickers, df_pairs = compute_ai_features(close)
+    engine = create_sqlite_engine(db_path)
+    save_table(df_tickers, engine, AI_TICKER_TABLE, indexes=AI_FEATURE_INDEXES)
+    save_table(df_pairs, engine, AI_PAIR_TABLE, indexes=AI_FEATURE_INDEXES)
+    print(f"✅ Resumo do agente de IA salvo ({len(df_tickers)} ativos/período, {len(df_pairs)} pares/período)")
+    return len(df_tickers) + len(df_pairs)
+
+
+# -------------------------
+# Montagem do contexto (painel)
+# -------------------------
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _pct(value, sign=True):
+    return "n/d" if pd.isna(value) else f"{value * 100:{'+' if sign else ''}.1f}%"
+
+
+def _ticker_lines(df):
+    df = df.sort_values("Return", ascending=False)
+    return [
+        f"{row.Ticker}: preço {row.Price:.4g} | retorno {_pct(row.Return)} "
+        f"| vol. diária {_pct(row.Volatility, sign=False)} | mín {row.Low:.4g} máx {row.High:.4g} "
+        f"| do topo {_pct(row.Drawdown)}"
+        for row in df.itertuples()
+    ]
+
+
+def _pair_sections(df, n_pairs):
+    corr = df.dropna(subset=["Correlation"]).sort_values("Correlation")
+    rs = df.dropna(subset=["RS_Change"]).sort_values("RS_Change")
+    sections = [
+        ("CORRELAÇÕES MAIS ALTAS (retornos diários):", corr.tail(n_pairs)[::-1], "Correlation"),
+        ("CORRELAÇÕES MAIS BAIXAS:", corr.head(n_pairs), "Correlation"),
+        ("FORÇA RELATIVA - BASE MAIS FORTE QUE QUOTE (variação de Base/Quote):", rs.tail(n_pairs)[::-1], "RS_Change"),
+        ("FORÇA RELATIVA - BASE MAIS FRACA QUE QUOTE:", rs.head(n_pairs), "RS_Change"),
+    ]
+    lines = []
+    for title, rows, column in sections:
+        if rows.empty:
+            continue
+        lines.append(title)
+        lines += [f"- {row.Pair}: " + (f"{row.Correlation:+.2f}" if column == "Correlation" else _pct(row.RS_Change))
+                  for row in rows.itertuples()]
+    return lines
+
+
+def build_ai_context(df_tickers, df_pairs, period_days, token_budget=AI_CONTEXT_TOKEN_BUDGET):
+    """
+    Contexto do agente para o período a partir do resumo gravado. Ativos vêm primeiro
+    (ordenados por retorno); os extremos de correlação e força relativa usam o máximo
+    de pares (até AI_CONTEXT_MAX_PAIRS) que ainda cabe em token_budget.
+    """
+    tickers = df_tickers[df_tickers["Period"] == period_days]
+    pairs = df_pairs[df_pairs["Period"] == period_days]
+    if tickers.empty:
+        return None
+
+    header = [
+        f"DADOS FINANCEIROS (período: {period_days} dias, última data: "
+        f"{pd.Timestamp(tickers['Date'].max()).strftime('%d/%m/%Y')}, {len(tickers)} ativos)",
+        "",
+        "ATIVOS (ordenados pelo retorno no período):",
+    ]
+    lines = header + _ticker_lines(tickers)
+    # Sem espaço nem para os ativos: mantém os melhores e piores retornos
+    while estimate_tokens("\n".join(lines)) > token_budget and len(lines) > len(header) + 2:
+        lines.pop(len(header) + (len(lines) - len(header)) // 2)
+
+    for n_pairs in range(AI_CONTEXT_MAX_PAIRS, 0, -1):
+        candidate = lines + [""] + _pair_sections(pairs, n_pairs)
+        if estimate_tokens("\n".join(candidate)) <= token_budget:
+            lines = candidate
+            break
+    return "\n".join(lines)
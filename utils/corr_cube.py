@@ -0,0 +1,171 @@
+import io
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+# =============================
+# Cubo denso de correlações (datas x pares x janelas) em arquivo memory-mapped
+# =============================
+# Substitui a tabela pivotada rolling_correlation_wide. O array fica em data.npy
+# (float32) e os rótulos de cada eixo em index.json. A leitura usa np.load com
+# mmap_mode="r": só as páginas efetivamente acessadas saem do disco.
+CUBE_DIR = os.environ.get("CORR_CUBE_DIR", "correlation_cube")
+DATA_FILE = "data.npy"
+INDEX_FILE = "index.json"
+
+
+class CorrelationCube:
+    def __init__(self, values, dates, pairs, windows):
+        self.values = values
+        self.dates = dates
+        self.pairs = pairs
+        self.windows = windows
+        self._pair_pos = {pair: i for i, pair in enumerate(pairs)}
+        self._window_pos = {window: i for i, window in enumerate(windows)}
+
+    def has_window(self, window):
+        return window in self._window_pos
+
+    def pair_history(self, pair, window):
+        """
+        Série temporal (view sem cópia) da correlação de um par numa janela.
+        """
+        column = self.values[:, self._pair_pos[pair], self._window_pos[window]]
+        return pd.Series(column, index=self.dates, name=pair, copy=False)
+
+    def cross_section(self, date, window):
+        """
+        Correlação de todos os pares numa data (a mais próxima anterior, se não houver barra).
+        """
+        row = max(0, self.dates.searchsorted(pd.Timestamp(date), side="right") - 1)
+        return pd.Series(self.values[row, :, self._window_pos[window]], index=self.pairs,
+                         name=self.dates[row], copy=False)
+
+
+def _resolve(cube_dir):
+    return CUBE_DIR if cube_dir is None else cube_dir
+
+
+def open_cube(cube_dir=None):
+    """
+    Abre o cubo em modo somente leitura, ou retorna None se ainda não existe.
+    """
+    cube_dir = _resolve(cube_dir)
+    index_path = os.path.join(cube_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    dates = pd.DatetimeIndex(pd.to_datetime(index["dates"]))
+    # O array pode ter mais linhas que o índice durante uma gravação incremental
+    values = np.load(os.path.join(cube_dir, DATA_FILE), mmap_mode="r")[:len(dates)]
+    return CorrelationCube(values, dates, index["pairs"], index["windows"])
+
+
+def _write_index(cube_dir, dates, pairs, windows):
+    # Troca atômica: leitores nunca veem um index.json pela metade
+    tmp_path = os.path.join(cube_dir, f"{INDEX_FILE}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "dates": [d.strftime("%Y-%m-%d %H:%M:%S") for d in dates],
+            "pairs": pairs,
+            "windows": windows,
+        }, f)
+    os.replace(tmp_path, os.path.join(cube_dir, INDEX_FILE))
+
+
+def _fill(values, dates, pairs, windows, new_rows):
+    date_pos = dates.get_indexer(pd.DatetimeIndex(new_rows["Date"]))
+    pair_pos = pd.Index(pairs).get_indexer(new_rows["Pair"].astype(str))
+    window_pos = pd.Index(windows).get_indexer(new_rows["Window"].astype(int))
+    valid = (date_pos >= 0) & (pair_pos >= 0) & (window_pos >= 0)
+    values[date_pos[valid], pair_pos[valid], window_pos[valid]] = \
+        new_rows["RollingCorrelation"].to_numpy(dtype=np.float32)[valid]
+
+
+def _grow_in_place(cube_dir, old, kept, dates, new_rows):
+    """
+    Aumenta data.npy para len(dates) linhas e grava só as linhas a partir de kept,
+    sem copiar o histórico. Retorna False (nada alterado) se o arquivo não permitir:
+    cubo encolhendo ou cabeçalho .npy que mudaria de tamanho.
+    """
+    path = os.path.join(cube_dir, DATA_FILE)
+    shape = (len(dates), len(old.pairs), len(old.windows))
+    if len(dates) < len(old.dates):
+        return False
+    with open(path, "rb") as f:
+        if np.lib.format.read_magic(f) != (1, 0):
+            return False
+        old_shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        offset = f.tell()
+    if fortran_order or dtype != np.float32 or old_shape[1:] != shape[1:]:
+        return False
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(header, {"descr": np.lib.format.dtype_to_descr(dtype),
+                                                  "fortran_order": False, "shape": shape})
+    if len(header.getvalue()) != offset:
+        return False
+
+    # Só cresce: mapas abertos pelos leitores continuam válidos
+    os.truncate(path, offset + int(np.prod(shape)) * dtype.itemsize)
+    values = np.memmap(path, dtype=dtype, mode="r+", offset=offset, shape=shape)
+    values[kept:] = np.nan
+    _fill(values, dates, old.pairs, old.windows, new_rows)
+    values.flush()
+    del values
+    # Cabeçalho depois dos dados e índice por último: até lá o cubo lido é o anterior
+    with open(path, "r+b") as f:
+        f.write(header.getvalue())
+    _write_index(cube_dir, dates, old.pairs, old.windows)
+    return True
+
+
+def write_cube(all_corr_df, cube_dir=None, incremental_from=None):
+    """
+    Grava o cubo a partir do formato longo (Date, Pair, Window, RollingCorrelation).
+    Com incremental_from, mantém as datas anteriores do cubo atual e regrava o restante:
+    com os mesmos pares e janelas o arquivo cresce no lugar; do contrário (ou na carga
+    completa) a gravação é feita num diretório temporário trocado no final.
+    """
+    cube_dir = _resolve(cube_dir)
+    old = open_cube(cube_dir) if incremental_from is not None else None
+    if old is not None:
+        new_rows = all_corr_df[all_corr_df["Date"] >= pd.Timestamp(incremental_from)]
+        kept = int(old.dates.searchsorted(pd.Timestamp(incremental_from)))
+        dates = old.dates[:kept].append(pd.DatetimeIndex(np.sort(new_rows["Date"].unique())))
+        pairs, windows = old.pairs, old.windows
+        same_axes = (set(new_rows["Pair"].astype(str).unique()) == set(pairs)
+                     and set(int(w) for w in new_rows["Window"].unique()) == set(windows))
+        if same_axes and _grow_in_place(cube_dir, old, kept, dates, new_rows):
+            return len(dates), len(pairs), len(windows)
+    else:
+        new_rows = all_corr_df
+        kept = 0
+        dates = pd.DatetimeIndex(np.sort(all_corr_df["Date"].unique()))
+        pairs = list(pd.unique(all_corr_df["Pair"].astype(str)))
+        windows = sorted(int(w) for w in all_corr_df["Window"].unique())
+
+    tmp_dir = f"{cube_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    values = np.lib.format.open_memmap(os.path.join(tmp_dir, DATA_FILE), mode="w+",
+                                       dtype=np.float32, shape=(len(dates), len(pairs), len(windows)))
+    values[:] = np.nan
+    if kept:
+        values[:kept] = old.values[:kept]
+
+    _fill(values, dates, pairs, windows, new_rows)
+    values.flush()
+    del values
+    _write_index(tmp_dir, dates, pairs, windows)
+
+    # Leitores com o cubo antigo aberto continuam com o arquivo antigo (mesmo inode)
+    old_dir = f"{cube_dir}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.isdir(cube_dir):
+        os.replace(cube_dir, old_dir)
+    os.replace(tmp_dir, cube_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return len(dates), len(pairs), len(windows)
@@ -0,0 +1,211 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from utils.rolling_corr import rolling_corr_pairs
+
+# =============================
+# Correlação móvel sob demanda (qualquer janela)
+# =============================
+# As janelas pré-calculadas ficam no cubo (utils/corr_cube.py). Para as demais, cada
+# consulta calcula só os pares pedidos, com as somas por bloco de utils/rolling_corr.py.
+# Os resultados ficam num LRU limitado, chaveado por (janela, pares, versão dos dados).
+CORR_CACHE_SIZE = int(os.environ.get("CORR_CACHE_SIZE", 64))
+
+
+class LRUCache:
+    def __init__(self, maxsize=CORR_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def info(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._items), "maxsize": self.maxsize}
+
+
+_results = LRUCache()
+
+
+class CorrelationMatrix:
+    """
+    Fechamentos (datas x ativos) para a correlação móvel (utils/rolling_corr.py) e os
+    retornos diários padronizados usados nas matrizes N x N. version identifica os dados.
+    """
+    def __init__(self, closes, version=None):
+        self.dates = closes.index
+        self.tickers = list(closes.columns)
+        self.version = version
+        self._pos = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+        values = self.values = closes.to_numpy(dtype=np.float64)
+        zero_row = np.zeros((1, values.shape[1]))
+
+        # Retornos diários padronizados para as matrizes N x N; a linha 0 (sem retorno)
+        # fica zerada e nunca entra numa janela (ver _has_return_window)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = values[1:] / values[:-1] - 1
+        returns[~np.isfinite(returns)] = 0.0
+        std = returns.std(axis=0) if len(returns) else np.ones(values.shape[1])
+        mean = returns.mean(axis=0) if len(returns) else np.zeros(values.shape[1])
+        self.returns = np.concatenate([zero_row, (returns - mean) / np.where(std > 0, std, 1.0)])
+
+    @property
+    def pairs(self):
+        return [f"{a}/{b}" for k, a in enumerate(self.tickers) for b in self.tickers[k + 1:]]
+
+    def pair_indices(self, pairs):
+        i_idx, j_idx = zip(*(pair.split("/") for pair in pairs))
+        return (np.array([self._pos[t] for t in i_idx]), np.array([self._pos[t] for t in j_idx]))
+
+
+def close_matrix(df_prices, tickers=None):
+    """
+    Matriz de fechamentos (datas x ativos) a partir de asset_prices (Date, Ticker, Price),
+    só com as datas em que todos os ativos têm preço, como no cálculo do pipeline.
+    """
+    closes = df_prices.pivot_table(index="Date", columns="Ticker", values="Price", observed=True)
+    if tickers is not None:
+        closes = closes[[t for t in tickers if t in closes.columns]]
+    closes.columns = closes.columns.astype(str)
+    return closes.dropna().sort_index()
+
+
+def _compute(matrix, window, pairs):
+    # Mesmo cálculo do pipeline (update_data/correlation.py), para um par de cada vez ou todos
+    i, j = matrix.pair_indices(pairs)
+    n_dates = len(matrix.dates)
+    if window < 2 or window > n_dates:
+        return np.full((n_dates, len(pairs)), np.nan)
+    return rolling_corr_pairs(matrix.values, i, j, [window])[window]
+
+
+def rolling_correlation(matrix, window, pairs=None):
+    """
+    Correlação móvel (datas x pares) para qualquer janela. pairs=None usa todos os pares.
+    O resultado é compartilhado via LRU: não deve ser alterado por quem chama.
+    """
+    pairs = tuple(matrix.pairs if pairs is None else pairs)
+    key = (int(window), pairs, matrix.version)
+    result = _results.get(key)
+    if result is None:
+        result = pd.DataFrame(_compute(matrix, int(window), pairs).astype(np.float32),
+                              index=matrix.dates, columns=list(pairs))
+        _results.put(key, result)
+    return result
+
+
+def latest_correlations(matrix, window):
+    """
+    Última correlação de cada par na janela, com Change_1D e Change_7D, no mesmo formato
+    da tabela rolling_correlation_latest.
+    """
+    corr = rolling_correlation(matrix, window)
+    tail = corr.dropna(how="all").tail(8)
+    if tail.empty:
+        return pd.DataFrame(columns=["Date", "Pair", "Window", "RollingCorrelation", "Change_1D", "Change_7D"])
+    last = tail.iloc[-1]
+    return pd.DataFrame({
+        "Date": tail.index[-1],
+        "Pair": last.index,
+        "Window": int(window),
+        "RollingCorrelation": last.values,
+        "Change_1D": (last - tail.iloc[-2]).values if len(tail) > 1 else np.nan,
+        "Change_7D": (last - tail.iloc[0]).values if len(tail) > 7 else np.nan,
+    }).dropna(subset=["RollingCorrelation"]).reset_index(drop=True)
+
+
+# -------------------------
+# Matriz N x N num ponto do tempo
+# -------------------------
+def _to_frame(cross, sum_x, window, tickers):
+    # Produtos cruzados e somas da janela -> matriz de correlação
+    cov = cross - np.outer(sum_x, sum_x) / window
+    std = np.sqrt(np.clip(np.diag(cov), 0, None))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / np.outer(std, std)
+    np.clip(corr, -1.0, 1.0, out=corr)
+    return pd.DataFrame(corr, index=tickers, columns=tickers)
+
+
+def _row_for(matrix, date):
+    # Última barra até a data pedida
+    return int(matrix.dates.searchsorted(pd.Timestamp(date), side="right")) - 1
+
+
+def _has_return_window(row, window):
+    # window retornos terminando em row precisam de window + 1 fechamentos
+    return window >= 2 and row >= window
+
+
+def correlation_matrix_at(matrix, date, window, tickers=None):
+    """
+    Matriz de correlação ativo x ativo dos retornos diários nos window dias que terminam
+    em date (ou na barra anterior mais próxima), calculada com um único produto matricial
+    sobre o recorte. Retorna None se não houver barras suficientes.
+    """
+    cols = [matrix._pos[t] for t in (tickers or matrix.tickers)]
+    row = _row_for(matrix, date)
+    if not _has_return_window(row, window):
+        return None
+    block = matrix.returns[row + 1 - window:row + 1, cols]
+    return _to_frame(block.T @ block, block.sum(axis=0), window, [matrix.tickers[c] for c in cols])
+
+
+def correlation_matrix_sequence(matrix, dates, window, tickers=None):
+    """
+    Gera (data, matriz de correlação dos retornos) para uma sequência de datas (ex.:
+    animação). As somas da janela são atualizadas incrementalmente entre datas próximas:
+    entram as barras novas e saem as que deixaram a janela, sem recalcular o recorte inteiro.
+    """
+    cols = [matrix._pos[t] for t in (tickers or matrix.tickers)]
+    names = [matrix.tickers[c] for c in cols]
+    values = matrix.returns[:, cols]
+    current = None
+    cross = sum_x = None
+
+    for row in sorted(_row_for(matrix, d) for d in dates):
+        if not _has_return_window(row, window):
+            continue
+        if current is None or row - current >= window:
+            block = values[row + 1 - window:row + 1]
+            cross, sum_x = block.T @ block, block.sum(axis=0)
+        elif row > current:
+            added = values[current + 1:row + 1]
+            removed = values[current + 1 - window:row + 1 - window]
+            cross = cross + added.T @ added - removed.T @ removed
+            sum_x = sum_x + added.sum(axis=0) - removed.sum(axis=0)
+        current = row
+        yield matrix.dates[row], _to_frame(cross, sum_x, window, names)
+
+
+def clear_cache():
+    _results.clear()
+
+
+def cache_info():
+    # Hits/misses acumulados e ocupação do LRU de resultados (painel de diagnóstico)
+    return _results.info()
@@ -1,6 +1,17 @@
+import os
+import threading
+from contextlib import contextmanager
 import pandas as pd
 from sqlalchemy import create_engine
 import streamlit as st
+from utils import storage, corr_cube, corr_engine
+from utils.panel import PricePanel, PANEL_COLUMNS
+from utils.portfolio import simulate_portfolios
+from utils.storage import read_table, last_stored_date
+from utils.sqlite_store import warmup_start
+from utils.snapshots import build_latest_snapshot, CORR_LATEST_TABLE, RS_LATEST_TABLE, SNAPSHOT_LOOKBACK
+from utils.ai_features import AI_TICKER_TABLE, AI_PAIR_TABLE
+from utils.timing import timed, timed_loader, note_cache_miss
 
 # -------------------------
 # Paths dos bancos de dados
@@ -14,32 +25,339 @@ DB_PATH_RS = "sqlite:///performance.db"
 engine_corr = create_engine(DB_PATH_CORR)
 engine_rs = create_engine(DB_PATH_RS)
 
+# -------------------------
+# Troca dos dados (utils/refresh.py)
+# -------------------------
+class DataSwapLock:
+    """
+    Leitura compartilhada / escrita exclusiva. A troca do staging (swap_in) segura a
+    escrita enquanto substitui os bancos, o cubo e o Parquet e limpa os caches; cada
+    carregamento do painel segura a leitura, então nunca vê parte dos arquivos trocada.
+    Leitores não esperam entre si (a leitura pode ser aninhada na mesma thread).
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    @contextmanager
+    def reading(self):
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def writing(self):
+        with self._cond:
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+data_swap = DataSwapLock()
+
+# -------------------------
+# Representação compacta em memória
+# -------------------------
+# Identificadores repetidos viram categorias
+CATEGORY_COLUMNS = ["Pair", "Ticker"]
+# Colunas em que float32 (~7 dígitos significativos) é suficiente
+FLOAT32_COLUMNS = ["RollingCorrelation", "RS", "RS_Smooth", "RSI"]
+# Colunas deriváveis de outras (Base/Quote saem de Pair)
+DERIVED_COLUMNS = {"relative_strength_long": ["Base", "Quote"]}
+
+def compact_frame(df, table_name):
+    """
+    Converte identificadores em categorias, reduz a precisão numérica onde possível
+    e remove colunas deriváveis. Guarda os bytes antes/depois em df.attrs["memory"].
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    df = df.drop(columns=[c for c in DERIVED_COLUMNS.get(table_name, []) if c in df.columns])
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    for column in FLOAT32_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("float32")
+    if "Window" in df.columns:
+        df["Window"] = pd.to_numeric(df["Window"], downcast="integer")
+    after = int(df.memory_usage(deep=True).sum())
+    df.attrs["memory"] = {"before": before, "after": after}
+    return df
+
+def memory_report(**frames):
+    """
+    Tabela com o uso de memória (antes/depois da compactação) de cada dataset carregado.
+    """
+    rows = []
+    for name, df in frames.items():
+        memory = df.attrs.get("memory", {})
+        after = memory.get("after", int(df.memory_usage(deep=True).sum()))
+        before = memory.get("before", after)
+        rows.append({
+            "Dataset": name,
+            "Linhas": len(df),
+            "Antes (MB)": before / 1024 ** 2,
+            "Depois (MB)": after / 1024 ** 2,
+            "Redução": 1 - after / before if before else 0.0
+        })
+    return pd.DataFrame(rows)
+
 # -------------------------
 # Funções de carregamento
 # -------------------------
+@timed_loader("db.load_corr_data")
 @st.cache_data(ttl=300)
-def load_corr_data(_engine=engine_corr):
-    df = pd.read_sql("SELECT * FROM rolling_correlation_long", con=_engine)
-    df["Date"] = pd.to_datetime(df["Date"])
-    return df
+def load_corr_data(window=None, pairs=None, start=None, end=None, columns=None, _engine=engine_corr):
+    note_cache_miss()
+    df = read_table(_engine, "rolling_correlation_long", {"Window": window, "Pair": pairs}, start, end, columns)
+    return compact_frame(df, "rolling_correlation_long")
 
+@timed_loader("db.load_rs_data")
 @st.cache_data(ttl=300)
-def load_rs_data(_engine=engine_rs):
-    df = pd.read_sql("SELECT * FROM relative_strength_long", con=_engine)
-    df["Date"] = pd.to_datetime(df["Date"])
-    return df
+def load_rs_data(window=None, pairs=None, start=None, end=None, columns=None, _engine=engine_rs):
+    note_cache_miss()
+    df = read_table(_engine, "relative_strength_long", {"Window": window, "Pair": pairs}, start, end, columns)
+    return compact_frame(df, "relative_strength_long")
 
+def load_rs_history(pair, window, columns=None):
+    # Histórico de um único par/janela (gráfico da página de força relativa)
+    with data_swap.reading():
+        return load_rs_data(window=int(window), pairs=(pair,), columns=tuple(columns) if columns else None)
+
+@timed_loader("db.load_price_data")
 @st.cache_data(ttl=300)
-def load_price_data(_engine=engine_rs):
-    df = pd.read_sql("SELECT * FROM asset_prices", con=_engine)
-    df["Date"] = pd.to_datetime(df["Date"])
-    return df
+def load_price_data(tickers=None, start=None, end=None, columns=None, _engine=engine_rs):
+    note_cache_miss()
+    df = read_table(_engine, "asset_prices", {"Ticker": tickers}, start, end, columns)
+    return compact_frame(df, "asset_prices")
+
+def _read_latest(engine, table_name, long_table, value_column, extra_columns, window, columns):
+    """
+    Tabela de última posição. Bancos gravados antes dela existir (sem atualização desde
+    então) ainda não a têm: o snapshot é montado a partir das últimas datas da tabela
+    longa, ou volta vazio com as colunas esperadas se nem ela existir.
+    """
+    if last_stored_date(engine, table_name) is not None:
+        df = read_table(engine, table_name, {"Window": window}, columns=columns)
+    else:
+        last_date = last_stored_date(engine, long_table)
+        expected = ["Date", "Pair", "Window", value_column] + extra_columns + ["Change_1D", "Change_7D"]
+        if last_date is None:
+            df = pd.DataFrame(columns=expected)
+        else:
+            long_columns = ["Date", "Pair", "Window", value_column] + extra_columns
+            df = build_latest_snapshot(
+                read_table(engine, long_table, {"Window": window}, start=warmup_start(last_date, SNAPSHOT_LOOKBACK),
+                           columns=long_columns),
+                value_column, extra_columns
+            )
+        if columns:
+            df = df[list(columns)]
+    return compact_frame(df, table_name)
+
+@timed_loader("db.load_corr_latest")
+@st.cache_data(ttl=300)
+def load_corr_latest(window=None, columns=None, _engine=engine_corr):
+    note_cache_miss()
+    return _read_latest(_engine, CORR_LATEST_TABLE, "rolling_correlation_long", "RollingCorrelation", [],
+                        window, columns)
+
+@timed_loader("db.load_rs_latest")
+@st.cache_data(ttl=300)
+def load_rs_latest(window=None, columns=None, _engine=engine_rs):
+    note_cache_miss()
+    return _read_latest(_engine, RS_LATEST_TABLE, "relative_strength_long", "RS", ["RS_Smooth"],
+                        window, columns)
+
+def _read_ai_features(engine, table_name, period, columns):
+    # Resumo gerado pelo pipeline; vazio enquanto ele não rodou com essa etapa
+    if last_stored_date(engine, table_name) is None:
+        return pd.DataFrame()
+    return compact_frame(read_table(engine, table_name, {"Period": period}, columns=columns), table_name)
+
+@timed_loader("db.load_ai_tickers")
+@st.cache_data(ttl=300)
+def load_ai_tickers(period=None, columns=None, _engine=engine_rs):
+    note_cache_miss()
+    return _read_ai_features(_engine, AI_TICKER_TABLE, period, columns)
+
+@timed_loader("db.load_ai_pairs")
+@st.cache_data(ttl=300)
+def load_ai_pairs(period=None, columns=None, _engine=engine_rs):
+    note_cache_miss()
+    return _read_ai_features(_engine, AI_PAIR_TABLE, period, columns)
+
+@timed_loader("db.load_corr_cube")
+@st.cache_resource
+def load_corr_cube(columns=None):
+    # Cubo memory-mapped (compartilhado entre sessões, sem cópia); columns é ignorado
+    note_cache_miss()
+    return corr_cube.open_cube()
+
+@timed_loader("db.load_corr_matrix")
+@st.cache_resource
+def load_corr_matrix(columns=None):
+    # Fechamentos prontos para correlação sob demanda (janelas fora do cubo)
+    note_cache_miss()
+    df = read_table(engine_rs, "asset_prices", {}, columns=["Date", "Ticker", "Price"])
+    cube = load_corr_cube()
+    # Mesma ordem de ativos do cubo, para os nomes dos pares coincidirem ("A/B")
+    tickers = None
+    if cube is not None:
+        tickers = list(dict.fromkeys(t for pair in cube.pairs for t in pair.split("/")))
+    return corr_engine.CorrelationMatrix(corr_engine.close_matrix(df, tickers), get_data_version())
+
+# Dias lidos além do período: a última data válida do painel pode ficar antes da última gravada
+PANEL_MARGIN_DAYS = 7
+
+@timed_loader("db._rankings_panel")
+@st.cache_resource(max_entries=16)
+def _rankings_panel(period_days, data_version):
+    note_cache_miss()
+    # Só as barras do período (mais a folga), não todo o histórico de asset_prices
+    last_date = last_stored_date(engine_rs, "asset_prices")
+    start = last_date - pd.Timedelta(days=period_days + PANEL_MARGIN_DAYS) if last_date is not None else None
+    panel = PricePanel(load_price_data(start=start, columns=tuple(PANEL_COLUMNS)), period_days)
+    if start is not None and panel.start_date < start:
+        # Últimas barras sem preço além da folga: recarrega o histórico completo
+        panel = PricePanel(load_price_data(columns=tuple(PANEL_COLUMNS)), period_days)
+    return panel
+
+def load_rankings_panel(period_days):
+    # Painel compartilhado por (período, versão dos dados); deve ser tratado como somente leitura
+    with data_swap.reading():
+        return _rankings_panel(period_days, get_data_version())
+
+@timed_loader("db._portfolio_simulation")
+@st.cache_data(max_entries=32)
+def _portfolio_simulation(assets, period_days, rebalance_days, data_version):
+    note_cache_miss()
+    df_ret = load_rankings_panel(period_days).returns_for(list(assets))
+    return simulate_portfolios(df_ret, rebalance_days=rebalance_days)
+
+def load_portfolio_simulation(assets, period_days, rebalance_days=1):
+    # Monte Carlo de carteiras por (ativos, período, rebalanceamento, versão dos dados)
+    with data_swap.reading():
+        return _portfolio_simulation(tuple(assets), period_days, rebalance_days, get_data_version())
+
+# -------------------------
+# Carregamento por página
+# -------------------------
+DATASET_LOADERS = {
+    "corr": load_corr_data,
+    "rs": load_rs_data,
+    "prices": load_price_data,
+    "corr_latest": load_corr_latest,
+    "rs_latest": load_rs_latest,
+    "corr_cube": load_corr_cube,
+    "corr_matrix": load_corr_matrix,
+    "ai_tickers": load_ai_tickers,
+    "ai_pairs": load_ai_pairs,
+}
+
+# Datasets que dependem do período selecionado na barra lateral (colunas fixas)
+PERIOD_DATASET_LOADERS = {
+    "rankings_panel": load_rankings_panel,
+}
+
+def _load_dataset(name, columns, period_days):
+    if name in PERIOD_DATASET_LOADERS:
+        return PERIOD_DATASET_LOADERS[name](period_days)
+    return DATASET_LOADERS[name](columns=tuple(columns) if columns else None)
+
+@timed("db.load_page_data")
+def load_page_data(requirements, period_days=None):
+    """
+    Carrega apenas os datasets/colunas declarados pela página em DATA_REQUIREMENTS
+    ({dataset: [colunas] ou None para todas}). Todos vêm da mesma versão dos dados.
+    period_days é o período selecionado, usado pelos datasets de PERIOD_DATASET_LOADERS.
+    """
+    with data_swap.reading():
+        return {name: _load_dataset(name, columns, period_days) for name, columns in requirements.items()}
 
 # -------------------------
 # Função para última atualização
 # -------------------------
+@timed_loader("db.get_last_update")
 @st.cache_data
 def get_last_update(_engine, table_name):
-    query = f"SELECT MAX(Date) as last_update FROM {table_name}"
-    df = pd.read_sql(query, con=_engine)
-    return df["last_update"].iloc[0]
+    note_cache_miss()
+    with data_swap.reading():
+        return last_stored_date(_engine, table_name)
+
+# -------------------------
+# Versão dos dados e invalidação
+# -------------------------
+# Contador de trocas de dados, incrementado por utils/refresh.py a cada swap_in
+DATA_GENERATION_FILE = "data_generation.txt"
+
+def _read_generation():
+    try:
+        with open(DATA_GENERATION_FILE, "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+def bump_data_generation():
+    """
+    Incrementa o contador de trocas (chamado com a escrita de data_swap em andamento).
+    """
+    generation = _read_generation() + 1
+    tmp_path = f"{DATA_GENERATION_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(generation))
+    os.replace(tmp_path, DATA_GENERATION_FILE)
+    return generation
+
+def _stat_version(path):
+    # mtime em nanossegundos e tamanho: duas gravações no mesmo segundo não colidem
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "0"
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+def get_data_version():
+    """
+    Identificador que muda a cada troca de dados: contador de trocas do painel mais
+    mtime (ns) e tamanho dos bancos / diretórios do cubo e Parquet, que também pegam
+    gravações feitas pelos scripts. Útil como parte da chave de caches derivados dos dados.
+    """
+    paths = [DB_PATH_CORR.replace("sqlite:///", ""), DB_PATH_RS.replace("sqlite:///", ""),
+             corr_cube.CUBE_DIR]
+    if storage.use_parquet():
+        paths.append(storage.PARQUET_DIR)
+    return "-".join([str(_read_generation())] + [_stat_version(p) for p in paths])
+
+def invalidate_caches():
+    # Conexões abertas ainda apontam para os arquivos antigos após a troca
+    engine_corr.dispose()
+    engine_rs.dispose()
+    load_corr_data.clear()
+    load_rs_data.clear()
+    load_price_data.clear()
+    load_corr_latest.clear()
+    load_rs_latest.clear()
+    load_ai_tickers.clear()
+    load_ai_pairs.clear()
+    load_corr_cube.clear()
+    load_corr_matrix.clear()
+    corr_engine.clear_cache()
+    _rankings_panel.clear()
+    _portfolio_simulation.clear()
+    get_last_update.clear()
@@ -1,30 +1,86 @@
-import subprocess
-import sys
+import os
+import pandas as pd
 import streamlit as st
+from utils import corr_engine
+from utils.ai_client import inflight_stats
+from utils.db import memory_report
+from utils.pipeline import STAGE_LABELS
+from utils.refresh import start_refresh, get_refresh_status
+from utils.timing import collected_spans, cache_counts
+
+STATUS_ICONS = {"loading": "⏳", "running": "⏳", "done": "✅", "error": "❌"}
 
 def update_all_data():
-    # Atualizar Correlações
-    with st.spinner("Executando script de correlação..."):
-        result_corr = subprocess.run([sys.executable, "update_data/correlation.py"])
-    if result_corr.returncode == 0:
-        st.success("✅ Correlações atualizadas com sucesso.")
+    # Dispara a atualização em segundo plano; o painel continua com os dados atuais
+    if start_refresh(incremental=True):
+        st.toast("🔁 Atualização iniciada em segundo plano.")
     else:
-        st.error("❌ Erro ao atualizar correlações.")
+        st.info("⏳ Já existe uma atualização em andamento.")
 
-    # Atualizar Preços e Força Relativa
-    with st.spinner("Executando script de força relativa..."):
-        result_rs = subprocess.run([sys.executable, "update_data/rs.py"])
-    if result_rs.returncode == 0:
-        st.success("✅ Força relativa atualizada com sucesso.")
-    else:
-        st.error("❌ Erro ao atualizar força relativa.")
+def _refresh_status_panel():
+    status = get_refresh_status()
+    state = status["state"]
+
+    if state == "running":
+        st.progress(status["progress"], text=f"🔁 Atualizando dados (início: {status['started_at']})...")
+        for stage, info in status["stages"].items():
+            label = STAGE_LABELS.get(stage, "Preços (cache local)")
+            seconds = f" ({info['seconds']:.1f}s)" if "seconds" in info else ""
+            st.caption(f"{STATUS_ICONS.get(info['status'], '')} {label}{seconds}")
+        return
+
+    finished_at = status.get("finished_at")
+    if state in ("done", "error") and st.session_state.get("refresh_seen") != finished_at:
+        st.session_state["refresh_seen"] = finished_at
+        if state == "done":
+            # Recarrega a página inteira para ler os dados novos
+            st.rerun()
+    if state == "done":
+        st.success(f"🎉 Dados atualizados com sucesso em {finished_at}.")
+    elif state == "error":
+        st.error(f"❌ Erro na última atualização ({finished_at}): {status['error']}")
+
+def render_refresh_status():
+    # Só consulta o status periodicamente enquanto houver uma atualização em andamento
+    running = get_refresh_status()["state"] == "running"
+    st.fragment(_refresh_status_panel, run_every=2 if running else None)()
+
+
+# -------------------------
+# Painel de diagnóstico (opt-in: PERF_PANEL=1 ou ?diagnostics=1)
+# -------------------------
+def perf_panel_enabled():
+    return os.environ.get("PERF_PANEL") == "1" or st.query_params.get("diagnostics") == "1"
+
+def render_perf_panel(data):
+    """
+    Tempos da rerun atual (spans), hits/misses dos caches e memória dos datasets carregados.
+    Chamado no fim do app, depois de todos os spans da rerun.
+    """
+    with st.expander("🩺 Diagnóstico de desempenho"):
+        spans = pd.DataFrame(collected_spans())
+        if spans.empty:
+            st.caption("Nenhum span registrado nesta execução.")
+        else:
+            spans["Etapa"] = ["\u2003" * depth + name for depth, name in zip(spans["depth"], spans["span"])]
+            spans["ms"] = spans["seconds"] * 1000
+            spans["Cache"] = spans["cache"].fillna("") if "cache" in spans else ""
+            st.dataframe(spans[["Etapa", "ms", "Cache"]], hide_index=True, use_container_width=True,
+                         column_config={"ms": st.column_config.NumberColumn(format="%.1f")})
+
+        caches = [{"Cache": name, "Hits": c["hits"], "Misses": c["misses"]} for name, c in cache_counts().items()]
+        corr_info = corr_engine.cache_info()
+        caches.append({"Cache": f"corr_engine (LRU {corr_info['size']}/{corr_info['maxsize']}, acumulado)",
+                       "Hits": corr_info["hits"], "Misses": corr_info["misses"]})
+        st.dataframe(pd.DataFrame(caches), hide_index=True, use_container_width=True)
 
-    # Limpar cache
-    from utils.db import load_corr_data, load_rs_data, load_price_data, get_last_update
-    load_corr_data.clear()
-    load_rs_data.clear()
-    load_price_data.clear()
-    get_last_update.clear()
+        ai = inflight_stats()
+        st.caption("Agente IA (processo): " + ", ".join(f"{k}={v}" for k, v in ai.items()))
 
-    if result_corr.returncode == 0 and result_rs.returncode == 0:
-        st.success("🎉 Todos os dados foram atualizados com sucesso!")
+        # O painel de rankings informa o dataset de onde foi montado
+        frames = {name: getattr(value, "frame", value) for name, value in data.items()}
+        frames = {name: df for name, df in frames.items() if isinstance(df, pd.DataFrame)}
+        if frames:
+            st.dataframe(memory_report(**frames), hide_index=True, use_container_width=True,
+                         column_config={c: st.column_config.NumberColumn(format="%.2f")
+                                        for c in ["Antes (MB)", "Depois (MB)"]})
@@ -0,0 +1,305 @@
+import json
+import numpy as np
+import pandas as pd
+from utils.indicators import INDICATORS, _wilder, _true_range
+
+# =============================
+# Estado incremental dos indicadores (atualização O(1) por barra)
+# =============================
+# Para cada indicador do registro (utils/indicators.py) há um "stream" que guarda o
+# mínimo necessário por ativo (somas móveis, buffers circulares, acumuladores de EMA)
+# e avança uma barra de cada vez para todos os ativos juntos. O estado é gravado na
+# tabela indicator_state do mesmo banco dos preços, com a data da última barra incluída.
+STATE_TABLE = "indicator_state"
+
+
+def _nan(n):
+    return np.full(n, np.nan)
+
+
+class _Rolling:
+    """
+    Média móvel simples com buffer circular e soma (e soma dos quadrados) corrente.
+    """
+    def __init__(self, period):
+        self.period = period
+
+    def from_history(self, values):
+        n_dates, n_assets = values.shape
+        buf = np.zeros((n_assets, self.period))
+        last = values[-self.period:]
+        # Posição de cada valor no buffer: (índice da barra) % period
+        for k, row in enumerate(last):
+            buf[:, (n_dates - len(last) + k) % self.period] = row
+        return {"buf": buf, "sum": buf.sum(axis=1), "sumsq": (buf ** 2).sum(axis=1),
+                "count": np.full(n_assets, float(n_dates))}
+
+    def step(self, state, x):
+        rows = np.arange(len(x))
+        pos = (state["count"] % self.period).astype(int)
+        old = np.where(state["count"] >= self.period, state["buf"][rows, pos], 0.0)
+        state["sum"] += x - old
+        state["sumsq"] += x ** 2 - old ** 2
+        state["buf"][rows, pos] = x
+        state["count"] += 1
+        full = state["count"] >= self.period
+        mean = np.where(full, state["sum"] / self.period, np.nan)
+        var = np.where(full, np.maximum(state["sumsq"] / self.period - mean ** 2, 0.0), np.nan)
+        return mean, var
+
+
+class _EMA:
+    def __init__(self, span=None, alpha=None):
+        self.alpha = alpha if alpha is not None else 2 / (span + 1)
+
+    def from_history(self, values):
+        ema = pd.DataFrame(values).ewm(alpha=self.alpha, adjust=False).mean().to_numpy()
+        return {"ema": ema[-1].copy() if len(ema) else _nan(values.shape[1]),
+                "count": np.full(values.shape[1], float(len(values)))}
+
+    def step(self, state, x):
+        state["ema"] = np.where(state["count"] == 0, x, state["ema"] + self.alpha * (x - state["ema"]))
+        state["count"] += 1
+        return state["ema"].copy()
+
+
+class _Wilder:
+    """
+    Média de Wilder de uma série (ganhos, perdas, true range): avg guarda a soma das
+    `period` primeiras observações, depois a média simples e, daí em diante, a recursão.
+    """
+    def __init__(self, period):
+        self.period = period
+
+    def from_history(self, values):
+        n_obs, n_assets = values.shape
+        if n_obs >= self.period:
+            avg = _wilder(pd.DataFrame(values), self.period).to_numpy()[-1].copy()
+        else:
+            avg = values.sum(axis=0)
+        return {"avg": avg, "count": np.full(n_assets, float(n_obs))}
+
+    def step(self, state, x):
+        p = self.period
+        k = state["count"] + 1
+        state["avg"] = np.where(k < p, state["avg"] + x,
+                                np.where(k == p, (state["avg"] + x) / p, state["avg"] + (x - state["avg"]) / p))
+        state["count"] = k
+        return np.where(k >= p, state["avg"], np.nan)
+
+
+# -------------------------
+# Streams por indicador
+# -------------------------
+class SMAStream:
+    def __init__(self, column, period):
+        self.column, self.rolling = column, _Rolling(period)
+
+    def from_history(self, fields):
+        return self.rolling.from_history(fields["Close"])
+
+    def step(self, state, bar):
+        mean, _ = self.rolling.step(state, bar["Close"])
+        return {self.column: mean}
+
+
+class BollingerStream:
+    def __init__(self, period=20, n_std=2):
+        self.rolling, self.n_std = _Rolling(period), n_std
+
+    def from_history(self, fields):
+        return self.rolling.from_history(fields["Close"])
+
+    def step(self, state, bar):
+        mean, var = self.rolling.step(state, bar["Close"])
+        std = np.sqrt(var)
+        return {"BB_Middle": mean, "BB_Upper": mean + self.n_std * std, "BB_Lower": mean - self.n_std * std}
+
+
+class EMAStream:
+    def __init__(self, column, span):
+        self.column, self.ema = column, _EMA(span)
+
+    def from_history(self, fields):
+        return self.ema.from_history(fields["Close"])
+
+    def step(self, state, bar):
+        return {self.column: self.ema.step(state, bar["Close"])}
+
+
+class MACDStream:
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast, self.slow, self.signal = _EMA(fast), _EMA(slow), _EMA(signal)
+
+    def from_history(self, fields):
+        close = fields["Close"]
+        fast, slow = self.fast.from_history(close), self.slow.from_history(close)
+        line = (pd.DataFrame(close).ewm(alpha=self.fast.alpha, adjust=False).mean()
+                - pd.DataFrame(close).ewm(alpha=self.slow.alpha, adjust=False).mean()).to_numpy()
+        return {"fast": fast, "slow": slow, "signal": self.signal.from_history(line)}
+
+    def step(self, state, bar):
+        line = self.fast.step(state["fast"], bar["Close"]) - self.slow.step(state["slow"], bar["Close"])
+        signal = self.signal.step(state["signal"], line)
+        return {"MACD": line, "MACD_Signal": signal, "MACD_Hist": line - signal}
+
+
+class RSIStream:
+    def __init__(self, period=14):
+        self.gain, self.loss = _Wilder(period), _Wilder(period)
+
+    def from_history(self, fields):
+        delta = np.diff(fields["Close"], axis=0)
+        return {"prev": fields["Close"][-1].copy(),
+                "gain": self.gain.from_history(np.clip(delta, 0, None)),
+                "loss": self.loss.from_history(np.clip(-delta, 0, None))}
+
+    def step(self, state, bar):
+        x = bar["Close"]
+        delta = x - state["prev"]
+        state["prev"] = x.copy()
+        avg_gain = self.gain.step(state["gain"], np.clip(delta, 0, None))
+        avg_loss = self.loss.step(state["loss"], np.clip(-delta, 0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {"RSI": 100 - (100 / (1 + avg_gain / avg_loss))}
+
+
+class RSISMAStream:
+    def __init__(self, period=14):
+        self.gain, self.loss = _Rolling(period), _Rolling(period)
+
+    def from_history(self, fields):
+        delta = np.diff(fields["Close"], axis=0)
+        return {"prev": fields["Close"][-1].copy(),
+                "gain": self.gain.from_history(np.clip(delta, 0, None)),
+                "loss": self.loss.from_history(np.clip(-delta, 0, None))}
+
+    def step(self, state, bar):
+        x = bar["Close"]
+        delta = x - state["prev"]
+        state["prev"] = x.copy()
+        avg_gain, _ = self.gain.step(state["gain"], np.clip(delta, 0, None))
+        avg_loss, _ = self.loss.step(state["loss"], np.clip(-delta, 0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {"RSI_SMA": 100 - (100 / (1 + avg_gain / avg_loss))}
+
+
+class ATRStream:
+    def __init__(self, period=14):
+        self.wilder = _Wilder(period)
+
+    def from_history(self, fields):
+        close, high, low = (pd.DataFrame(fields[f]) for f in ("Close", "High", "Low"))
+        true_range = _true_range(close, high, low).to_numpy()
+        return {"prev": fields["Close"][-1].copy(), "tr": self.wilder.from_history(true_range)}
+
+    def step(self, state, bar):
+        prev = state["prev"]
+        true_range = np.fmax(bar["High"] - bar["Low"],
+                             np.fmax(np.abs(bar["High"] - prev), np.abs(bar["Low"] - prev)))
+        state["prev"] = bar["Close"].copy()
+        return {"ATR": self.wilder.step(state["tr"], true_range)}
+
+
+class OBVStream:
+    def from_history(self, fields):
+        direction = np.sign(np.diff(fields["Close"], axis=0))
+        obv = (direction * fields["Volume"][1:]).sum(axis=0)
+        return {"prev": fields["Close"][-1].copy(), "obv": obv}
+
+    def step(self, state, bar):
+        state["obv"] = state["obv"] + np.sign(bar["Close"] - state["prev"]) * bar["Volume"]
+        state["prev"] = bar["Close"].copy()
+        return {"OBV": state["obv"].copy()}
+
+
+STREAMS = {
+    "RSI": RSIStream(),
+    "RSI_SMA": RSISMAStream(),
+    "SMA_20": SMAStream("SMA_20", 20),
+    "SMA_50": SMAStream("SMA_50", 50),
+    "EMA_20": EMAStream("EMA_20", 20),
+    "MACD": MACDStream(),
+    "BBANDS": BollingerStream(),
+    "ATR": ATRStream(),
+    "OBV": OBVStream(),
+}
+
+
+# -------------------------
+# Construção, avanço e persistência
+# -------------------------
+def _field_arrays(fields, names, index, columns):
+    required = {f for name in names for f in INDICATORS[name]["requires"]}
+    return {f: fields[f].reindex(index=index, columns=columns).to_numpy(dtype=np.float64) for f in required}
+
+
+def build_states(fields, names):
+    """
+    Estado de cada indicador após a última barra de fields (formato largo).
+    """
+    close = fields["Close"]
+    arrays = _field_arrays(fields, names, close.index, close.columns)
+    return {name: STREAMS[name].from_history(arrays) for name in names}
+
+
+def advance_states(states, fields, names):
+    """
+    Avança os estados barra a barra (todos os ativos de uma vez) e devolve os indicadores
+    das barras novas em formato longo (Date, Ticker, colunas). Os estados são alterados.
+    """
+    close = fields["Close"]
+    arrays = _field_arrays(fields, names, close.index, close.columns)
+    outputs = {}
+    for t in range(len(close.index)):
+        bar = {f: values[t] for f, values in arrays.items()}
+        for name in names:
+            for column, value in STREAMS[name].step(states[name], bar).items():
+                outputs.setdefault(column, []).append(value)
+
+    long_df = pd.DataFrame({
+        "Date": np.repeat(close.index.values, len(close.columns)),
+        "Ticker": np.tile(np.asarray(close.columns, dtype=object), len(close.index)),
+    })
+    for column, rows in outputs.items():
+        long_df[column] = np.vstack(rows).ravel()
+    return long_df
+
+
+def _to_jsonable(state, i):
+    if isinstance(state, dict):
+        return {key: _to_jsonable(value, i) for key, value in state.items()}
+    value = state[i]
+    return value.tolist() if isinstance(value, np.ndarray) else float(value)
+
+
+def _from_jsonable(states):
+    # Lista (um por ativo) de estados aninhados -> arrays com os ativos no primeiro eixo
+    first = states[0]
+    if isinstance(first, dict):
+        return {key: _from_jsonable([s[key] for s in states]) for key in first}
+    return np.array(states, dtype=np.float64)
+
+
+def states_to_frame(states, tickers, date):
+    rows = [{"Ticker": ticker, "Indicator": name, "Date": pd.Timestamp(date),
+             "State": json.dumps(_to_jsonable(state, i))}
+            for name, state in states.items() for i, ticker in enumerate(tickers)]
+    return pd.DataFrame(rows, columns=["Ticker", "Indicator", "Date", "State"])
+
+
+def states_from_frame(df, tickers, names):
+    """
+    Estados gravados (ou None se faltar algum ativo/indicador ou as datas divergirem).
+    Retorna (data do estado, estados).
+    """
+    if df is None or df.empty or df["Date"].nunique() != 1:
+        return None
+    df = df.assign(Ticker=df["Ticker"].astype(str)).set_index(["Indicator", "Ticker"])
+    states = {}
+    for name in names:
+        keys = [(name, ticker) for ticker in tickers]
+        if not all(key in df.index for key in keys):
+            return None
+        states[name] = _from_jsonable([json.loads(df.loc[key, "State"]) for key in keys])
+    return pd.Timestamp(df["Date"].iloc[0]), states
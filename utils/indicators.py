@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+# =============================
+# Registro de indicadores técnicos (vetorizados)
+# =============================
+# Cada indicador recebe os campos em formato largo (datas x ativos: "Close", "High",
+# "Low", "Volume") e devolve {coluna: matriz datas x ativos}, com as colunas declaradas
+# em outputs. Todos os ativos são calculados de uma vez; adicionar um indicador não
+# adiciona um loop por ativo.
+# warmup: barras anteriores necessárias para o valor coincidir com o cálculo sobre o
+# histórico completo (None = depende de todo o histórico, ex.: OBV).
+INDICATORS = {}
+
+# Médias exponenciais: barras de aquecimento por barra de período. Com 10x o período o
+# peso das barras não vistas fica abaixo de ~1e-4 (RSI 14: (13/14)^140 ≈ 3e-5).
+EMA_WARMUP_FACTOR = 10
+
+
+def register_indicator(name, outputs, warmup, requires=("Close",)):
+    def decorator(func):
+        INDICATORS[name] = {"func": func, "outputs": list(outputs), "warmup": warmup,
+                            "requires": tuple(requires)}
+        return func
+    return decorator
+
+
+def _ema(df, span):
+    return df.ewm(span=span, adjust=False).mean()
+
+
+def _wilder(df, period):
+    """
+    Média de Wilder: primeira média simples de `period` barras e, depois,
+    avg = avg_anterior + (x - avg_anterior) / period.
+    """
+    sma = df.rolling(period).mean()
+    first = sma.notna() & sma.shift(1).isna()
+    seeded = df.where(sma.notna()).mask(first, sma)
+    return seeded.ewm(alpha=1 / period, adjust=False).mean()
+
+
+def _true_range(close, high, low):
+    # Na primeira barra (sem fechamento anterior) vale high - low
+    prev_close = close.shift(1)
+    true_range = np.fmax(high - low, np.fmax((high - prev_close).abs(), (low - prev_close).abs()))
+    return true_range.where(high.notna() & low.notna())
+
+
+# -------------------------
+# Indicadores
+# -------------------------
+@register_indicator("RSI", ["RSI"], warmup=14 * EMA_WARMUP_FACTOR)
+def rsi(fields, period=14):
+    # RSI de Wilder (14)
+    delta = fields["Close"].diff()
+    avg_gain = _wilder(delta.clip(lower=0), period)
+    avg_loss = _wilder(-delta.clip(upper=0), period)
+    return {"RSI": 100 - (100 / (1 + avg_gain / avg_loss))}
+
+
+@register_indicator("RSI_SMA", ["RSI_SMA"], warmup=14)
+def rsi_sma(fields, period=14):
+    # RSI com média simples (cálculo antigo do painel)
+    delta = fields["Close"].diff()
+    avg_gain = delta.clip(lower=0).rolling(period).mean()
+    avg_loss = (-delta.clip(upper=0)).rolling(period).mean()
+    return {"RSI_SMA": 100 - (100 / (1 + avg_gain / avg_loss))}
+
+
+@register_indicator("SMA_20", ["SMA_20"], warmup=20)
+def sma_20(fields):
+    return {"SMA_20": fields["Close"].rolling(20).mean()}
+
+
+@register_indicator("SMA_50", ["SMA_50"], warmup=50)
+def sma_50(fields):
+    return {"SMA_50": fields["Close"].rolling(50).mean()}
+
+
+@register_indicator("EMA_20", ["EMA_20"], warmup=20 * EMA_WARMUP_FACTOR)
+def ema_20(fields):
+    return {"EMA_20": _ema(fields["Close"], 20)}
+
+
+@register_indicator("MACD", ["MACD", "MACD_Signal", "MACD_Hist"], warmup=(26 + 9) * EMA_WARMUP_FACTOR)
+def macd(fields, fast=12, slow=26, signal=9):
+    line = _ema(fields["Close"], fast) - _ema(fields["Close"], slow)
+    signal_line = _ema(line, signal)
+    return {"MACD": line, "MACD_Signal": signal_line, "MACD_Hist": line - signal_line}
+
+
+@register_indicator("BBANDS", ["BB_Middle", "BB_Upper", "BB_Lower"], warmup=20)
+def bollinger(fields, period=20, n_std=2):
+    middle = fields["Close"].rolling(period).mean()
+    std = fields["Close"].rolling(period).std(ddof=0)
+    return {"BB_Middle": middle, "BB_Upper": middle + n_std * std, "BB_Lower": middle - n_std * std}
+
+
+@register_indicator("ATR", ["ATR"], warmup=14 * EMA_WARMUP_FACTOR, requires=("Close", "High", "Low"))
+def atr(fields, period=14):
+    true_range = _true_range(fields["Close"], fields["High"], fields["Low"])
+    return {"ATR": _wilder(true_range, period)}
+
+
+@register_indicator("OBV", ["OBV"], warmup=None, requires=("Close", "Volume"))
+def obv(fields):
+    direction = np.sign(fields["Close"].diff()).fillna(0)
+    return {"OBV": (direction * fields["Volume"]).cumsum()}
+
+
+# -------------------------
+# Execução
+# -------------------------
+def indicator_warmup(names):
+    """
+    Maior aquecimento entre os indicadores escolhidos (None se algum precisa do histórico todo).
+    """
+    warmups = [INDICATORS[name]["warmup"] for name in names]
+    return None if any(w is None for w in warmups) else max(warmups, default=0)
+
+
+def indicator_columns(names):
+    return [column for name in names for column in INDICATORS[name]["outputs"]]
+
+
+def compute_indicators(fields, names):
+    """
+    Calcula os indicadores escolhidos sobre os campos largos e devolve o formato longo
+    (Date, Ticker, uma coluna por saída). Campos ausentes geram ValueError.
+    """
+    close = fields["Close"]
+    outputs = {}
+    for name in names:
+        spec = INDICATORS[name]
+        missing = [f for f in spec["requires"] if fields.get(f) is None]
+        if missing:
+            raise ValueError(f"Indicador {name} requer os campos {missing}")
+        aligned = {f: fields[f].reindex(index=close.index, columns=close.columns) for f in spec["requires"]}
+        outputs.update(spec["func"](aligned))
+
+    long_df = pd.DataFrame({
+        "Date": np.repeat(close.index.values, len(close.columns)),
+        "Ticker": np.tile(np.asarray(close.columns, dtype=object), len(close.index)),
+    })
+    for column, matrix in outputs.items():
+        long_df[column] = matrix.to_numpy(dtype=np.float64).ravel()
+    return long_df
@@ -0,0 +1,73 @@
+import pandas as pd
+
+# =============================
+# Painel de preços por período (página de rankings)
+# =============================
+# Montado uma vez por (período, versão dos dados) em utils/db.py: matrizes largas
+# (datas x ativos) de preço, volume, RSI, SMAs, MarketCap e retornos, mais a tabela
+# de performance. As seções da página só recortam colunas dessas matrizes.
+PANEL_COLUMNS = ["Date", "Ticker", "Price", "Volume", "RSI", "SMA_20", "SMA_50", "MarketCap"]
+PANEL_FIELDS = {
+    "Price": "price",
+    "Volume": "volume",
+    "RSI": "rsi",
+    "SMA_20": "sma_20",
+    "SMA_50": "sma_50",
+    "MarketCap": "marketcap",
+}
+
+
+class PricePanel:
+    def __init__(self, df_prices, period_days):
+        # Dataset carregado (relatório de memória do painel de diagnóstico)
+        self.frame = df_prices
+        df_prices = df_prices.copy()
+        df_prices["Date"] = pd.to_datetime(df_prices["Date"])
+        df_prices["Ticker"] = df_prices["Ticker"].astype(str)
+        self.period_days = period_days
+
+        # Última data válida (preço e MarketCap) e início do período
+        self.last_date = df_prices.dropna(subset=["Price", "MarketCap"])["Date"].max()
+        self.start_date = self.last_date - pd.Timedelta(days=period_days)
+        df_period = df_prices[(df_prices["Date"] >= self.start_date) & (df_prices["Date"] <= self.last_date)]
+
+        self.tickers = sorted(df_period["Ticker"].unique())
+        self.n_dates = df_period["Date"].nunique()
+        wide = df_period.set_index(["Date", "Ticker"])[list(PANEL_FIELDS)].unstack("Ticker").sort_index()
+        for column, attr in PANEL_FIELDS.items():
+            setattr(self, attr, wide[column].reindex(columns=self.tickers))
+        self.returns = self.price.pct_change(fill_method=None)
+
+        self.performance = self._performance() if self.is_valid else pd.DataFrame()
+
+    @property
+    def is_valid(self):
+        return self.n_dates >= 2
+
+    def _performance(self):
+        # Retorno no período + médias e valores atuais, um ativo por linha
+        performance = ((self.price.iloc[-1] / self.price.iloc[0]) - 1).sort_values(ascending=False)
+        volume_total = self.volume.sum().rename("Volume Total")
+        indicators_avg = pd.DataFrame({
+            "RSI": self.rsi.mean(), "SMA_20": self.sma_20.mean(), "SMA_50": self.sma_50.mean()
+        })
+        current_prices = self.price.iloc[-1].dropna().rename("Preço Atual")
+        current_marketcap = self.marketcap.iloc[-1].rename("MarketCap")
+
+        performance_df = (
+            performance.to_frame("Retorno")
+            .merge(volume_total, left_index=True, right_index=True)
+            .merge(indicators_avg, left_index=True, right_index=True)
+            .merge(current_prices, left_index=True, right_index=True)
+            .merge(current_marketcap, left_index=True, right_index=True)
+        )
+        # 'Preço Atual' logo depois do ticker
+        columns = ["Preço Atual", "Retorno", "Volume Total", "RSI", "SMA_20", "SMA_50", "MarketCap"]
+        return performance_df[columns].rename_axis("Ticker").reset_index()
+
+    def returns_for(self, tickers):
+        """
+        Retornos diários (sem datas incompletas) dos ativos pedidos que existem no painel.
+        """
+        columns = [t for t in tickers if t in self.returns.columns]
+        return self.returns[columns].iloc[1:].dropna()
@@ -0,0 +1,153 @@
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from update_data import correlation, rs
+from utils import storage, corr_cube, ai_features
+from utils.snapshots import SNAPSHOT_LOOKBACK
+from utils.price_cache import get_prices
+from utils.sqlite_store import create_sqlite_engine, warmup_start
+from utils.timing import span, timed
+
+# =============================
+# Pipeline de atualização em um único processo coordenador
+# =============================
+# Os preços são carregados uma vez (cache local) e as etapas rodam em paralelo
+# num pool de processos. Cada etapa grava suas próprias tabelas.
+STAGES = ["correlation", "relative_strength", "indicators", "ai_features"]
+STAGE_LABELS = {
+    "correlation": "Correlações móveis",
+    "relative_strength": "Força relativa",
+    "indicators": "Preços, indicadores e MarketCap",
+    "ai_features": "Resumo para o agente de IA",
+}
+
+
+def _configure_worker(data_paths):
+    """
+    Inicializador dos processos do pool: aponta as etapas para outros destinos
+    (ex.: bancos de staging). data_paths: correlation_db, performance_db, corr_cube_dir,
+    parquet_dir.
+    """
+    if not data_paths:
+        return
+    if data_paths.get("correlation_db"):
+        correlation.DB_PATH = data_paths["correlation_db"]
+        correlation.engine = create_sqlite_engine(correlation.DB_PATH)
+    if data_paths.get("performance_db"):
+        rs.DB_PATH = data_paths["performance_db"]
+    if data_paths.get("corr_cube_dir"):
+        corr_cube.CUBE_DIR = data_paths["corr_cube_dir"]
+    if data_paths.get("parquet_dir"):
+        storage.PARQUET_DIR = data_paths["parquet_dir"]
+
+
+@timed("pipeline._stage_correlation")
+def _stage_correlation(last_date, close):
+    return correlation.update_correlations(close, last_date)
+
+
+@timed("pipeline._stage_relative_strength")
+def _stage_relative_strength(last_date, close):
+    return rs.update_relative_strength(close, last_date)
+
+
+@timed("pipeline._stage_indicators")
+def _stage_indicators(last_date, close, volume, high, low):
+    return rs.update_asset_prices(close, volume, last_date, high, low)
+
+
+@timed("pipeline._stage_ai_features")
+def _stage_ai_features(last_date, close):
+    # Sempre recalculado por completo a partir dos fechamentos do maior período
+    return ai_features.update_ai_features(close, rs.DB_PATH)
+
+
+STAGE_FUNCTIONS = {
+    "correlation": _stage_correlation,
+    "relative_strength": _stage_relative_strength,
+    "indicators": _stage_indicators,
+    "ai_features": _stage_ai_features,
+}
+
+
+def plan_stages(incremental=True):
+    """
+    Para cada etapa: (última data gravada ou None para carga completa, maior janela).
+    """
+    corr_engine = correlation.engine
+    rs_engine = rs.create_sqlite_engine(rs.DB_PATH)
+    plans = {
+        "correlation": (correlation.get_incremental_start(corr_engine),
+                        max(correlation.ROLLING_WINDOWS) + SNAPSHOT_LOOKBACK),
+        "relative_strength": (rs.get_rs_incremental_start(rs_engine), max(rs.WINDOWS)),
+        "indicators": (rs.get_prices_incremental_start(rs_engine), rs.INDICATOR_WARMUP),
+        "ai_features": (rs.last_stored_date(rs_engine, rs.PRICES_TABLE), max(ai_features.AI_PERIODS)),
+    }
+    if not incremental:
+        plans = {name: (None, window) for name, (_, window) in plans.items()}
+    return plans
+
+
+def _download_start(plans):
+    starts = [warmup_start(last_date, window) if last_date is not None else correlation.START_DATE
+              for last_date, window in plans.values()]
+    return min(starts)
+
+
+def _stage_inputs(frames):
+    # Argumentos de cada etapa. Correlação: ordem de TICKERS; força relativa,
+    # indicadores e resumo da IA: ordem alfabética
+    corr_close = correlation.closes_from_frames(frames, correlation.TICKERS)
+    rs_close, rs_volume = rs.prices_from_frames(frames)
+    rs_high, rs_low = rs.ranges_from_frames(frames, rs_close.index)
+    return {
+        "correlation": {"close": corr_close},
+        "relative_strength": {"close": rs_close},
+        "indicators": {"close": rs_close, "volume": rs_volume, "high": rs_high, "low": rs_low},
+        "ai_features": {"close": rs_close},
+    }
+
+
+def run_pipeline(incremental=True, on_progress=None, max_workers=len(STAGES), data_paths=None):
+    """
+    Executa todas as etapas e retorna {etapa: {"ok", "seconds", "rows"|"error"}}, com
+    rows = linhas gravadas pela etapa (storage.rows_written).
+    on_progress(etapa, status, info) é chamado no processo principal a cada mudança:
+    status em "loading", "running", "done" ou "error".
+    data_paths redireciona as gravações (ver _configure_worker); o planejamento incremental
+    lê os dados atuais, então os destinos devem começar como cópia deles.
+    """
+    def report(stage, status, info=None):
+        if on_progress is not None:
+            on_progress(stage, status, info)
+
+    started = time.perf_counter()
+    report("prices", "loading")
+    with span("pipeline.prices"):
+        plans = plan_stages(incremental)
+        frames = get_prices(correlation.TICKERS, _download_start(plans), correlation.END_DATE)
+        inputs = _stage_inputs(frames)
+    report("prices", "done", {"seconds": time.perf_counter() - started})
+
+    results = {}
+    # "spawn" evita herdar threads do servidor Streamlit num fork
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                             initializer=_configure_worker, initargs=(data_paths,)) as executor:
+        futures = {}
+        for stage in STAGES:
+            last_date, _ = plans[stage]
+            futures[executor.submit(STAGE_FUNCTIONS[stage], last_date, **inputs[stage])] = (stage, time.perf_counter())
+            report(stage, "running", {"incremental": last_date is not None})
+
+        for future in as_completed(futures):
+            stage, stage_start = futures[future]
+            seconds = time.perf_counter() - stage_start
+            try:
+                rows = future.result()
+                results[stage] = {"ok": True, "seconds": seconds, "rows": rows}
+                report(stage, "done", results[stage])
+            except Exception as e:
+                results[stage] = {"ok": False, "seconds": seconds, "error": repr(e)}
+                report(stage, "error", results[stage])
+    return results
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+# =============================
+# Simulação de carteiras em lote (Monte Carlo)
+# =============================
+# Milhares de vetores de pesos avaliados de uma vez: o retorno de todas as carteiras é
+# um produto matricial (datas x ativos) @ (ativos x carteiras), processado em lotes de
+# carteiras para limitar a memória.
+N_PORTFOLIOS = 20_000
+PORTFOLIO_CHUNK_SIZE = 5_000
+# Cripto negocia todos os dias
+PERIODS_PER_YEAR = 365
+# Mínimo para a simulação: 2 ativos com retornos em 2 datas (desvio padrão amostral)
+MIN_PORTFOLIO_ASSETS = 2
+MIN_PORTFOLIO_DATES = 2
+# Rebalanceamento: 1 = diário (pesos constantes), k = a cada k dias, 0 = nunca (buy and hold)
+REBALANCE_OPTIONS = {
+    "Diário": 1,
+    "Semanal (7 dias)": 7,
+    "Mensal (30 dias)": 30,
+    "Sem rebalanceamento": 0,
+}
+
+
+def random_weights(n_portfolios, n_assets, seed=42):
+    # Pesos uniformes no simplex (somam 1, sem venda a descoberto)
+    rng = np.random.default_rng(seed)
+    return rng.dirichlet(np.ones(n_assets), size=n_portfolios)
+
+
+def portfolio_values(returns, weights, rebalance_days=1):
+    """
+    Evolução (datas x carteiras, começando em 1) de cada vetor de pesos.
+    returns: datas x ativos (retornos simples); weights: carteiras x ativos.
+    Entre rebalanceamentos cada ativo rende por conta própria (buy and hold do bloco).
+    """
+    n_dates = returns.shape[0]
+    if rebalance_days == 1:
+        return np.cumprod(1 + returns @ weights.T, axis=0)
+
+    step = rebalance_days or n_dates
+    values = np.empty((n_dates, weights.shape[0]))
+    level = np.ones(weights.shape[0])
+    for start in range(0, n_dates, step):
+        growth = np.cumprod(1 + returns[start:start + step], axis=0)
+        values[start:start + step] = level * (growth @ weights.T)
+        level = values[min(start + step, n_dates) - 1]
+    return values
+
+
+def _metrics(values):
+    # Retornos diários de cada carteira a partir da evolução
+    previous = np.vstack([np.ones((1, values.shape[1])), values[:-1]])
+    daily = values / previous - 1
+    mean = daily.mean(axis=0)
+    std = daily.std(axis=0, ddof=1) if len(daily) > 1 else np.zeros(values.shape[1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(PERIODS_PER_YEAR), np.nan)
+    return mean, std, sharpe, values[-1] - 1
+
+
+def efficient_frontier(portfolios):
+    """
+    Fronteira eficiente das carteiras simuladas: maior retorno para cada nível de
+    volatilidade (envelope superior, com retorno crescente).
+    """
+    ordered = portfolios.sort_values("Volatilidade")
+    on_frontier = ordered["Retorno"] >= ordered["Retorno"].cummax()
+    return ordered[on_frontier].reset_index(drop=True)
+
+
+def _empty_result(assets):
+    portfolios = pd.DataFrame(columns=["Retorno", "Volatilidade", "Sharpe", "Retorno Acumulado"] + assets,
+                              dtype=float)
+    return {"portfolios": portfolios, "frontier": portfolios.copy(), "max_sharpe": None, "min_vol": None}
+
+
+def simulate_portfolios(df_ret, n_portfolios=N_PORTFOLIOS, rebalance_days=1, seed=42,
+                        chunk_size=PORTFOLIO_CHUNK_SIZE):
+    """
+    Avalia n_portfolios pesos aleatórios sobre os retornos diários (datas x ativos).
+    Retorna dict com portfolios (Retorno, Volatilidade, Sharpe, Retorno Acumulado e um
+    peso por ativo), frontier, max_sharpe e min_vol. Retorno/Volatilidade são diários.
+    Sem dados suficientes (ver MIN_PORTFOLIO_ASSETS/MIN_PORTFOLIO_DATES), portfolios e
+    frontier vêm vazios e max_sharpe/min_vol são None.
+    """
+    assets = list(df_ret.columns)
+    if len(assets) < MIN_PORTFOLIO_ASSETS or len(df_ret) < MIN_PORTFOLIO_DATES:
+        return _empty_result(assets)
+    returns = df_ret.to_numpy(dtype=np.float64)
+    weights = random_weights(n_portfolios, len(assets), seed)
+
+    metrics = [_metrics(portfolio_values(returns, weights[start:start + chunk_size], rebalance_days))
+               for start in range(0, n_portfolios, chunk_size)]
+    mean, std, sharpe, total = (np.concatenate(m) for m in zip(*metrics))
+
+    portfolios = pd.DataFrame(weights, columns=assets)
+    portfolios.insert(0, "Retorno", mean)
+    portfolios.insert(1, "Volatilidade", std)
+    portfolios.insert(2, "Sharpe", sharpe)
+    portfolios.insert(3, "Retorno Acumulado", total)
+
+    return {
+        "portfolios": portfolios,
+        "frontier": efficient_frontier(portfolios),
+        # Sharpe todo NaN quando nenhuma carteira varia no período
+        "max_sharpe": portfolios.loc[portfolios["Sharpe"].idxmax()] if portfolios["Sharpe"].notna().any() else None,
+        "min_vol": portfolios.loc[portfolios["Volatilidade"].idxmin()],
+    }
@@ -0,0 +1,145 @@
+import os
+import json
+import pandas as pd
+import yfinance as yf
+
+# =============================
+# Cache local de preços (OHLCV por ativo e intervalo)
+# =============================
+# Compartilhado por update_data/correlation.py e update_data/rs.py: cada ativo é
+# baixado uma única vez e as atualizações seguintes buscam apenas as lacunas.
+PRICE_CACHE_DIR = os.environ.get("PRICE_CACHE_DIR", "price_cache")
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+INDEX_FILE = "index.json"
+
+
+def _interval_dir(interval):
+    return os.path.join(PRICE_CACHE_DIR, interval)
+
+
+def _ticker_path(ticker, interval):
+    return os.path.join(_interval_dir(interval), f"{ticker}.parquet")
+
+
+def _load_index(interval):
+    # Guarda, por ativo, a data inicial já coberta pelos downloads (mesmo sem pregões)
+    path = os.path.join(_interval_dir(interval), INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_index(index, interval):
+    path = os.path.join(_interval_dir(interval), INDEX_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _load_ticker(ticker, interval):
+    path = _ticker_path(ticker, interval)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+def _save_ticker(df, ticker, interval):
+    path = _ticker_path(ticker, interval)
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _download(tickers, start, end, interval, downloader):
+    """
+    Baixa um lote de ativos e devolve {ticker: DataFrame OHLCV} sem linhas vazias.
+    """
+    raw = downloader(tickers, start=start, end=end, interval=interval,
+                     group_by="ticker", auto_adjust=True, progress=False)
+    frames = {}
+    for ticker in tickers:
+        try:
+            df = raw[ticker] if isinstance(raw.columns, pd.MultiIndex) else raw
+        except KeyError:
+            continue
+        df = df[[c for c in OHLCV_COLUMNS if c in df.columns]].dropna(how="all")
+        df.index = pd.to_datetime(df.index)
+        df.index.name = "Date"
+        frames[ticker] = df
+    return frames
+
+
+def _plan_gaps(tickers, start, end, interval, index):
+    """
+    Agrupa as lacunas por (início, fim) para baixar vários ativos numa única chamada.
+    A última barra em cache é sempre baixada de novo, pois pode estar incompleta, e a
+    lacuna anterior ao cache inclui a primeira barra dele (ver get_prices).
+    """
+    gaps = {}
+    for ticker in tickers:
+        cached = _load_ticker(ticker, interval)
+        covered_start = index.get(ticker, {}).get("covered_start")
+        if cached is None or cached.empty or covered_start is None:
+            gaps.setdefault((start, end), []).append(ticker)
+            continue
+        if pd.Timestamp(start) < pd.Timestamp(covered_start):
+            first_cached = (cached.index.min() + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+            gaps.setdefault((start, max(covered_start, first_cached)), []).append(ticker)
+        last_cached = cached.index.max().strftime("%Y-%m-%d")
+        gaps.setdefault((last_cached, end), []).append(ticker)
+    return gaps
+
+
+def get_prices(tickers, start, end, interval="1d", downloader=yf.download):
+    """
+    Retorna {ticker: DataFrame OHLCV indexado por Date} entre start e end,
+    baixando apenas o que ainda não está no cache local.
+    """
+    os.makedirs(_interval_dir(interval), exist_ok=True)
+    index = _load_index(interval)
+    gaps = _plan_gaps(tickers, start, end, interval, index)
+
+    for (gap_start, gap_end), gap_tickers in gaps.items():
+        print(f"⬇️ Baixando {len(gap_tickers)} ativo(s) de {gap_start} até {gap_end}...")
+        try:
+            downloaded = _download(gap_tickers, gap_start, gap_end, interval, downloader)
+        except Exception as e:
+            print(f"⚠️ Falha no download de {gap_tickers}: {e}")
+            continue
+        for ticker in gap_tickers:
+            new = downloaded.get(ticker)
+            cached = _load_ticker(ticker, interval)
+            if new is not None and not new.empty:
+                merged = new if cached is None else pd.concat([cached, new])
+                # Em datas repetidas, prevalece a barra mais recente (substitui barras parciais)
+                merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+                _save_ticker(merged, ticker, interval)
+            # O intervalo só conta como coberto se o download trouxe barras até o cache
+            # existente: um retorno vazio (o yfinance não gera erro em muitas falhas)
+            # não prova que não há dados antes. Ativos listados depois de gap_start
+            # devolvem a série a partir da listagem, o que conta como cobertura
+            if new is None or new.empty or (cached is not None and new.index.min() > cached.index.min()):
+                continue
+            entry = index.setdefault(ticker, {})
+            if entry.get("covered_start") is None or pd.Timestamp(gap_start) < pd.Timestamp(entry["covered_start"]):
+                entry["covered_start"] = gap_start
+    _save_index(index, interval)
+
+    frames = {}
+    for ticker in tickers:
+        cached = _load_ticker(ticker, interval)
+        if cached is None:
+            continue
+        frames[ticker] = cached[(cached.index >= pd.Timestamp(start)) & (cached.index < pd.Timestamp(end))]
+    return frames
+
+
+def wide_field(frames, field):
+    """
+    Monta uma tabela datas x ativos com um campo (ex.: Close, Volume) de get_prices.
+    """
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat({ticker: df[field] for ticker, df in frames.items()}, axis=1)
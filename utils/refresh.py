@@ -0,0 +1,166 @@
+import os
+import shutil
+import sqlite3
+import threading
+from datetime import datetime
+from utils import storage, corr_cube
+from utils.pipeline import run_pipeline, STAGES
+
+# =============================
+# Atualização em segundo plano com troca atômica dos dados
+# =============================
+# O pipeline grava numa cópia (staging) dos bancos; só quando todas as etapas terminam
+# com sucesso os arquivos são trocados, com os carregamentos do painel bloqueados durante
+# a troca. Quem estiver usando o painel continua lendo os dados antigos, sempre
+# consistentes, durante a atualização.
+LIVE_DATABASES = {
+    "correlation_db": "correlation.db",
+    "performance_db": "performance.db",
+}
+STAGING_DIR = os.environ.get("STAGING_DIR", "staging")
+
+_lock = threading.Lock()
+_job = {"state": "idle"}
+
+
+def _copy_sqlite(source, target, overwrite_file=True):
+    """
+    API de backup do SQLite: cópia consistente mesmo com leitores ativos. Sem
+    overwrite_file, o conteúdo do destino é substituído numa única transação, o que
+    é seguro em modo WAL (trocar o arquivo por baixo de um -wal existente não é).
+    """
+    if overwrite_file and os.path.exists(target):
+        os.remove(target)
+    if not os.path.exists(source):
+        return
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+
+def _stage_dir(live_dir):
+    staged_dir = os.path.join(STAGING_DIR, os.path.basename(live_dir))
+    shutil.rmtree(staged_dir, ignore_errors=True)
+    if os.path.isdir(live_dir):
+        shutil.copytree(live_dir, staged_dir)
+    return staged_dir
+
+
+def _swap_dir(staged_dir, live_dir):
+    if not os.path.isdir(staged_dir):
+        return
+    old_dir = f"{live_dir}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.isdir(live_dir):
+        os.replace(live_dir, old_dir)
+    os.replace(staged_dir, live_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def prepare_staging():
+    """
+    Copia os dados atuais para STAGING_DIR e devolve os data_paths do pipeline.
+    """
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    data_paths = {}
+    for key, live_file in LIVE_DATABASES.items():
+        staged_file = os.path.join(STAGING_DIR, os.path.basename(live_file))
+        _copy_sqlite(live_file, staged_file)
+        data_paths[key] = f"sqlite:///{staged_file}"
+    data_paths["corr_cube_dir"] = _stage_dir(corr_cube.CUBE_DIR)
+    if storage.use_parquet():
+        data_paths["parquet_dir"] = _stage_dir(storage.PARQUET_DIR)
+    return data_paths
+
+
+def swap_in(data_paths):
+    """
+    Substitui os dados atuais pelos do staging e invalida conexões e caches do painel
+    uma única vez, depois de todas as trocas. Cada troca é atômica (backup do SQLite,
+    os.replace dos diretórios do cubo e do Parquet), mas entre elas os arquivos ficam
+    misturados: os carregamentos do painel esperam o fim da troca (data_swap em
+    utils/db.py). Processos externos (scripts) podem ver essa janela de milissegundos.
+    """
+    from utils.db import data_swap, invalidate_caches, bump_data_generation
+    # Artefatos que o backend produziu, levantados antes de mexer nos dados atuais
+    # (com Parquet, por exemplo, não há performance.db no staging)
+    staged_files = [(data_paths[key].replace("sqlite:///", ""), live_file)
+                    for key, live_file in LIVE_DATABASES.items()]
+    staged_files = [(staged, live) for staged, live in staged_files if os.path.exists(staged)]
+    staged_dirs = [(data_paths["corr_cube_dir"], corr_cube.CUBE_DIR)]
+    if "parquet_dir" in data_paths:
+        staged_dirs.append((data_paths["parquet_dir"], storage.PARQUET_DIR))
+    staged_dirs = [(staged, live) for staged, live in staged_dirs if os.path.isdir(staged)]
+
+    with data_swap.writing():
+        for staged_file, live_file in staged_files:
+            _copy_sqlite(staged_file, live_file, overwrite_file=False)
+            if os.path.exists(staged_file):
+                os.remove(staged_file)
+        for staged_dir, live_dir in staged_dirs:
+            _swap_dir(staged_dir, live_dir)
+        # Nova versão dos dados mesmo que os arquivos trocados tenham o mesmo mtime/tamanho
+        bump_data_generation()
+        invalidate_caches()
+
+
+def _update_job(**changes):
+    with _lock:
+        _job.update(changes)
+
+
+def _on_progress(stage, status, info=None):
+    with _lock:
+        _job["stages"][stage] = {"status": status, **(info or {})}
+
+
+def _run_job(incremental):
+    try:
+        data_paths = prepare_staging()
+        results = run_pipeline(incremental=incremental, on_progress=_on_progress, data_paths=data_paths)
+        failed = [stage for stage, result in results.items() if not result["ok"]]
+        if failed:
+            # Dados atuais continuam intactos; o staging é descartado na próxima execução
+            _update_job(state="error", error=f"Falha nas etapas: {', '.join(failed)}")
+        else:
+            swap_in(data_paths)
+            _update_job(state="done")
+    except Exception as e:
+        _update_job(state="error", error=repr(e))
+    finally:
+        _update_job(finished_at=datetime.now().isoformat(timespec="seconds"))
+
+
+def start_refresh(incremental=True):
+    """
+    Inicia a atualização numa thread de fundo. Se já houver uma em andamento,
+    não inicia outra. Retorna True se uma nova atualização foi iniciada.
+    """
+    with _lock:
+        if _job["state"] == "running":
+            return False
+        _job.clear()
+        _job.update({
+            "state": "running",
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "stages": {},
+            "error": None,
+        })
+    threading.Thread(target=_run_job, args=(incremental,), name="data-refresh", daemon=True).start()
+    return True
+
+
+def get_refresh_status():
+    """
+    Cópia do estado atual: state ("idle", "running", "done", "error"), stages,
+    progress (0 a 1), started_at, finished_at e error.
+    """
+    with _lock:
+        status = {k: (dict(v) if isinstance(v, dict) else v) for k, v in _job.items()}
+    stages = status.get("stages", {})
+    finished = sum(1 for s in stages.values() if s["status"] in ("done", "error"))
+    status["progress"] = finished / (len(STAGES) + 1)
+    return status
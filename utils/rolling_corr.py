@@ -0,0 +1,55 @@
+import numpy as np
+
+# =============================
+# Correlação móvel de pares com somas acumuladas por bloco
+# =============================
+# Usada pelo pipeline (update_data/correlation.py) e pelo painel (utils/corr_engine.py).
+# Somas acumuladas sobre todo o histórico fazem cov = Σxy - ΣxΣy/n cancelar termos
+# enormes quando o preço percorre várias ordens de grandeza. Aqui as somas recomeçam a
+# cada bloco de datas, sobre o recorte do bloco (mais a maior janela) centralizado pela
+# própria média: os termos ficam na escala das variações locais.
+ROLLING_BLOCK_ROWS = 256
+# Variância da janela abaixo desta fração da soma dos quadrados = série constante (NaN)
+VAR_RTOL = 1e-10
+
+
+def rolling_corr_pairs(values, i, j, windows, block_rows=ROLLING_BLOCK_ROWS):
+    """
+    Correlação móvel entre as colunas values[:, i] e values[:, j] (pares i[k], j[k])
+    para cada janela. values: matriz datas x ativos sem NaN.
+    Retorna {janela: matriz datas x pares}, com NaN antes da janela completa.
+    """
+    n_dates = values.shape[0]
+    corrs = {window: np.full((n_dates, len(i)), np.nan) for window in windows}
+    max_window = max(windows)
+    zero_row = np.zeros((1, len(i)))
+
+    for block_start in range(0, n_dates, block_rows):
+        block_stop = min(block_start + block_rows, n_dates)
+        first = max(0, block_start - max_window + 1)
+        chunk = values[first:block_stop]
+        chunk = chunk - chunk.mean(axis=0)
+
+        # Somas acumuladas por ativo (compartilhadas pelos pares) e por par
+        cs_x = np.concatenate([np.zeros((1, chunk.shape[1])), np.cumsum(chunk, axis=0)])
+        cs_x2 = np.concatenate([np.zeros((1, chunk.shape[1])), np.cumsum(chunk * chunk, axis=0)])
+        cs_xy = np.concatenate([zero_row, np.cumsum(chunk[:, i] * chunk[:, j], axis=0)])
+
+        for window in windows:
+            start = max(block_start, window - 1)
+            if start >= block_stop:
+                continue
+            # Fim (exclusivo) de cada janela nas somas acumuladas do recorte
+            ends = np.arange(start, block_stop) - first + 1
+            begins = ends - window
+            sum_x = cs_x[ends] - cs_x[begins]
+            sum_x2 = cs_x2[ends] - cs_x2[begins]
+            var = np.maximum(sum_x2 - sum_x * sum_x / window, 0.0)
+            var[var <= VAR_RTOL * sum_x2] = np.nan
+            cov = (cs_xy[ends] - cs_xy[begins]) - sum_x[:, i] * sum_x[:, j] / window
+
+            with np.errstate(invalid="ignore"):
+                corr = cov / np.sqrt(var[:, i] * var[:, j])
+            np.clip(corr, -1.0, 1.0, out=corr)
+            corrs[window][start:block_stop] = corr
+    return corrs
@@ -0,0 +1,54 @@
+import numpy as np
+
+# =============================
+# Tabelas de "última posição" para os rankings
+# =============================
+# Materializadas pelo pipeline a cada atualização: um registro por (Pair, Window) com o
+# último valor e as variações de 1 e 7 barras. Os rankings leem só essas tabelas.
+CORR_LATEST_TABLE = "rolling_correlation_latest"
+RS_LATEST_TABLE = "relative_strength_latest"
+SNAPSHOT_KEYS = ["Pair", "Window"]
+SNAPSHOT_INDEXES = [["Window"]]
+# Maior variação calculada (Change_7D): o aquecimento incremental inclui essas barras a
+# mais além da maior janela, para a variação existir em todas as janelas
+SNAPSHOT_LOOKBACK = 7
+SNAPSHOT_RTOL = 1e-9
+
+
+def build_latest_snapshot(df, value_column, extra_columns=()):
+    """
+    Último valor válido de value_column por (Pair, Window) na data mais recente,
+    com Change_1D e Change_7D (diferença para 1 e 7 observações antes).
+    df deve trazer SNAPSHOT_LOOKBACK datas válidas antes da última em cada série (o
+    aquecimento incremental usa maior janela - 1 + SNAPSHOT_LOOKBACK barras).
+    """
+    columns = ["Date"] + SNAPSHOT_KEYS + [value_column] + list(extra_columns)
+    df = df[columns].dropna(subset=[value_column]).sort_values(SNAPSHOT_KEYS + ["Date"])
+    grouped = df.groupby(SNAPSHOT_KEYS, observed=True, sort=False)[value_column]
+    df["Change_1D"] = df[value_column] - grouped.shift(1)
+    df["Change_7D"] = df[value_column] - grouped.shift(SNAPSHOT_LOOKBACK)
+
+    latest = df.groupby(SNAPSHOT_KEYS, observed=True, sort=False).tail(1)
+    latest = latest[latest["Date"] == latest["Date"].max()]
+    return latest.reset_index(drop=True)
+
+
+def verify_snapshot(snapshot, reference, value_column):
+    """
+    Compara o snapshot incremental com o reconstruído a partir do histórico completo
+    (valor, Change_1D e Change_7D por (Pair, Window)). Gera RuntimeError se divergirem.
+    """
+    merged = snapshot.merge(reference, on=SNAPSHOT_KEYS, how="outer", suffixes=("", "_full"), indicator=True)
+    failed = []
+    if (merged["_merge"] != "both").any():
+        failed.append("Pair/Window")
+    merged = merged[merged["_merge"] == "both"]
+    for column in [value_column, "Change_1D", "Change_7D"]:
+        a = merged[column].to_numpy(dtype=float)
+        b = merged[f"{column}_full"].to_numpy(dtype=float)
+        ok = np.array_equal(np.isnan(a), np.isnan(b)) and np.allclose(a, b, rtol=SNAPSHOT_RTOL, equal_nan=True)
+        print(f"🔎 {column}: {int((np.isnan(a) != np.isnan(b)).sum())} NaN divergentes {'✅' if ok else '❌'}")
+        if not ok:
+            failed.append(column)
+    if failed:
+        raise RuntimeError(f"Snapshot incremental diverge do recálculo completo: {failed}")
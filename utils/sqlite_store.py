@@ -0,0 +1,218 @@
+import time
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from sqlalchemy import create_engine, inspect, text, bindparam
+
+# =============================
+# Conexão
+# =============================
+# Tempo (s) que uma conexão espera por outro processo que esteja gravando no mesmo banco
+SQLITE_BUSY_TIMEOUT = 300
+
+
+def create_sqlite_engine(db_path):
+    return create_engine(db_path, connect_args={"timeout": SQLITE_BUSY_TIMEOUT})
+
+
+# =============================
+# Atualização incremental (somente novas barras)
+# =============================
+# Formato usado pelo pandas/SQLAlchemy ao gravar datas no SQLite
+SQLITE_DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def format_sqlite_date(date):
+    return pd.Timestamp(date).strftime(SQLITE_DATE_FORMAT)
+
+
+def get_last_stored_date(engine, table_name):
+    """
+    Retorna a última data gravada na tabela, ou None se a tabela não existe/está vazia.
+    """
+    if not inspect(engine).has_table(table_name):
+        return None
+    with engine.connect() as conn:
+        last = conn.execute(text(f"SELECT MAX(Date) FROM {table_name}")).scalar()
+    return pd.Timestamp(last) if last is not None else None
+
+
+def get_stored_values(engine, table_name, column, date):
+    # Valores distintos de uma coluna (ex.: Pair, Ticker) gravados numa data
+    query = text(f"SELECT DISTINCT {column} FROM {table_name} WHERE Date = :date")
+    with engine.connect() as conn:
+        rows = conn.execute(query, {"date": format_sqlite_date(date)}).fetchall()
+    return {row[0] for row in rows}
+
+
+def get_stored_columns(engine, table_name):
+    # Colunas da tabela (vazio se ela não existe)
+    if not inspect(engine).has_table(table_name):
+        return set()
+    return {column["name"] for column in inspect(engine).get_columns(table_name)}
+
+
+def warmup_start(last_date, max_window):
+    """
+    Data inicial do download incremental: volta o suficiente para aquecer a maior janela.
+    Usa dias corridos com folga, já que podem faltar dias de negociação.
+    """
+    return (pd.Timestamp(last_date) - timedelta(days=2 * max_window + 7)).strftime("%Y-%m-%d")
+
+
+def upsert_from_date(df, engine, table_name, from_date, date_key="Date"):
+    """
+    Substitui as linhas com data >= from_date pelas linhas recalculadas de df.
+    A última barra gravada pode ter sido parcial, por isso ela também é regravada.
+    date_key é a coluna de data em df; no SQLite ela se chama str(date_key)
+    (tabelas pivotadas gravam colunas MultiIndex como "('Date', '')").
+    """
+    new_rows = df[df[date_key] >= pd.Timestamp(from_date)]
+    bulk_write(new_rows, engine, table_name, mode="append",
+               delete_where=(f'"{date_key}" >= ?', (format_sqlite_date(from_date),)))
+    return len(new_rows)
+
+
+# =============================
+# Gravação em massa
+# =============================
+# Pragmas aplicados apenas durante a carga; os valores anteriores da conexão são
+# restaurados no final (ela volta ao pool), com ou sem erro
+BULK_PRAGMAS = {
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": "-262144",
+}
+BULK_BATCH_SIZE = 100_000
+
+
+def _sqlite_column(series):
+    """
+    Converte uma coluna para valores nativos aceitos pelo sqlite3, no mesmo formato
+    que o to_sql usaria (datas como texto; NaN vira NULL no SQLite).
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        # Formata cada data distinta uma única vez
+        codes, uniques = pd.factorize(series)
+        formatted = np.append(np.asarray(uniques.strftime(SQLITE_DATE_FORMAT), dtype=object), None)
+        return formatted[codes].tolist()
+    if isinstance(series.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(series):
+        return series.astype(object).where(series.notna(), None).tolist()
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype(int).tolist()
+    return series.tolist()
+
+
+def bulk_write(df, engine, table_name, mode="replace", indexes=(), batch_size=BULK_BATCH_SIZE,
+               delete_where=None):
+    """
+    Grava df no SQLite com executemany em lotes dentro de uma única transação.
+    mode="replace" recria a tabela (mesmo esquema do to_sql) na mesma transação, então
+    uma falha mantém a tabela anterior; os índices só são criados no final.
+    mode="append" insere nas tabelas existentes. delete_where=(cláusula, parâmetros)
+    apaga linhas na mesma transação (upsert). O banco fica em modo WAL, que permite
+    leituras durante a gravação. Retorna linhas por segundo.
+    """
+    started = time.perf_counter()
+    recreate = mode == "replace" or not inspect(engine).has_table(table_name)
+    # Tabela com os tipos que o pandas/SQLAlchemy usariam, criada na mesma transação da carga
+    create_table = pd.io.sql.get_schema(df.head(0), table_name, con=engine) if recreate else None
+
+    columns = ", ".join(f'"{c}"' for c in df.columns)
+    placeholders = ", ".join("?" for _ in df.columns)
+    insert = f'INSERT INTO {table_name} ({columns}) VALUES ({placeholders})'
+
+    raw = engine.raw_connection()
+    cursor = raw.cursor()
+    previous = {}
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        for pragma, value in BULK_PRAGMAS.items():
+            previous[pragma] = cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.execute("BEGIN")
+        if create_table is not None:
+            cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+            cursor.execute(create_table)
+        if delete_where is not None:
+            clause, params = delete_where
+            cursor.execute(f"DELETE FROM {table_name} WHERE {clause}", params)
+        for start in range(0, len(df), batch_size):
+            batch = df.iloc[start:start + batch_size]
+            cursor.executemany(insert, zip(*[_sqlite_column(batch[c]) for c in batch.columns]))
+        raw.commit()
+        # Leva o conteúdo do WAL para o arquivo principal (cópias/trocas veem tudo)
+        cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        for pragma, value in previous.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+        raw.close()
+
+    if indexes:
+        create_indexes(engine, table_name, indexes)
+    seconds = time.perf_counter() - started
+    rows_per_second = len(df) / seconds if seconds > 0 else float("inf")
+    print(f"💾 {len(df):,} linhas gravadas em '{table_name}' em {seconds:.1f}s ({rows_per_second:,.0f} linhas/s)")
+    return rows_per_second
+
+
+# =============================
+# Índices
+# =============================
+def create_indexes(engine, table_name, indexes):
+    """
+    Cria (se ainda não existirem) os índices informados como listas de colunas.
+    Deve ser chamado depois de cada gravação: if_exists="replace" recria a tabela sem índices.
+    """
+    with engine.begin() as conn:
+        for columns in indexes:
+            index_name = f"idx_{table_name}_{'_'.join(columns).lower()}"
+            column_list = ", ".join(f'"{c}"' for c in columns)
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({column_list})"))
+
+
+# =============================
+# Leitura com filtros no SQL
+# =============================
+def read_filtered(engine, table_name, filters, start=None, end=None, columns=None):
+    """
+    Lê a tabela aplicando no SQL os filtros informados.
+    filters: dict coluna -> valor único ou lista de valores (None ignora o filtro).
+    start/end: limites (inclusivos) da coluna Date.
+    Os filtros seguem a ordem dos índices criados por create_indexes.
+    """
+    clauses, params, expanding = [], {}, []
+    for column, value in filters.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            clauses.append(f"{column} IN :{column}")
+            params[column] = list(value)
+            expanding.append(column)
+        else:
+            clauses.append(f"{column} = :{column}")
+            params[column] = value
+    if start is not None:
+        clauses.append("Date >= :start")
+        params["start"] = format_sqlite_date(start)
+    if end is not None:
+        clauses.append("Date <= :end")
+        params["end"] = format_sqlite_date(end)
+
+    column_list = ", ".join(f'"{c}"' for c in columns) if columns else "*"
+    query = f"SELECT {column_list} FROM {table_name}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    stmt = text(query)
+    if expanding:
+        stmt = stmt.bindparams(*[bindparam(c, expanding=True) for c in expanding])
+
+    with engine.connect() as conn:
+        df = pd.read_sql(stmt, con=conn, params=params)
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"])
+    return df
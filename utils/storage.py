@@ -0,0 +1,263 @@
+import os
+import re
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from utils.sqlite_store import (
+    get_last_stored_date, get_stored_values, get_stored_columns, upsert_from_date, create_indexes,
+    read_filtered, bulk_write
+)
+
+# =============================
+# Backend de armazenamento das tabelas longas
+# =============================
+# "sqlite" (padrão) ou "parquet"; usado pelos scripts de atualização e por utils/db.py
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "sqlite").lower()
+PARQUET_DIR = os.environ.get("PARQUET_DIR", "parquet_data")
+PARTITION_COLUMN = "Window"
+ROW_GROUP_SIZE = 128_000
+# Dentro de cada partição, um arquivo por mês de Date: a atualização incremental só
+# regrava os meses a partir de incremental_from
+PART_FILE_PATTERN = re.compile(r"^part-(\d{4}-\d{2})\.parquet$")
+
+
+def use_parquet():
+    return STORAGE_BACKEND == "parquet"
+
+
+# =============================
+# Parquet (dicionário + partições por Window)
+# =============================
+def parquet_path(table_name):
+    return os.path.join(PARQUET_DIR, table_name)
+
+
+def _partitioning(has_window):
+    if not has_window:
+        return None
+    return ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.int64())]), flavor="hive")
+
+
+def _dataset(table_name):
+    path = parquet_path(table_name)
+    if not os.path.isdir(path):
+        return None
+    has_window = any(name.startswith(f"{PARTITION_COLUMN}=") for name in os.listdir(path))
+    return ds.dataset(path, format="parquet", partitioning=_partitioning(has_window))
+
+
+def _to_arrow(df):
+    """
+    Converte colunas de texto em categorias (gravadas como dicionário no Parquet)
+    e ordena pelo identificador e pela data para que as estatísticas dos row groups
+    permitam pular blocos na leitura. Os índices do dicionário são sempre int32, para
+    que todos os arquivos do dataset tenham o mesmo schema.
+    """
+    df = df.copy()
+    for column in df.columns:
+        if column != "Date" and not pd.api.types.is_numeric_dtype(df[column]) \
+                and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    sort_keys = [c for c in ("Pair", "Ticker", "Date") if c in df.columns]
+    if sort_keys:
+        df = df.sort_values(sort_keys, kind="stable")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    schema = pa.schema([
+        field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+        if pa.types.is_dictionary(field.type) else field
+        for field in table.schema
+    ])
+    return table.cast(schema)
+
+
+def _part_groups(df):
+    """
+    Divide as linhas em {(diretório da partição, arquivo): DataFrame}, com uma
+    partição por Window (sem a coluna, que fica no caminho) e um arquivo por mês.
+    """
+    has_window = PARTITION_COLUMN in df.columns
+    partitions = df.groupby(PARTITION_COLUMN, sort=False) if has_window else [(None, df)]
+    groups = {}
+    for window, part in partitions:
+        directory = f"{PARTITION_COLUMN}={window}" if has_window else ""
+        if has_window:
+            part = part.drop(columns=[PARTITION_COLUMN])
+        months = part["Date"].dt.strftime("%Y-%m") if "Date" in part.columns else pd.Series("all", part.index)
+        for month, rows in part.groupby(months, sort=False):
+            groups[(directory, f"part-{month}.parquet")] = rows
+    return groups
+
+
+def _write_part(df, directory, name):
+    # Arquivo temporário oculto (o pyarrow ignora nomes com ".") trocado no final
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{name}.tmp")
+    pq.write_table(_to_arrow(df), tmp_path, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, os.path.join(directory, name))
+
+
+def _part_files(path):
+    # {(diretório da partição, arquivo): mês} dos arquivos gravados por _write_part;
+    # None se o dataset tiver outro layout (gravado antes dos arquivos mensais)
+    files = {}
+    for root, _, names in os.walk(path):
+        directory = os.path.relpath(root, path)
+        directory = "" if directory == "." else directory
+        for name in names:
+            if name.startswith("."):
+                continue
+            match = PART_FILE_PATTERN.match(name)
+            if match is None:
+                return None
+            files[(directory, name)] = match.group(1)
+    return files
+
+
+def _write_full(df, path):
+    # Dataset inteiro num diretório temporário, trocado no final: leitores nunca veem
+    # arquivos pela metade
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for (directory, name), rows in _part_groups(df).items():
+        _write_part(rows, os.path.join(tmp_path, directory), name)
+    old_path = f"{path}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.isdir(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def write_parquet(df, table_name, incremental_from=None):
+    """
+    Grava a tabela como dataset Parquet (partições por Window, um arquivo por mês).
+    Com incremental_from, só os arquivos dos meses a partir dessa data são regravados:
+    as linhas anteriores a ela são mantidas e o restante vem de df. Cada arquivo é
+    trocado atomicamente; durante a troca de vários meses um leitor pode ver alguns já
+    atualizados (a atualização pelo painel grava em staging, ver utils/refresh.py).
+    """
+    path = parquet_path(table_name)
+    files = _part_files(path) if os.path.isdir(path) else None
+    if incremental_from is None or files is None or "Date" not in df.columns:
+        if incremental_from is not None and os.path.isdir(path):
+            # Layout anterior: uma última regravação completa já no formato mensal
+            old = read_parquet(table_name, end=pd.Timestamp(incremental_from) - pd.Timedelta(microseconds=1))
+            df = pd.concat([old, df[df["Date"] >= pd.Timestamp(incremental_from)]], ignore_index=True)
+        _write_full(df, path)
+        return
+
+    start = pd.Timestamp(incremental_from)
+    first_month = start.strftime("%Y-%m")
+    new_parts = _part_groups(df[df["Date"] >= start])
+    affected = {key for key, month in files.items() if month >= first_month} | set(new_parts)
+    for directory, name in sorted(affected):
+        file_path = os.path.join(path, directory, name)
+        parts = [new_parts[(directory, name)]] if (directory, name) in new_parts else []
+        if (directory, name) in files:
+            old = pq.read_table(file_path).to_pandas()
+            parts.insert(0, old[old["Date"] < start])
+        rows = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+        if rows.empty:
+            os.remove(file_path)
+        else:
+            _write_part(rows, os.path.join(path, directory), name)
+
+
+def read_parquet(table_name, filters=None, start=None, end=None, columns=None):
+    """
+    Lê só as colunas pedidas (projeção) e aplica os filtros como expressão do
+    pyarrow, que descarta partições de Window e row groups pelas estatísticas.
+    """
+    dataset = _dataset(table_name)
+    if dataset is None:
+        raise FileNotFoundError(f"Tabela Parquet '{table_name}' não encontrada em {PARQUET_DIR}")
+
+    expression = None
+    conditions = []
+    for column, value in (filters or {}).items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            conditions.append(ds.field(column).isin(list(value)))
+        else:
+            conditions.append(ds.field(column) == value)
+    if start is not None:
+        conditions.append(ds.field("Date") >= pd.Timestamp(start))
+    if end is not None:
+        conditions.append(ds.field("Date") <= pd.Timestamp(end))
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    table = dataset.to_table(columns=list(columns) if columns else None, filter=expression)
+    return table.to_pandas()
+
+
+def parquet_last_date(table_name):
+    dataset = _dataset(table_name)
+    if dataset is None:
+        return None
+    dates = dataset.to_table(columns=["Date"]).column("Date")
+    if len(dates) == 0:
+        return None
+    return pd.Timestamp(pc.max(dates).as_py())
+
+
+def parquet_values_at(table_name, column, date):
+    df = read_parquet(table_name, start=date, end=date, columns=[column])
+    return set(df[column].astype(str).unique())
+
+
+def parquet_columns(table_name):
+    dataset = _dataset(table_name)
+    return set(dataset.schema.names) if dataset is not None else set()
+
+
+# =============================
+# Interface única usada por scripts e loaders
+# =============================
+def save_table(df, engine, table_name, incremental_from=None, indexes=()):
+    if use_parquet():
+        write_parquet(df, table_name, incremental_from)
+        return
+    if incremental_from is not None:
+        upsert_from_date(df, engine, table_name, incremental_from)
+        if indexes:
+            create_indexes(engine, table_name, indexes)
+    else:
+        bulk_write(df, engine, table_name, mode="replace", indexes=indexes)
+
+
+def rows_written(df, incremental_from=None):
+    # Linhas que save_table grava com incremental_from (todas numa carga completa); é a
+    # contagem que cada etapa do pipeline reporta
+    if incremental_from is None:
+        return len(df)
+    return int((df["Date"] >= pd.Timestamp(incremental_from)).sum())
+
+
+def read_table(engine, table_name, filters, start=None, end=None, columns=None):
+    if use_parquet():
+        return read_parquet(table_name, filters, start, end, columns)
+    return read_filtered(engine, table_name, filters, start, end, columns)
+
+
+def last_stored_date(engine, table_name):
+    if use_parquet():
+        return parquet_last_date(table_name)
+    return get_last_stored_date(engine, table_name)
+
+
+def stored_values(engine, table_name, column, date):
+    if use_parquet():
+        return parquet_values_at(table_name, column, date)
+    return get_stored_values(engine, table_name, column, date)
+
+
+def stored_columns(engine, table_name):
+    if use_parquet():
+        return parquet_columns(table_name)
+    return get_stored_columns(engine, table_name)
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+
+# =============================
+# Spans de tempo (pipeline, loaders e páginas)
+# =============================
+# span("nome") mede um trecho; @timed("nome") mede uma função. Cada span vira uma linha
+# JSON no logger "perf" ({"span", "seconds", "parent", ...}) e fica guardado na lista da
+# execução atual da thread (uma rerun do Streamlit), usada pelo painel de diagnóstico.
+# PERF_LOG=1 envia os spans para o stderr; PERF_LOG=<arquivo> grava num arquivo.
+PERF_LOG = os.environ.get("PERF_LOG", "")
+
+logger = logging.getLogger("perf")
+logger.propagate = False
+if PERF_LOG and not logger.handlers:
+    handler = logging.StreamHandler() if PERF_LOG == "1" else logging.FileHandler(PERF_LOG, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+_local = threading.local()
+
+
+def _spans():
+    if not hasattr(_local, "spans"):
+        _local.spans, _local.stack, _local.cache = [], [], {}
+    return _local
+
+
+def start_collection():
+    """
+    Começa uma nova coleta na thread atual (chamado no início de cada rerun do app).
+    """
+    state = _spans()
+    state.spans, state.stack, state.cache = [], [], {}
+
+
+def collected_spans():
+    return [record for record in _spans().spans if record is not None]
+
+
+def cache_counts():
+    # {loader: {"hits", "misses"}} da coleta atual
+    return {name: dict(counts) for name, counts in _spans().cache.items()}
+
+
+@contextmanager
+def span(name, **attrs):
+    state = _spans()
+    parent = state.stack[-1] if state.stack else None
+    state.stack.append(name)
+    # Posição reservada no início: a lista fica na ordem em que os spans começaram
+    position = len(state.spans)
+    state.spans.append(None)
+    started = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        seconds = time.perf_counter() - started
+        state.stack.pop()
+        record = {"span": name, "seconds": round(seconds, 6), "parent": parent,
+                  "depth": len(state.stack), "pid": os.getpid(), **attrs}
+        state.spans[position] = record
+        if logger.handlers:
+            logger.info(json.dumps(record, default=str))
+
+
+def timed(name):
+    """
+    Decorador: mede cada chamada da função como um span.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# -------------------------
+# Loaders cacheados pelo Streamlit
+# -------------------------
+def note_cache_miss():
+    # Chamado no corpo de uma função cacheada: só roda quando o cache não tinha o valor
+    _spans().miss = True
+
+
+def timed_loader(name):
+    """
+    Decorador externo a @st.cache_data/@st.cache_resource: mede a chamada e conta
+    hit/miss (o corpo da função deve chamar note_cache_miss()). Mantém .clear().
+    """
+    def decorator(cached_func):
+        @functools.wraps(cached_func)
+        def wrapper(*args, **kwargs):
+            state = _spans()
+            outer_miss, state.miss = getattr(state, "miss", False), False
+            with span(name) as attrs:
+                result = cached_func(*args, **kwargs)
+                attrs["cache"] = "miss" if state.miss else "hit"
+            counts = state.cache.setdefault(name, {"hits": 0, "misses": 0})
+            counts["misses" if state.miss else "hits"] += 1
+            # Loader chamado dentro de outro (ex.: painel que lê os preços): o miss interno
+            # não conta como miss do loader externo
+            state.miss = outer_miss
+            return result
+        wrapper.clear = cached_func.clear
+        return wrapper
+    return decorator